@@ -0,0 +1,215 @@
+# backend/api/asgi.py
+"""
+ASGI entry point.
+
+/api/query and /api/query/batch are served natively through
+SchemaAwareAgent.arun, so a single worker can keep many requests waiting on
+the LLM at once; streamed queries read their rows on a worker thread. Every
+other route is delegated to the Flask app.
+
+    uvicorn backend.api.asgi:app --port 5001
+"""
+import asyncio
+from contextlib import nullcontext
+import json
+from asgiref.wsgi import WsgiToAsgi
+from .routes import app as flask_app, get_agent, parse_batch, sql_header
+from ..utils.logger import get_logger
+from ..utils.metrics import REQUESTS
+from ..utils.tracing import trace
+
+logger = get_logger(__name__)
+
+_flask_app = WsgiToAsgi(flask_app)
+
+async def _read_json(receive):
+    """Read the full request body and decode it as JSON"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return json.loads(body or b'{}')
+
+async def _send_json(send, status, payload):
+    """Send a JSON response"""
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii'))
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def handle_query(receive, send):
+    try:
+        data = await _read_json(receive)
+    except ValueError:
+        await _send_json(send, 400, {'error': 'Invalid JSON body'})
+        return
+
+    query = data.get('query') if isinstance(data, dict) else None
+    if not query:
+        await _send_json(send, 400, {'error': 'No query provided'})
+        return
+
+    timings = bool(data.get('timings'))
+    if data.get('stream'):
+        await handle_stream_query(send, query, timings)
+        return
+
+    result_format = data.get('format', 'text')
+    if result_format in ('columnar', 'arrow'):
+        await handle_columnar_query(send, query, result_format, timings)
+        return
+    if result_format != 'text':
+        await _send_json(send, 400, {'error': f"Unknown format: {result_format}"})
+        return
+
+    try:
+        # Get response from agent, tracing its stages if timings were requested
+        with trace() if timings else nullcontext() as current:
+            response = await get_agent().arun_with_reasoning(query)
+        REQUESTS.inc(status="ok")
+        body = {'response': response}
+        if current is not None:
+            body['timings'] = current.summary()
+        await _send_json(send, 200, body)
+
+    except ValueError as e:
+        REQUESTS.inc(status="rejected")
+        logger.error(f"Query error: {str(e)}")
+        await _send_json(send, 400, {'error': str(e)})
+    except Exception as e:
+        REQUESTS.inc(status="error")
+        logger.error(f"Unexpected error: {str(e)}")
+        await _send_json(send, 500, {'error': 'An unexpected error occurred'})
+
+async def handle_stream_query(send, query, timings=False):
+    """
+    Stream the query result as NDJSON, one event per line, so rows arrive as they are read
+
+    With timings, a final {'timings': ...} event follows the rows.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')]
+    })
+
+    async def send_event(event):
+        body = (json.dumps(event, default=str) + "\n").encode('utf-8')
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    status = "ok"
+    with trace() if timings else nullcontext() as current:
+        events = get_agent().run_streaming(query)
+        try:
+            # The pipeline and the row cursor block, so each event is pulled on a worker thread
+            while (event := await asyncio.to_thread(next, events, None)) is not None:
+                if 'error' in event:
+                    status = "rejected"
+                await send_event(event)
+        except ValueError as e:
+            status = "rejected"
+            logger.error(f"Query error: {str(e)}")
+            await send_event({'error': str(e)})
+        except Exception as e:
+            status = "error"
+            logger.error(f"Unexpected error: {str(e)}")
+            await send_event({'error': 'An unexpected error occurred'})
+        finally:
+            # Release the cursor if the client went away mid-stream
+            await asyncio.to_thread(events.close)
+    REQUESTS.inc(status=status)
+    if current is not None:
+        await send_event({'timings': current.summary()})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def handle_columnar_query(send, query, result_format, timings=False):
+    """Serve compact column arrays (JSON) or an Arrow IPC stream"""
+    try:
+        with trace() if timings else nullcontext() as current:
+            result, sql_query = await asyncio.to_thread(get_agent().run_columnar, query)
+        REQUESTS.inc(status="ok")
+        if sql_query is None:
+            body = {'response': result}
+        elif result_format == 'arrow':
+            body = await asyncio.to_thread(result.to_arrow_ipc)
+            headers = [
+                (b'content-type', b'application/vnd.apache.arrow.stream'),
+                (b'content-length', str(len(body)).encode('ascii')),
+                (b'x-sql-query', sql_header(sql_query).encode('ascii'))
+            ]
+            if current is not None:
+                headers.append((b'x-timings', json.dumps(current.summary()).encode('utf-8')))
+            await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        else:
+            body = {'sql': sql_query, 'result': result.to_dict()}
+        if current is not None:
+            body['timings'] = current.summary()
+        await _send_json(send, 200, body)
+
+    except (ImportError, ValueError) as e:
+        REQUESTS.inc(status="rejected")
+        logger.error(f"Query error: {str(e)}")
+        await _send_json(send, 400, {'error': str(e)})
+    except Exception as e:
+        REQUESTS.inc(status="error")
+        logger.error(f"Unexpected error: {str(e)}")
+        await _send_json(send, 500, {'error': 'An unexpected error occurred'})
+
+async def handle_query_batch(receive, send):
+    """Answer several questions, streaming one NDJSON event per distinct question as it finishes"""
+    try:
+        queries, concurrency = parse_batch(await _read_json(receive))
+    except ValueError as e:
+        await _send_json(send, 400, {'error': str(e)})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')]
+    })
+
+    async def send_event(event):
+        body = (json.dumps(event, default=str) + "\n").encode('utf-8')
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    answered = 0
+    try:
+        async for event in get_agent().arun_batch(queries, concurrency):
+            answered += 1
+            await send_event(event)
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        await send_event({'error': 'An unexpected error occurred'})
+    await send_event({'done': True, 'questions': len(queries), 'answered': answered})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def _lifespan(receive, send):
+    """Acknowledge lifespan events; the Flask app has no startup hooks"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/query' and scope['method'] == 'POST':
+        await handle_query(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/query/batch' and scope['method'] == 'POST':
+        await handle_query_batch(receive, send)
+    else:
+        await _flask_app(scope, receive, send)
@@ -1,43 +1,281 @@
 # backend/api/routes.py
-from flask import Flask, request, jsonify, render_template
+import argparse
+from contextlib import nullcontext
+import json
+import threading
+from urllib.parse import quote
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from ..core.agent import SchemaAwareAgent
-from ..database.connection import get_database_engine
+from ..config.settings import get_settings
+from ..database.connection import get_database_engine, pool_stats
 from ..utils.logger import get_logger
+from ..utils.metrics import REGISTRY, REQUESTS
+from ..utils.tracing import trace
 
 logger = get_logger(__name__)
 
-app = Flask(__name__, 
+app = Flask(__name__,
     template_folder='../../frontend/templates',
     static_folder='../../frontend/static'
 )
 
-# Initialize the agent
-engine = get_database_engine()
-agent = SchemaAwareAgent(engine)
+# The agent is created on first use; heavy models load lazily or in a warm-up thread
+_agent = None
+_agent_lock = threading.Lock()
+_warm_up_error = None
+
+def get_agent():
+    """Return the shared agent, creating it on first use"""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = SchemaAwareAgent(get_database_engine())
+    return _agent
+
+def _warm_up():
+    """Sync schema metadata and load the relevance model"""
+    global _warm_up_error
+    try:
+        get_agent().warm_up()
+        logger.info("Agent warm-up complete")
+    except Exception as e:
+        _warm_up_error = str(e)
+        logger.error(f"Agent warm-up failed: {str(e)}")
+
+def start_warm_up(mode=None):
+    """
+    Start loading the agent according to the model loading mode
+
+    Args:
+        mode: "lazy", "background" or "eager" (defaults to MODEL_LOADING)
+    """
+    mode = mode or get_settings().MODEL_LOADING
+    if mode == "eager":
+        _warm_up()
+    elif mode == "background":
+        threading.Thread(target=_warm_up, name="agent-warm-up", daemon=True).start()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/api/ready')
+def handle_ready():
+    """
+    Readiness check: 200 once the schema is synced and the relevance model is loaded
+
+    With lazy model loading nothing loads before the first query, so the app is
+    ready as soon as it serves; 'models_loaded' reports the model state either way.
+    """
+    models_loaded = _agent is not None and _agent.is_ready()
+    ready = models_loaded or get_settings().MODEL_LOADING == "lazy"
+    body = {'ready': ready, 'models_loaded': models_loaded}
+    if _warm_up_error:
+        body['error'] = _warm_up_error
+    return jsonify(body), 200 if ready else 503
+
+@app.route('/api/cache/stats')
+def handle_cache_stats():
+    """Report result cache counters"""
+    result_cache = get_agent().result_cache
+    return jsonify({'result_cache': result_cache.stats() if result_cache else None})
+
+@app.route('/api/stats')
+def handle_stats():
+    """Report connection pool metrics, result cache counters, SQL repair attempts and coalesced questions"""
+    result_cache = _agent.result_cache if _agent is not None else None
+    single_flight = _agent.single_flight if _agent is not None else None
+    return jsonify({
+        'pools': pool_stats(),
+        'result_cache': result_cache.stats() if result_cache else None,
+        'sql_repair': _agent.repair_stats.stats() if _agent is not None else None,
+        'single_flight': single_flight.stats() if single_flight else None
+    })
+
+@app.route('/metrics')
+def handle_metrics():
+    """Stage latencies, LLM calls and tokens, and result sizes in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def handle_cache_invalidate():
+    """Drop cached results for the given tables (e.g. after an ETL load), or all of them"""
+    result_cache = get_agent().result_cache
+    if result_cache is None:
+        return jsonify({'invalidated': 0})
+
+    tables = (request.get_json(silent=True) or {}).get('tables')
+    if tables is None:
+        invalidated = result_cache.stats()['entries']
+        result_cache.clear()
+    else:
+        invalidated = sum(result_cache.invalidate_table(table) for table in tables)
+    return jsonify({'invalidated': invalidated})
+
 @app.route('/api/query', methods=['POST'])
 def handle_query():
     data = request.json
     query = data.get('query')
-    
+
     if not query:
         return jsonify({'error': 'No query provided'}), 400
-    
+
+    timings = bool(data.get('timings'))
+    if data.get('stream'):
+        return _stream_query(query, timings)
+
+    result_format = data.get('format', 'text')
+    if result_format in ('columnar', 'arrow'):
+        return _columnar_query(query, result_format, timings)
+    if result_format != 'text':
+        return jsonify({'error': f"Unknown format: {result_format}"}), 400
+
     try:
-        # Get response from agent
-        response = agent.run_with_reasoning(query)
-        return jsonify({'response': response})
-        
+        # Get response from agent, tracing its stages if timings were requested
+        with trace() if timings else nullcontext() as current:
+            response = get_agent().run_with_reasoning(query)
+        REQUESTS.inc(status="ok")
+        body = {'response': response}
+        if current is not None:
+            body['timings'] = current.summary()
+        return jsonify(body)
+
     except ValueError as e:
+        REQUESTS.inc(status="rejected")
         logger.error(f"Query error: {str(e)}")
         return jsonify({'error': str(e)}), 400
     except Exception as e:
+        REQUESTS.inc(status="error")
+        logger.error(f"Unexpected error: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+def parse_batch(data):
+    """
+    Validate a /api/query/batch body
+
+    Returns:
+        (queries, concurrency), concurrency capped at BATCH_CONCURRENCY
+
+    Raises:
+        ValueError: if the body is not a list of 1 to BATCH_MAX_QUESTIONS questions
+    """
+    settings = get_settings()
+    queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("No queries provided")
+    if not all(isinstance(query, str) and query.strip() for query in queries):
+        raise ValueError("Every query must be a non-empty string")
+    if len(queries) > settings.BATCH_MAX_QUESTIONS:
+        raise ValueError(f"At most {settings.BATCH_MAX_QUESTIONS} queries per batch")
+
+    concurrency = data.get('concurrency', settings.BATCH_CONCURRENCY)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+        raise ValueError("concurrency must be a positive integer")
+    return queries, min(concurrency, settings.BATCH_CONCURRENCY)
+
+@app.route('/api/query/batch', methods=['POST'])
+def handle_query_batch():
+    """
+    Answer several questions, streaming one NDJSON event per distinct question as it finishes
+
+    Each event lists the positions of the question in the request ('indices');
+    a final {'done': true} event follows the last one.
+    """
+    try:
+        queries, concurrency = parse_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        answered = 0
+        try:
+            for event in get_agent().run_batch(queries, concurrency):
+                answered += 1
+                yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}")
+            yield json.dumps({'error': 'An unexpected error occurred'}) + "\n"
+        yield json.dumps({'done': True, 'questions': len(queries), 'answered': answered}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _stream_query(query, timings=False):
+    """
+    Stream the query result as NDJSON, one event per line, so rows arrive as they are read
+
+    With timings, a final {'timings': ...} event follows the rows.
+    """
+    def generate():
+        status = "ok"
+        with trace() if timings else nullcontext() as current:
+            try:
+                for event in get_agent().run_streaming(query):
+                    if 'error' in event:
+                        status = "rejected"
+                    yield json.dumps(event, default=str) + "\n"
+            except ValueError as e:
+                status = "rejected"
+                logger.error(f"Query error: {str(e)}")
+                yield json.dumps({'error': str(e)}) + "\n"
+            except Exception as e:
+                status = "error"
+                logger.error(f"Unexpected error: {str(e)}")
+                yield json.dumps({'error': 'An unexpected error occurred'}) + "\n"
+        REQUESTS.inc(status=status)
+        if current is not None:
+            yield json.dumps({'timings': current.summary()}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# Characters sent as they are in the X-SQL-Query header: printable ASCII except '%'
+_HEADER_SAFE = ''.join(chr(code) for code in range(32, 127) if chr(code) != '%')
+
+def sql_header(sql_query):
+    """The SQL on one line for the X-SQL-Query header, percent-encoding non-ASCII text as UTF-8"""
+    return quote(' '.join(sql_query.split()), safe=_HEADER_SAFE)
+
+def _columnar_query(query, result_format, timings=False):
+    """Return the result as compact column arrays (JSON) or an Arrow IPC stream"""
+    try:
+        with trace() if timings else nullcontext() as current:
+            result, sql_query = get_agent().run_columnar(query)
+        REQUESTS.inc(status="ok")
+        if sql_query is None:
+            body = {'response': result}
+        elif result_format == 'arrow':
+            headers = {'X-SQL-Query': sql_header(sql_query)}
+            if current is not None:
+                headers['X-Timings'] = json.dumps(current.summary())
+            return Response(
+                result.to_arrow_ipc(),
+                mimetype='application/vnd.apache.arrow.stream',
+                headers=headers
+            )
+        else:
+            body = {'sql': sql_query, 'result': result.to_dict()}
+        if current is not None:
+            body['timings'] = current.summary()
+        return jsonify(body)
+
+    except (ImportError, ValueError) as e:
+        REQUESTS.inc(status="rejected")
+        logger.error(f"Query error: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        REQUESTS.inc(status="error")
         logger.error(f"Unexpected error: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the SQL Agent server")
+    parser.add_argument('--preload', action='store_true',
+                        help="Load the schema and relevance model before serving requests")
+    args = parser.parse_args()
+
+    start_warm_up('eager' if args.preload else None)
+    # The reloader would start a second process that warms up again
+    app.run(debug=True, host='0.0.0.0', port=5001, use_reloader=False)
+else:
+    # Imported by a WSGI server: each worker warms up on its own
+    start_warm_up()
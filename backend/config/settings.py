@@ -12,8 +12,100 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 class Settings:
     DATABASE_URL = f"sqlite:///{PROJECT_ROOT}/data/test.db"
     SCHEMA_DB_URL = f"sqlite:///{PROJECT_ROOT}/data/schema.db"
+    # Same database through an async driver, used by SchemaAwareAgent.arun
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite:///", "sqlite+aiosqlite:///", 1))
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # Seconds before the in-process schema snapshot is re-read from SCHEMA_DB_URL (0 disables the TTL)
+    SCHEMA_SNAPSHOT_TTL = float(os.getenv("SCHEMA_SNAPSHOT_TTL", "300"))
+
+    # When to load the relevance model: "lazy" (first query), "background" (warm-up thread) or "eager"
+    MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
+
+    # Intent routing: "llm" (separate classifier call), "single" (one call that returns SQL or a
+    # NOT_SQL answer) or "local" (schema keyword/embedding matches, no LLM call)
+    INTENT_MODE = os.getenv("INTENT_MODE", "llm")
+    LOCAL_INTENT_MIN_SCORE = float(os.getenv("LOCAL_INTENT_MIN_SCORE", "1.0"))
+
+    # Persistent question -> SQL cache. Near-duplicate matching by embedding (QUERY_CACHE_SEMANTIC,
+    # QUERY_CACHE_SIMILARITY) applies only with RELEVANCE_MODE=embedding, which loads the embedding model
+    QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+    QUERY_CACHE_URL = os.getenv("QUERY_CACHE_URL", f"sqlite:///{PROJECT_ROOT}/data/query_cache.db")
+    QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+    QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", str(7 * 24 * 3600)))
+    QUERY_CACHE_SEMANTIC = os.getenv("QUERY_CACHE_SEMANTIC", "true").lower() == "true"
+    QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+
+    # Connection pools shared by every engine in the process (see database/connection.py)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Per-statement timeout: set on the server for PostgreSQL and MySQL, through a progress handler for SQLite (0 disables it)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    # SQLite: write-ahead logging lets readers run alongside a writer; busy timeout waits out locks
+    SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # EXPLAIN-based cost check of generated SQL before it runs (0 disables a threshold or the LIMIT)
+    QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() == "true"
+    # What to do with a flagged query: "warn" (log only), "reject", "regenerate" (ask the LLM once more)
+    # or "limit" (append LIMIT to queries that neither group nor aggregate)
+    QUERY_GUARD_ACTION = os.getenv("QUERY_GUARD_ACTION", "warn")
+    QUERY_GUARD_MAX_SCAN_ROWS = int(os.getenv("QUERY_GUARD_MAX_SCAN_ROWS", "1000000"))
+    QUERY_GUARD_MAX_JOIN_ROWS = int(os.getenv("QUERY_GUARD_MAX_JOIN_ROWS", "10000000"))
+    # PostgreSQL planner cost units
+    QUERY_GUARD_MAX_COST = float(os.getenv("QUERY_GUARD_MAX_COST", "10000000"))
+    QUERY_GUARD_LIMIT = int(os.getenv("QUERY_GUARD_LIMIT", "1000"))
+
+    # Token budget of the schema section of the SQL prompt; tables wider than this many columns are written compactly
+    PROMPT_SCHEMA_TOKENS = int(os.getenv("PROMPT_SCHEMA_TOKENS", "3000"))
+    PROMPT_WIDE_TABLE_COLUMNS = int(os.getenv("PROMPT_WIDE_TABLE_COLUMNS", "12"))
+
+    # Foreign-key join paths: longest bridge considered, and schema size up to which all pairs are precomputed
+    JOIN_PATH_MAX_HOPS = int(os.getenv("JOIN_PATH_MAX_HOPS", "3"))
+    JOIN_PATH_PRECOMPUTE_MAX_TABLES = int(os.getenv("JOIN_PATH_PRECOMPUTE_MAX_TABLES", "500"))
+
+    # Failed SQL is sent back to the model with the database error, up to this many times
+    SQL_REPAIR_ATTEMPTS = int(os.getenv("SQL_REPAIR_ATTEMPTS", "2"))
+    # Seconds before the first repair, doubled for each further one
+    SQL_REPAIR_BACKOFF = float(os.getenv("SQL_REPAIR_BACKOFF", "0.2"))
+
+    # Concurrent identical questions share one pipeline run; at most this many callers wait on one (0 for no limit)
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    SINGLE_FLIGHT_MAX_WAITERS = int(os.getenv("SINGLE_FLIGHT_MAX_WAITERS", "100"))
+
+    # /api/query/batch: most questions per request, and questions answered at once
+    BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+    # Caps on rows returned by sql_engine and /api/query (0 disables a cap)
+    RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "10000"))
+    RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", str(10 * 1024 * 1024)))
+    RESULT_FETCH_SIZE = int(os.getenv("RESULT_FETCH_SIZE", "500"))
+
+    # Optional in-memory cache of query results, keyed by normalized SQL
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "false").lower() == "true"
+    RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "60"))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Build the schema prompt while the intent classifier runs, discarding it for non-SQL questions
+    SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+    # Retrievals that can overlap the classifier at once; further requests retrieve after it instead
+    RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+
+    # Schema relevance model (e.g. "valhalla/distilbart-mnli-12-1" for a smaller distilled NLI model)
+    RELEVANCE_MODEL = os.getenv("RELEVANCE_MODEL", "facebook/bart-large-mnli")
+    RELEVANCE_BATCH_SIZE = int(os.getenv("RELEVANCE_BATCH_SIZE", "16"))
+    # Stage 2 retrieval mode: "nli" (zero-shot classifier), "embedding" (precomputed index) or "keyword" (Stage 1 only)
+    RELEVANCE_MODE = os.getenv("RELEVANCE_MODE", "nli")
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Unix socket of a shared relevance server (python -m backend.core.relevance_server); unset loads models in-process
+    RELEVANCE_SOCKET = os.getenv("RELEVANCE_SOCKET")
+    RELEVANCE_BATCH_WINDOW_MS = float(os.getenv("RELEVANCE_BATCH_WINDOW_MS", "5"))
+    SCHEMA_EMBEDDINGS_PATH = os.getenv("SCHEMA_EMBEDDINGS_PATH", f"{PROJECT_ROOT}/data/schema_embeddings.npz")
 
 def get_settings():
     return Settings()
\ No newline at end of file
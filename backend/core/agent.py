@@ -1,99 +1,254 @@
 # backend/core/agent.py
-from sqlalchemy import inspect
 from ..utils.logger import get_logger
 from .schema_manager import SchemaManager
 from .schema_relevance_analyzer import SchemaRelevanceAnalyzer
-from .prompt_generator import DynamicPromptGenerator
-from ..tools.sql_agent_tool import sql_engine
-from openai import OpenAI
+from .prompt_generator import DynamicPromptGenerator, NOT_SQL_PREFIX
+from .query_cache import QueryCache
+from ..tools.sql_agent_tool import sql_engine, sql_engine_async, stream_rows, ERROR_PREFIX, TRUNCATED_KEY
+from ..tools.result_cache import ResultCache
+from ..tools.columnar import execute_columnar
+from ..tools.query_guard import QueryGuard, QueryRejected
+from .sql_repair import SqlAttempt, SqlExecutionError, RepairStats
+from ..utils.helpers import normalize_question, referenced_tables
+from ..utils.sql_parser import dialect_for, extract_sql, try_parse_sql
+from ..utils.tracing import span, in_context
+from ..utils.singleflight import SingleFlight
+from ..utils.metrics import LLM_CALLS, LLM_TOKENS, SQL_ROWS
+from ..database.connection import get_async_database_engine
+from openai import OpenAI, AsyncOpenAI
 from ..config.settings import Settings
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from threading import Lock
+import asyncio
+import time
 
 logger = get_logger(__name__)
 
 class SchemaAwareAgent:
-    def __init__(self, engine):
+    def __init__(self, engine, preload=False, async_engine=None):
         self.engine = engine
+        # sqlglot dialect used to parse and format generated SQL
+        self.dialect = dialect_for(engine)
+        # Only SQLite string matches ignore case (COLLATE NOCASE), so elsewhere case separates questions
+        self._case_sensitive = self.dialect != "sqlite"
+        # Async engine for arun, created on first use
+        self._async_engine = async_engine
         settings = Settings()
         self.schema_manager = SchemaManager(settings.SCHEMA_DB_URL)
-        self.relevance_analyzer = SchemaRelevanceAnalyzer()
+        self.relevance_analyzer = SchemaRelevanceAnalyzer(self.schema_manager)
         self.prompt_generator = DynamicPromptGenerator(
             self.schema_manager,
             self.relevance_analyzer
         )
         
-        # Initialize OpenAI client
+        # Question -> SQL cache; a hit skips every model call
+        self.query_cache = None
+        if settings.QUERY_CACHE_ENABLED:
+            # Near-duplicate matching reuses the embedding model, so only when relevance ranking loads it
+            semantic = settings.QUERY_CACHE_SEMANTIC and self.relevance_analyzer.mode == "embedding"
+            self.query_cache = QueryCache(
+                self.schema_manager,
+                self.relevance_analyzer.model if semantic else None,
+                case_sensitive=self._case_sensitive
+            )
+        
+        # Optional cache of query results; schema changes drop the affected tables' entries
+        self.result_cache = None
+        if settings.RESULT_CACHE_ENABLED:
+            self.result_cache = ResultCache(settings.RESULT_CACHE_MAX_BYTES, settings.RESULT_CACHE_TTL)
+            self.schema_manager.add_listener(
+                lambda table_name, schema: self.result_cache.invalidate_table(table_name)
+            )
+        
+        # EXPLAIN-based cost check of generated SQL before it runs
+        self.query_guard = QueryGuard(engine) if settings.QUERY_GUARD_ENABLED else None
+        
+        # Failed SQL is sent back to the model with the database error, up to this many times
+        self.repair_attempts = settings.SQL_REPAIR_ATTEMPTS
+        self.repair_backoff = settings.SQL_REPAIR_BACKOFF
+        self.repair_stats = RepairStats()
+        
+        # Initialize OpenAI clients (the async one serves arun)
+        self.model = settings.LLM_MODEL
         self.client = OpenAI()
+        self.async_client = AsyncOpenAI()
+        
+        # How questions are routed: "llm" (classifier call), "single" (merged into generation) or "local"
+        self.intent_mode = settings.INTENT_MODE
+        if self.intent_mode not in ("llm", "single", "local"):
+            raise ValueError(f"Unknown intent mode: {self.intent_mode}")
+        
+        # Schema retrieval runs on this pool so it can overlap the intent classifier;
+        # when every worker is busy, requests retrieve on their own thread instead of queueing
+        self.speculative_retrieval = settings.SPECULATIVE_RETRIEVAL
+        self.retrieval_workers = settings.RETRIEVAL_WORKERS
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.retrieval_workers,
+            thread_name_prefix="schema-retrieval"
+        )
+        self._retrievals = 0
+        self._retrievals_lock = Lock()
+        
+        # Concurrent identical questions share one pipeline execution
+        self.single_flight = None
+        if settings.SINGLE_FLIGHT_ENABLED:
+            self.single_flight = SingleFlight(settings.SINGLE_FLIGHT_MAX_WAITERS)
+        
+        # Questions of a batch answered at once (run_batch / arun_batch)
+        self.batch_concurrency = settings.BATCH_CONCURRENCY
         
-        # Initialize schema metadata
-        self._initialize_schema_metadata()
+        # Schema metadata is synced on first use (or by warm_up)
+        self._schema_initialized = False
+        self._schema_lock = Lock()
+        
+        if preload:
+            self.warm_up()
+    
+    def warm_up(self):
+        """Sync schema metadata and load the relevance model ahead of the first query"""
+        self._ensure_schema_metadata()
+        self.relevance_analyzer.warm_up()
+    
+    @property
+    def async_engine(self):
+        if self._async_engine is None:
+            self._async_engine = get_async_database_engine()
+        return self._async_engine
+    
+    def is_ready(self):
+        """Check whether schema metadata is synced and the relevance model is loaded"""
+        return self._schema_initialized and self.relevance_analyzer.is_ready()
     
     def _clean_sql_query(self, sql_query):
-        """Clean and validate the SQL query"""
+        """Extract, parse and validate the SQL query in a model response"""
         if not sql_query:
             raise ValueError("Empty response received")
         
         # Debug: Log the raw response
         logger.info(f"Raw LLM response: {repr(sql_query)}")
-            
-        # Remove any markdown code blocks
-        sql_query = re.sub(r'```sql\s*|\s*```', '', sql_query)
-        
-        # Remove any explanatory text before or after the query
-        sql_query = sql_query.strip()
         
-        # Find the first SELECT statement
-        select_match = re.search(r'SELECT.*?;', sql_query, re.IGNORECASE | re.DOTALL)
-        if select_match:
-            sql_query = select_match.group(0)
-        else:
-            # If no SELECT statement found, try to find one without semicolon
-            select_match = re.search(r'SELECT.*', sql_query, re.IGNORECASE | re.DOTALL)
-            if select_match:
-                sql_query = select_match.group(0) + ';'
-            else:
-                # Debug: Log when no SELECT found
-                logger.error(f"No SELECT statement found in response: {repr(sql_query)}")
-                raise ValueError("No valid SELECT statement found in response")
+        # Parse the first read-only query, dropping markdown fences and explanatory text
+        try:
+            parsed = extract_sql(sql_query, self.dialect)
+        except ValueError:
+            logger.error(f"No valid SQL query in response: {repr(sql_query)}")
+            raise
         
-        # Ensure the query starts with SELECT and ends with a semicolon
-        if not sql_query.upper().startswith('SELECT'):
-            raise ValueError("Query must start with SELECT")
-        if not sql_query.strip().endswith(';'):
-            sql_query = sql_query.strip() + ';'
+        # Catch references to unknown tables before a database round trip
+        known_tables = {table_name.lower() for table_name in self.schema_manager.get_snapshot().schemas}
+        unknown_tables = [table_name for table_name in parsed.tables if table_name.lower() not in known_tables]
+        if known_tables and unknown_tables:
+            raise ValueError(f"Query references unknown tables: {', '.join(unknown_tables)}")
         
-        return sql_query
+        return parsed.sql
     
     def _initialize_schema_metadata(self):
         """Initialize schema metadata from the database"""
-        inspector = inspect(self.engine)
-        for table_name in inspector.get_table_names():
-            columns = []
-            for column in inspector.get_columns(table_name):
-                col_info = {
-                    'name': column['name'],
-                    'type': str(column['type']),
-                    'nullable': column.get('nullable', True),
-                    'primary_key': column.get('primary_key', False)
-                }
-                columns.append(col_info)
-            
-            # Update schema in metadata database
-            self.schema_manager.update_schema(table_name, columns)
+        # Only tables whose definition changed since the last run are rewritten
+        self.schema_manager.sync_schemas(self.engine)
+    
+    def _ensure_schema_metadata(self):
+        """Initialize schema metadata once, on first use"""
+        if self._schema_initialized:
+            return
+        with self._schema_lock:
+            if not self._schema_initialized:
+                with span("schema_sync"):
+                    self._initialize_schema_metadata()
+                self._schema_initialized = True
+    
+    def _record_usage(self, llm_span, response, purpose):
+        """Record the model and token counts of a completion on its span and in the metrics"""
+        model = getattr(response, 'model', None) or self.model
+        LLM_CALLS.inc(model=model, purpose=purpose)
+        llm_span.set(model=model)
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens, model=model, kind="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens, model=model, kind="completion")
+            llm_span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    
+    def _complete(self, messages, purpose="generate"):
+        """Get a chat completion from OpenAI"""
+        with span("llm", purpose=purpose) as llm_span:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.1
+            )
+            self._record_usage(llm_span, response, purpose)
+        return response.choices[0].message.content.strip()
+    
+    async def _acomplete(self, messages, purpose="generate"):
+        """Get a chat completion from OpenAI without blocking the event loop"""
+        with span("llm", purpose=purpose) as llm_span:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.1
+            )
+            self._record_usage(llm_span, response, purpose)
+        return response.choices[0].message.content.strip()
+    
+    def _classification_messages(self, query):
+        """Messages asking whether the query needs SQL execution"""
+        return [
+            {"role": "system", "content": "You are a classifier that determines if a question requires SQL query execution. Respond with 'true' if the question needs SQL execution, 'false' otherwise."},
+            {"role": "user", "content": query}
+        ]
+    
+    def _general_messages(self, query):
+        """Messages for answering a general (non-SQL) question"""
+        return [
+            {"role": "system", "content": "You are a helpful SQL assistant. Answer questions about SQL and databases in a clear, concise way."},
+            {"role": "user", "content": query}
+        ]
+    
+    def _generation_messages(self, query, system_prompt):
+        """Messages asking for the SQL query that answers the question"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query}
+        ]
+    
+    def _regeneration_messages(self, messages, sql_query, issues):
+        """Messages asking the model to rewrite SQL the cost guard flagged"""
+        return messages + [
+            {"role": "assistant", "content": sql_query},
+            {"role": "user", "content": (
+                "This query is too expensive to run: " + "; ".join(issues) + ". "
+                "Rewrite it to avoid these problems, for example with join conditions, "
+                "more selective filters or a LIMIT. Return only the SQL query."
+            )}
+        ]
+    
+    def _repair_messages(self, messages, sql_query, error):
+        """Messages asking the model to fix SQL that failed, reusing the generation prompt"""
+        return messages + [
+            {"role": "assistant", "content": sql_query},
+            {"role": "user", "content": (
+                f"The query failed with this error: {error}\n"
+                "Fix the query. Return only the corrected SQL query."
+            )}
+        ]
     
     def _is_sql_query_request(self, query):
         """Determine if the query is asking for SQL execution"""
-        # Get classification from OpenAI
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a classifier that determines if a question requires SQL query execution. Respond with 'true' if the question needs SQL execution, 'false' otherwise."},
-                {"role": "user", "content": query}
-            ],
-            temperature=0.1
-        )
-        
-        return response.choices[0].message.content.strip().lower() == 'true'
+        with span("intent", mode=self.intent_mode):
+            if self.intent_mode == "local":
+                # Decide from schema keyword/embedding matches, without an LLM round trip
+                return self.relevance_analyzer.is_data_question(query)
+            
+            # Get classification from OpenAI
+            return self._complete(self._classification_messages(query), "classify").lower() == 'true'
+    
+    async def _ais_sql_query_request(self, query):
+        """Async version of _is_sql_query_request"""
+        with span("intent", mode=self.intent_mode):
+            if self.intent_mode == "local":
+                return await asyncio.to_thread(self.relevance_analyzer.is_data_question, query)
+            return (await self._acomplete(self._classification_messages(query), "classify")).lower() == 'true'
     
     def _is_schema_request(self, query):
         """Determine if the query is asking for schema information"""
@@ -102,7 +257,7 @@ class SchemaAwareAgent:
     
     def _get_schema_info(self):
         """Get formatted schema information for all tables"""
-        schemas = self.schema_manager.get_all_schemas()
+        schemas = self.schema_manager.get_snapshot().schemas
         formatted_schemas = []
         
         for table_name, schema in schemas.items():
@@ -118,63 +273,494 @@ class SchemaAwareAgent:
         
         return '\n\n'.join(formatted_schemas)
     
-    def run(self, query):
-        """Run a query and return the result"""
-        # Check if this is a schema request
-        if self._is_schema_request(query):
-            return self._get_schema_info(), None
-            
+    def _generate_sql(self, query, system_prompt=None):
+        """
+        Turn a question into SQL, or answer it directly if it does not need SQL
+        
+        Args:
+            query: The user query
+            system_prompt: Generation prompt built ahead of time (e.g. for a batch), if any
+        
+        Returns:
+            (answer, None, None) for a general question, or (None, response, messages)
+            where response is the model's SQL response (parsed and checked by
+            _execute_with_repair) and messages are the messages it was produced from
+        """
+        if self.intent_mode == "single":
+            # One call: the prompt lets the model decline with a direct answer
+            if system_prompt is None:
+                system_prompt = self.prompt_generator.generate_prompt(query, allow_non_sql=True)
+            messages = self._generation_messages(query, system_prompt)
+            content = self._complete(messages)
+            answer = self._non_sql_answer(content)
+            if answer is not None:
+                return answer, None, None
+            return None, content, messages
+        
+        # Generate prompt with relevant schemas, speculatively in parallel with the classifier
+        prompt_future = None
+        if system_prompt is None and self.speculative_retrieval and self.intent_mode == "llm":
+            prompt_future = self._start_retrieval(query)
+        
         # Check if this is a SQL query request
-        if not self._is_sql_query_request(query):
+        try:
+            is_sql_query = self._is_sql_query_request(query)
+        except Exception:
+            if prompt_future is not None:
+                prompt_future.cancel()
+            raise
+        
+        if not is_sql_query:
+            # Retrieval that has not started yet is dropped; a running one is discarded
+            if prompt_future is not None:
+                prompt_future.cancel()
             # Handle as a general question
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful SQL assistant. Answer questions about SQL and databases in a clear, concise way."},
-                    {"role": "user", "content": query}
-                ],
-                temperature=0.1
-            )
-            return response.choices[0].message.content.strip(), None
+            return self._complete(self._general_messages(query), "general"), None, None
+        
+        if prompt_future is not None:
+            system_prompt = prompt_future.result()
+        elif system_prompt is None:
+            system_prompt = self.prompt_generator.generate_prompt(query)
+        
+        # Get SQL query from OpenAI
+        messages = self._generation_messages(query, system_prompt)
+        return None, self._complete(messages), messages
+    
+    async def _agenerate_sql(self, query, system_prompt=None):
+        """Async version of _generate_sql"""
+        if self.intent_mode == "single":
+            # One call: the prompt lets the model decline with a direct answer
+            if system_prompt is None:
+                system_prompt = await asyncio.to_thread(
+                    self.prompt_generator.generate_prompt, query, allow_non_sql=True
+                )
+            messages = self._generation_messages(query, system_prompt)
+            content = await self._acomplete(messages)
+            answer = self._non_sql_answer(content)
+            if answer is not None:
+                return answer, None, None
+            return None, content, messages
+        
+        # Generate prompt with relevant schemas, speculatively in parallel with the classifier
+        prompt_future = None
+        if system_prompt is None and self.speculative_retrieval and self.intent_mode == "llm":
+            retrieval = self._start_retrieval(query)
+            if retrieval is not None:
+                prompt_future = asyncio.wrap_future(retrieval)
         
-        # Generate prompt with relevant schemas
-        system_prompt = self.prompt_generator.generate_prompt(query)
+        # Check if this is a SQL query request
+        try:
+            is_sql_query = await self._ais_sql_query_request(query)
+        except BaseException:
+            if prompt_future is not None:
+                prompt_future.cancel()
+            raise
+        
+        if not is_sql_query:
+            # Retrieval that has not started yet is dropped; a running one is discarded
+            if prompt_future is not None:
+                prompt_future.cancel()
+            # Handle as a general question
+            return await self._acomplete(self._general_messages(query), "general"), None, None
+        
+        if prompt_future is not None:
+            system_prompt = await prompt_future
+        elif system_prompt is None:
+            system_prompt = await asyncio.to_thread(self.prompt_generator.generate_prompt, query)
         
         # Get SQL query from OpenAI
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            temperature=0.1
+        messages = self._generation_messages(query, system_prompt)
+        return None, await self._acomplete(messages), messages
+    
+    def _start_retrieval(self, query):
+        """
+        Start building the question's prompt on the retrieval pool
+        
+        Returns:
+            A Future of the prompt, or None if every retrieval worker is busy (the
+            caller then retrieves on its own thread once the question needs SQL)
+        """
+        with self._retrievals_lock:
+            if self._retrievals >= self.retrieval_workers:
+                return None
+            self._retrievals += 1
+        
+        def finished(_):
+            with self._retrievals_lock:
+                self._retrievals -= 1
+        
+        future = self._executor.submit(in_context(self.prompt_generator.generate_prompt), query)
+        # Also called when the future is cancelled before it runs
+        future.add_done_callback(finished)
+        return future
+    
+    def _prepare(self, query, system_prompt=None, cached_sql=None):
+        """
+        Resolve a question to SQL without executing it (see _generate_sql for system_prompt)
+        
+        A caller passing system_prompt or cached_sql (e.g. a batch) has already
+        looked the question up in the query cache, so it is not looked up again.
+        
+        Returns:
+            (answer, sql_query, messages, from_cache), where sql_query is None when
+            the question was answered directly, else the model's response or the
+            cached SQL, and messages are the generation messages (None for cached SQL)
+        """
+        self._ensure_schema_metadata()
+        
+        # Check if this is a schema request
+        if self._is_schema_request(query):
+            return self._get_schema_info(), None, None, False
+        
+        # Reuse SQL generated earlier for the same question
+        if cached_sql is None and system_prompt is None:
+            cached_sql = self._cached_sql(query)
+        if cached_sql is not None:
+            return None, cached_sql, None, True
+        
+        answer, response, messages = self._generate_sql(query, system_prompt)
+        return answer, response, messages, False
+    
+    async def _aprepare(self, query, system_prompt=None, cached_sql=None):
+        """Async version of _prepare"""
+        # Schema sync and relevance scoring are blocking work; keep them off the event loop
+        await asyncio.to_thread(self._ensure_schema_metadata)
+        
+        # Check if this is a schema request
+        if self._is_schema_request(query):
+            return self._get_schema_info(), None, None, False
+        
+        # Reuse SQL generated earlier for the same question
+        if cached_sql is None and system_prompt is None:
+            cached_sql = await asyncio.to_thread(self._cached_sql, query)
+        if cached_sql is not None:
+            return None, cached_sql, None, True
+        
+        answer, response, messages = await self._agenerate_sql(query, system_prompt)
+        return answer, response, messages, False
+    
+    def _guard_sql(self, sql_query, messages):
+        """Check generated SQL against the cost guard, regenerating it once if configured"""
+        if self.query_guard is None:
+            return sql_query
+        try:
+            return self.query_guard.check(sql_query)
+        except QueryRejected as e:
+            if self.query_guard.action != "regenerate":
+                raise
+            logger.info(f"Regenerating flagged query: {str(e)}")
+            sql_query = self._parse_sql_response(
+                self._complete(self._regeneration_messages(messages, sql_query, e.issues), "regenerate")
+            )
+        # The rewrite is rejected if it is still flagged
+        return self.query_guard.check(sql_query)
+    
+    async def _aguard_sql(self, sql_query, messages):
+        """Async version of _guard_sql"""
+        if self.query_guard is None:
+            return sql_query
+        try:
+            return await asyncio.to_thread(self.query_guard.check, sql_query)
+        except QueryRejected as e:
+            if self.query_guard.action != "regenerate":
+                raise
+            logger.info(f"Regenerating flagged query: {str(e)}")
+            sql_query = self._parse_sql_response(
+                await self._acomplete(self._regeneration_messages(messages, sql_query, e.issues), "regenerate")
+            )
+        # The rewrite is rejected if it is still flagged
+        return await asyncio.to_thread(self.query_guard.check, sql_query)
+    
+    def _execute_with_repair(self, response, messages, execute):
+        """
+        Parse, check and execute generated SQL, sending failures back to the model for a fix
+        
+        Invalid SQL, a query rejected by the cost guard and a database error all
+        count as a failed attempt.
+        
+        Args:
+            response: Model response holding the SQL, or cached SQL when messages is None
+            messages: Generation messages the response came from (None disables checks and repair)
+            execute: Callable running the SQL, raising on failure
+        
+        Returns:
+            (result, sql_query) for the attempt that succeeded
+        """
+        attempts = []
+        budget = self.repair_attempts if messages is not None else 0
+        try:
+            for number in range(1, budget + 2):
+                started = time.perf_counter()
+                try:
+                    if number > 1:
+                        # Back off before retrying, in case the failure was transient (e.g. a lock)
+                        time.sleep(self.repair_backoff * 2 ** (number - 2))
+                        started = time.perf_counter()
+                        messages = self._repair_messages(messages, attempts[-1].sql_query, attempts[-1].error)
+                        response = self._complete(messages, "repair")
+                    # What the model produced, recorded (and sent back) as is if it does not parse
+                    sql_query = response
+                    if messages is not None:
+                        sql_query = self._parse_sql_response(response)
+                        sql_query = self._guard_sql(sql_query, messages)
+                    result = execute(sql_query)
+                except (SqlExecutionError, ValueError) as e:
+                    attempts.append(SqlAttempt(number, sql_query, time.perf_counter() - started, str(e)))
+                    logger.info(f"SQL attempt {number} failed in {attempts[-1].latency * 1000:.0f} ms: {str(e)}")
+                    continue
+                attempts.append(SqlAttempt(number, sql_query, time.perf_counter() - started))
+                logger.info(f"SQL attempt {number} succeeded in {attempts[-1].latency * 1000:.0f} ms")
+                return result, sql_query
+        finally:
+            self.repair_stats.record(attempts)
+        
+        raise ValueError(f"Failed to execute SQL query: {attempts[-1].error}")
+    
+    async def _aexecute_with_repair(self, response, messages, execute):
+        """Async version of _execute_with_repair (execute is a coroutine function)"""
+        attempts = []
+        budget = self.repair_attempts if messages is not None else 0
+        try:
+            for number in range(1, budget + 2):
+                started = time.perf_counter()
+                try:
+                    if number > 1:
+                        await asyncio.sleep(self.repair_backoff * 2 ** (number - 2))
+                        started = time.perf_counter()
+                        messages = self._repair_messages(messages, attempts[-1].sql_query, attempts[-1].error)
+                        response = await self._acomplete(messages, "repair")
+                    sql_query = response
+                    if messages is not None:
+                        sql_query = self._parse_sql_response(response)
+                        sql_query = await self._aguard_sql(sql_query, messages)
+                    result = await execute(sql_query)
+                except (SqlExecutionError, ValueError) as e:
+                    attempts.append(SqlAttempt(number, sql_query, time.perf_counter() - started, str(e)))
+                    logger.info(f"SQL attempt {number} failed in {attempts[-1].latency * 1000:.0f} ms: {str(e)}")
+                    continue
+                attempts.append(SqlAttempt(number, sql_query, time.perf_counter() - started))
+                logger.info(f"SQL attempt {number} succeeded in {attempts[-1].latency * 1000:.0f} ms")
+                return result, sql_query
+        finally:
+            self.repair_stats.record(attempts)
+        
+        raise ValueError(f"Failed to execute SQL query: {attempts[-1].error}")
+    
+    def _open_stream(self, sql_query):
+        """Start streaming a query's rows, returning (first row or None, remaining rows)"""
+        rows = stream_rows(sql_query, self.engine)
+        try:
+            return next(rows, None), rows
+        except Exception as e:
+            logger.error(f"SQL query execution failed: {str(e)}")
+            raise SqlExecutionError(str(e))
+    
+    def _columnar_sql(self, sql_query):
+        """Execute SQL into a ColumnarResult, raising SqlExecutionError on failure"""
+        try:
+            return execute_columnar(sql_query, self.engine)
+        except Exception as e:
+            logger.error(f"SQL query execution failed: {str(e)}")
+            raise SqlExecutionError(str(e))
+    
+    def _checked_sql(self, sql_query):
+        """Execute SQL through the result cache, raising on an execution error"""
+        result = self._execute_sql(sql_query)
+        if result.startswith(ERROR_PREFIX):
+            raise SqlExecutionError(result[len(ERROR_PREFIX):])
+        return result
+    
+    async def _achecked_sql(self, sql_query):
+        """Async version of _checked_sql"""
+        result = await self._aexecute_sql(sql_query)
+        if result.startswith(ERROR_PREFIX):
+            raise SqlExecutionError(result[len(ERROR_PREFIX):])
+        return result
+    
+    def run(self, query, system_prompt=None, cached_sql=None):
+        """
+        Run a query and return the result, sharing the execution of an identical question already running
+        
+        See _prepare for system_prompt and cached_sql.
+        """
+        if self.single_flight is None:
+            return self._run(query, system_prompt, cached_sql)
+        return self.single_flight.do(
+            ("run", self._question_key(query)), self._run, query, system_prompt, cached_sql
         )
+    
+    async def arun(self, query, system_prompt=None, cached_sql=None):
+        """Run a query without blocking the event loop and return the result"""
+        if self.single_flight is None:
+            return await self._arun(query, system_prompt, cached_sql)
+        return await self.single_flight.ado(
+            ("run", self._question_key(query)), self._arun, query, system_prompt, cached_sql
+        )
+    
+    def _run(self, query, system_prompt=None, cached_sql=None):
+        """Run a query through the whole pipeline"""
+        answer, sql_query, messages, from_cache = self._prepare(query, system_prompt, cached_sql)
+        if sql_query is None:
+            return answer, None
+        
+        # Execute the SQL query, repairing it if it fails
+        result, sql_query = self._execute_with_repair(sql_query, messages, self._checked_sql)
+        if not from_cache:
+            self._cache_sql(query, sql_query, result)
+        return result, sql_query
+    
+    async def _arun(self, query, system_prompt=None, cached_sql=None):
+        """Async version of _run"""
+        answer, sql_query, messages, from_cache = await self._aprepare(query, system_prompt, cached_sql)
+        if sql_query is None:
+            return answer, None
         
-        # Get and clean the SQL query
+        # Execute the SQL query, repairing it if it fails
+        result, sql_query = await self._aexecute_with_repair(sql_query, messages, self._achecked_sql)
+        if not from_cache:
+            await asyncio.to_thread(self._cache_sql, query, sql_query, result)
+        return result, sql_query
+    
+    def run_streaming(self, query):
+        """
+        Run a query and stream its result as it is read from the database
+        
+        Yields:
+            {'answer': text} for questions answered without SQL; otherwise
+            {'sql': sql_query}, one {'row': {...}} per row, {'truncated': reason}
+            if a row or byte cap was hit, and finally {'done': True, 'row_count': n}
+        """
+        answer, sql_query, messages, from_cache = self._prepare(query)
+        if sql_query is None:
+            yield {'answer': answer}
+            return
+        
+        # Failures before the first row are repaired; later ones end the stream
         try:
-            sql_query = self._clean_sql_query(response.choices[0].message.content.strip())
+            (first, rows), sql_query = self._execute_with_repair(sql_query, messages, self._open_stream)
         except ValueError as e:
-            logger.error(f"Invalid SQL query response: {str(e)}")
-            raise ValueError(str(e))
+            yield {'error': str(e)}
+            return
         
-        # Execute the SQL query
+        yield {'sql': sql_query}
+        row_count = 0
         try:
-            result = sql_engine(sql_query, self.engine)
-            return result, sql_query
+            for record in chain([first] if first is not None else [], rows):
+                if TRUNCATED_KEY in record:
+                    yield {'truncated': record[TRUNCATED_KEY]}
+                    break
+                row_count += 1
+                yield {'row': record}
         except Exception as e:
             logger.error(f"SQL query execution failed: {str(e)}")
-            raise ValueError(f"Failed to execute SQL query: {str(e)}")
-
-    def run_with_reasoning(self, query):
-        """Run a query and return both the result and the SQL query used"""
-        result, sql_query = self.run(query)
+            yield {'error': f"{ERROR_PREFIX}{str(e)}"}
+            return
+        
+        SQL_ROWS.inc(row_count)
+        if not from_cache:
+            self._cache_sql(query, sql_query, None)
+        yield {'done': True, 'row_count': row_count}
+    
+    def run_columnar(self, query):
+        """
+        Run a query and return the result as a ColumnarResult
+        
+        Concurrent identical questions share one execution, as in run.
+        
+        Returns:
+            (answer, None) for questions answered without SQL, otherwise
+            (ColumnarResult, sql_query)
+        """
+        if self.single_flight is None:
+            return self._run_columnar(query)
+        return self.single_flight.do(("columnar", self._question_key(query)), self._run_columnar, query)
+    
+    def _run_columnar(self, query):
+        """Run a query through the whole pipeline, collecting the result by column"""
+        answer, sql_query, messages, from_cache = self._prepare(query)
+        if sql_query is None:
+            return answer, None
+        
+        # Execute the SQL query, repairing it if it fails
+        result, sql_query = self._execute_with_repair(sql_query, messages, self._columnar_sql)
+        
+        if not from_cache:
+            self._cache_sql(query, sql_query, None)
+        return result, sql_query
+    
+    def _execute_sql(self, sql_query):
+        """Execute SQL, serving repeated queries from the result cache"""
+        if self.result_cache is not None:
+            result = self.result_cache.get(sql_query)
+            if result is not None:
+                return result
+        
+        result = sql_engine(sql_query, self.engine)
+        if self.result_cache is not None and not result.startswith(ERROR_PREFIX):
+            self.result_cache.put(sql_query, result)
+        return result
+    
+    async def _aexecute_sql(self, sql_query):
+        """Async version of _execute_sql"""
+        if self.result_cache is not None:
+            result = self.result_cache.get(sql_query)
+            if result is not None:
+                return result
         
+        result = await sql_engine_async(sql_query, self.async_engine)
+        if self.result_cache is not None and not result.startswith(ERROR_PREFIX):
+            self.result_cache.put(sql_query, result)
+        return result
+    
+    def _cached_sql(self, query):
+        """Look up previously generated SQL for the question"""
+        if self.query_cache is None:
+            return None
+        try:
+            with span("query_cache") as cache_span:
+                sql_query = self.query_cache.lookup(query)
+                cache_span.set(hit=sql_query is not None)
+        except Exception as e:
+            logger.error(f"Query cache lookup failed: {str(e)}")
+            return None
+        if sql_query is not None:
+            logger.info(f"Query cache hit: {query}")
+        return sql_query
+    
+    def _cache_sql(self, query, sql_query, result):
+        """Cache SQL that executed successfully"""
+        if self.query_cache is None or str(result).startswith(ERROR_PREFIX):
+            return
+        tables = self.schema_manager.get_snapshot().schemas.keys() & set(referenced_tables(sql_query, self.dialect))
+        try:
+            self.query_cache.store(query, sql_query, tables)
+        except Exception as e:
+            logger.error(f"Query cache store failed: {str(e)}")
+    
+    def _non_sql_answer(self, content):
+        """Return the direct answer if a single-call response declined to write SQL"""
+        content = content.strip()
+        if content.upper().startswith(NOT_SQL_PREFIX):
+            return content[len(NOT_SQL_PREFIX):].strip()
+        return None
+    
+    def _parse_sql_response(self, content):
+        """Get and clean the SQL query from a model response"""
+        try:
+            return self._clean_sql_query(content)
+        except ValueError as e:
+            logger.error(f"Invalid SQL query response: {str(e)}")
+            raise ValueError(str(e))
+    
+    def _format_response(self, result, sql_query):
+        """Format a run result for display"""
         if sql_query is None:
             # This was a general question or schema request, return just the answer
             return result
         else:
             # Format the SQL query with proper indentation
-            formatted_sql = sql_query.replace('SELECT', '\nSELECT').replace('FROM', '\nFROM').replace('JOIN', '\nJOIN').replace('WHERE', '\nWHERE')
+            parsed = try_parse_sql(sql_query, self.dialect)
+            formatted_sql = parsed.pretty() if parsed is not None else sql_query
             
             # Format the result in a simple list format
             if isinstance(result, list) and result:
@@ -183,3 +769,150 @@ class SchemaAwareAgent:
                 formatted_result = str(result)
             
             return f"SQL Query:\n{formatted_sql}\n\nResult:\n{formatted_result}"
+
+    def run_with_reasoning(self, query):
+        """Run a query and return both the result and the SQL query used"""
+        result, sql_query = self.run(query)
+        return self._format_response(result, sql_query)
+    
+    async def arun_with_reasoning(self, query):
+        """Async version of run_with_reasoning"""
+        result, sql_query = await self.arun(query)
+        return self._format_response(result, sql_query)
+    
+    def _question_key(self, query):
+        """Normalized question used to share work between identical questions"""
+        return normalize_question(query, self._case_sensitive)
+    
+    def _batch_groups(self, queries):
+        """Group identical questions (after normalization): [(question, [indices]), ...] in first-seen order"""
+        groups = {}
+        for index, query in enumerate(queries):
+            groups.setdefault(self._question_key(query), (query, []))[1].append(index)
+        return list(groups.values())
+    
+    def _batch_plan(self, groups):
+        """
+        Split a batch's distinct questions by whether they need a prompt
+        
+        Returns:
+            (ready, misses): {question: cached SQL} of the schema requests (None)
+            and query cache hits, which are answered without generation, and the
+            questions left to generate
+        """
+        self._ensure_schema_metadata()
+        ready = {}
+        misses = []
+        for query, _ in groups:
+            if self._is_schema_request(query):
+                ready[query] = None
+                continue
+            cached_sql = self._cached_sql(query)
+            if cached_sql is not None:
+                ready[query] = cached_sql
+            else:
+                misses.append(query)
+        return ready, misses
+    
+    def _batch_prompts(self, queries):
+        """Build the generation prompts of a chunk of questions with one relevance pass: {question: prompt}"""
+        prompts = self.prompt_generator.generate_prompts(queries, allow_non_sql=self.intent_mode == "single")
+        return dict(zip(queries, prompts))
+    
+    def _batch_event(self, query, indices, outcome):
+        """Result event of one batch question; outcome is (result, sql_query) or an exception"""
+        event = {'indices': indices, 'question': query}
+        if isinstance(outcome, ValueError):
+            event['error'] = str(outcome)
+        elif isinstance(outcome, Exception):
+            logger.error(f"Batch question failed: {str(outcome)}")
+            event['error'] = 'An unexpected error occurred'
+        else:
+            result, sql_query = outcome
+            event['sql'] = sql_query
+            event['response'] = self._format_response(result, sql_query)
+        return event
+    
+    def run_batch(self, queries, concurrency=None):
+        """
+        Answer several questions, yielding each result as soon as it is ready
+        
+        Identical questions are answered once and at most `concurrency` questions
+        (default BATCH_CONCURRENCY) are generated and executed at a time. Query
+        cache hits start first; the other questions have their tables scored in
+        chunks of `concurrency`, one relevance pass per chunk, each chunk starting
+        as soon as its prompts are built. Retrieval is speculative: prompts of
+        questions that turn out not to need SQL are discarded.
+        
+        Yields:
+            {'indices', 'question', 'sql', 'response'} or {'indices', 'question', 'error'},
+            where indices are the positions of the question in queries
+        """
+        concurrency = concurrency or self.batch_concurrency
+        groups = self._batch_groups(queries)
+        indices_of = dict(groups)
+        ready, misses = self._batch_plan(groups)
+        
+        def answer(query, system_prompt=None, cached_sql=None):
+            try:
+                return self.run(query, system_prompt, cached_sql)
+            except Exception as e:
+                return e
+        
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-query")
+        try:
+            futures = {
+                pool.submit(in_context(answer), query, cached_sql=cached_sql): query
+                for query, cached_sql in ready.items()
+            }
+            for start in range(0, len(misses), concurrency):
+                chunk = misses[start:start + concurrency]
+                for query, prompt in self._batch_prompts(chunk).items():
+                    futures[pool.submit(in_context(answer), query, prompt)] = query
+                # Send what finished while the chunk's prompts were built
+                for future in [future for future in futures if future.done()]:
+                    query = futures.pop(future)
+                    yield self._batch_event(query, indices_of[query], future.result())
+            for future in as_completed(futures):
+                query = futures[future]
+                yield self._batch_event(query, indices_of[query], future.result())
+        finally:
+            # A client that disconnects mid-batch stops the questions not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    async def arun_batch(self, queries, concurrency=None):
+        """Async version of run_batch"""
+        concurrency = concurrency or self.batch_concurrency
+        groups = self._batch_groups(queries)
+        ready, misses = await asyncio.to_thread(self._batch_plan, groups)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def answer(query, indices, system_prompt=None, cached_sql=None):
+            async with semaphore:
+                try:
+                    outcome = await self.arun(query, system_prompt, cached_sql)
+                except Exception as e:
+                    outcome = e
+            return self._batch_event(query, indices, outcome)
+        
+        indices_of = dict(groups)
+        tasks = [
+            asyncio.create_task(answer(query, indices_of[query], cached_sql=cached_sql))
+            for query, cached_sql in ready.items()
+        ]
+        try:
+            for start in range(0, len(misses), concurrency):
+                chunk = misses[start:start + concurrency]
+                prompts = await asyncio.to_thread(self._batch_prompts, chunk)
+                tasks.extend(
+                    asyncio.create_task(answer(query, indices_of[query], prompt)) for query, prompt in prompts.items()
+                )
+                # Send what finished while the chunk's prompts were built
+                for task in [task for task in tasks if task.done()]:
+                    tasks.remove(task)
+                    yield task.result()
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -1,6 +1,7 @@
 from typing import Any, Dict, List
 from sqlalchemy import text
 from ..database.connection import get_database_engine
+from ..tools.columnar import ColumnarResult, execute_columnar
 
 
 class DatabaseEngine:
@@ -14,4 +15,8 @@ class DatabaseEngine:
             result = conn.execute(text(query))
             columns = result.keys()
             results = [dict(zip(columns, row)) for row in result.fetchall()]
-            return results
\ No newline at end of file
+            return results
+
+    def execute_query_columnar(self, query: str) -> ColumnarResult:
+        """Execute a SQL query and return results as one typed array per column."""
+        return execute_columnar(query, self.engine)
@@ -0,0 +1,96 @@
+# backend/core/keyword_index.py
+import math
+from collections import Counter, defaultdict
+
+class KeywordIndex:
+    """Inverted index from schema keywords to tables with BM25 weights"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+
+        # keyword -> {table_name: term frequency}
+        self.postings = defaultdict(dict)
+        # table_name -> Counter of its keywords
+        self.table_terms = {}
+        self.table_lengths = {}
+        # lowercase table name -> table_name, for direct mentions
+        self.table_names = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.table_terms)
+
+    def __contains__(self, table_name):
+        return table_name in self.table_terms
+
+    def add_table(self, table_name, keywords):
+        """Index (or re-index) a table from its list of keywords"""
+        self.remove_table(table_name)
+
+        terms = Counter(keywords)
+        for term, frequency in terms.items():
+            self.postings[term][table_name] = frequency
+        self.table_terms[table_name] = terms
+        self.table_lengths[table_name] = sum(terms.values())
+        self.table_names[table_name.lower()] = table_name
+        self._total_length += self.table_lengths[table_name]
+
+    def remove_table(self, table_name):
+        """Remove a table from the index"""
+        terms = self.table_terms.pop(table_name, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(table_name, None)
+            if not postings:
+                del self.postings[term]
+        self.table_names.pop(table_name.lower(), None)
+        self._total_length -= self.table_lengths.pop(table_name)
+
+    def tables(self):
+        """Return all indexed table names"""
+        return list(self.table_terms)
+
+    def keyword_count(self, table_name):
+        """Return the number of distinct keywords indexed for a table"""
+        return len(self.table_terms.get(table_name, ()))
+
+    def find_table(self, term):
+        """Return the table whose name equals term (case-insensitive), if any"""
+        return self.table_names.get(term.lower())
+
+    def search(self, terms):
+        """
+        Score tables against a set of query terms
+
+        Args:
+            terms: Iterable of lowercase query terms
+
+        Returns:
+            Dict of table_name -> (number of distinct matched keywords, BM25 score)
+        """
+        results = {}
+        if not self.table_terms:
+            return results
+
+        table_count = len(self.table_terms)
+        average_length = self._total_length / table_count
+
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (table_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for table_name, frequency in postings.items():
+                length = self.table_lengths[table_name]
+                weight = idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                )
+                matches, score = results.get(table_name, (0, 0.0))
+                results[table_name] = (matches + 1, score + weight)
+
+        return results
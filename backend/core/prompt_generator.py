@@ -1,42 +1,140 @@
 # sql_agent/core/prompt_generator.py
+import re
+from ..config.settings import get_settings
 from ..utils.logger import get_logger
+from ..utils.tokens import count_tokens
+from ..utils.tracing import span
+from .relationship_analyzer import RelationshipAnalyzer
 
 logger = get_logger(__name__)
 
+# Prefix the model uses to decline writing SQL when generation and intent classification share one call
+NOT_SQL_PREFIX = "NOT_SQL:"
+
 class DynamicPromptGenerator:
-    def __init__(self, schema_manager, relevance_analyzer):
+    def __init__(self, schema_manager, relevance_analyzer, token_budget=None, wide_table_columns=None,
+                 relationship_analyzer=None):
+        settings = get_settings()
         self.schema_manager = schema_manager
         self.relevance_analyzer = relevance_analyzer
+        # Foreign-key graph used to add bridge tables between unconnected relevant tables
+        self.relationship_analyzer = relationship_analyzer or RelationshipAnalyzer(schema_manager)
+        # Token budget of the schema section, and the column count above which tables are written compactly
+        self.token_budget = token_budget or settings.PROMPT_SCHEMA_TOKENS
+        self.wide_table_columns = wide_table_columns or settings.PROMPT_WIDE_TABLE_COLUMNS
     
-    def _generate_schema_section(self, schemas, relevant_tables):
-        """Generate the schema section of the prompt"""
-        schema_lines = ["Database Schema:\n"]
-        
-        for table_name, schema in schemas.items():
-            if table_name in relevant_tables:
-                schema_lines.extend([
-                    f"Table: {table_name}",
-                    "Columns:"
-                ])
-                
-                for column in schema['columns']:
-                    nullable = "NULL" if column['nullable'] else "NOT NULL"
-                    primary_key = "PRIMARY KEY" if column['primary_key'] else ""
-                    schema_lines.append(f"- {column['name']}: {column['type']} {primary_key} {nullable}")
-                schema_lines.append("")
+    def _query_terms(self, query):
+        """Lowercase words of the query with naive singular forms, for column ranking"""
+        terms = set()
+        for term in re.findall(r'[a-z0-9]+', query.lower()):
+            terms.add(term)
+            if len(term) > 3 and term.endswith('s'):
+                terms.add(term[:-1])
+        return terms
+    
+    def _rank_columns(self, schema, query_terms):
+        """
+        Order a table's columns by relevance to the query
         
-        return "\n".join(schema_lines)
+        Key columns come first (they are needed for joins), then columns whose
+        name shares a word with the query, then the rest in schema order.
+        """
+        fk_columns = {column for fk in schema.get('foreign_keys', []) for column in fk['constrained_columns']}
+        
+        def rank(item):
+            position, column = item
+            if column['primary_key'] or column['name'] in fk_columns:
+                return (0, position)
+            words = set(column['name'].lower().split('_'))
+            return (1 if words & query_terms else 2, position)
+        
+        return [column for _, column in sorted(enumerate(schema['columns']), key=rank)]
+    
+    def _format_table(self, table_name, columns):
+        """Full form: one line per column"""
+        lines = [f"Table: {table_name}", "Columns:"]
+        for column in columns:
+            nullable = "NULL" if column['nullable'] else "NOT NULL"
+            primary_key = "PRIMARY KEY" if column['primary_key'] else ""
+            lines.append(f"- {column['name']}: {column['type']} {primary_key} {nullable}")
+        lines.append("")
+        return "\n".join(lines)
     
-    def _generate_relationships_section(self, schemas, relevant_tables):
-        """Generate the relationships section of the prompt"""
+    def _format_table_compact(self, table_name, columns, omitted=0):
+        """Compact DDL-style form for wide tables: the table on a single line"""
+        definitions = []
+        for column in columns:
+            definition = f"{column['name']} {column['type']}"
+            if column['primary_key']:
+                definition += " PK"
+            elif not column['nullable']:
+                definition += " NOT NULL"
+            definitions.append(definition)
+        if omitted:
+            definitions.append(f"... {omitted} more columns")
+        return f"{table_name}({', '.join(definitions)})\n"
+    
+    def _generate_schema_section(self, query, schemas, relevant_tables, bridge_tables=()):
+        """
+        Generate the schema section of the prompt within the token budget
+        
+        Returns:
+            (section, tables), where tables are the relevant tables that fit
+        
+        Wide tables are written in compact form. When the section is over budget,
+        the least relevant tables are cut down to their key and query-matching
+        columns, and then dropped, keeping at least the most relevant table.
+        Bridge tables come last, so they are cut down first, but are not dropped.
+        """
+        query_terms = self._query_terms(query)
+        tables = []
+        for table_name in list(relevant_tables) + list(bridge_tables):
+            schema = schemas.get(table_name)
+            if schema is None:
+                continue
+            columns = self._rank_columns(schema, query_terms)
+            if len(columns) > self.wide_table_columns:
+                text = self._format_table_compact(table_name, columns)
+            else:
+                text = self._format_table(table_name, schema['columns'])
+            tables.append([table_name, schema, columns, text])
+        
+        def total_tokens():
+            return sum(count_tokens(text) for _, _, _, text in tables)
+        
+        # Shrink the least relevant tables first
+        for entry in reversed(tables):
+            if total_tokens() <= self.token_budget:
+                break
+            table_name, schema, columns, _ = entry
+            fk_columns = {column for fk in schema.get('foreign_keys', []) for column in fk['constrained_columns']}
+            kept = [
+                column for column in columns
+                if column['primary_key'] or column['name'] in fk_columns
+                or set(column['name'].lower().split('_')) & query_terms
+            ]
+            entry[3] = self._format_table_compact(table_name, kept, len(columns) - len(kept))
+        
+        droppable = [entry for entry in tables if entry[0] not in bridge_tables]
+        while len(droppable) > 1 and total_tokens() > self.token_budget:
+            dropped = droppable.pop()
+            tables.remove(dropped)
+            logger.info(f"Prompt budget: dropped table {dropped[0]}")
+        
+        section = "Database Schema:\n\n" + "\n".join(text for _, _, _, text in tables)
+        return section, [table_name for table_name, _, _, _ in tables]
+    
+    def _generate_relationships_section(self, tables, bridge_tables=()):
+        """Generate the relationships section: join conditions between the tables in the prompt"""
         relationship_lines = ["Table Relationships:\n"]
         
-        for table_name, schema in schemas.items():
-            if table_name in relevant_tables and schema.get('foreign_keys'):
-                relationship_lines.append(f"{table_name} relationships:")
-                for fk in schema['foreign_keys']:
-                    relationship_lines.append(f"- {fk['constrained_columns']} -> {fk['referred_table']}.{fk['referred_columns']}")
-                relationship_lines.append("")
+        for edge in self.relationship_analyzer.join_edges(tables):
+            relationship_lines.append(f"- {edge.table} JOIN {edge.join_target()} ON {edge.condition()}")
+        if bridge_tables:
+            relationship_lines.append(
+                f"\nJoin through {', '.join(bridge_tables)} to connect tables that are not linked directly."
+            )
+        relationship_lines.append("")
         
         return "\n".join(relationship_lines)
     
@@ -47,7 +145,7 @@ class DynamicPromptGenerator:
 Rules:
 1. The response must be a single SQL SELECT query
 2. The query must start with SELECT and end with a semicolon
-3. Only use tables and columns that exist in the schema above
+3. Only use tables and columns that exist in the schema below
 4. Do not include any text before or after the query
 5. Do not use markdown code blocks or backticks
 6. For any string comparison in WHERE clauses, use COLLATE NOCASE to make it case-insensitive
@@ -67,20 +165,72 @@ Note: Always use COLLATE NOCASE in WHERE clauses when comparing strings to make
 - Correct: WHERE device_name COLLATE NOCASE LIKE 'lb%'
 - Correct: WHERE vip_address COLLATE NOCASE IN ('10.0.0.1', '10.0.0.2')"""
     
-    def generate_prompt(self, query):
-        """Generate a prompt with relevant schema information"""
-        # Get all available schemas
-        schemas = self.schema_manager.get_all_schemas()
-        
-        # Analyze which tables are relevant to the query
-        relevant_tables = self.relevance_analyzer.analyze_query(query)
-        
-        # Build the prompt sections
-        prompt_sections = [
-            "You are a SQL expert assistant. You have access to the following database schema:\n",
-            self._generate_schema_section(schemas, relevant_tables),
-            self._generate_relationships_section(schemas, relevant_tables),
+    def _generate_non_sql_section(self):
+        """Generate the section that lets the model answer non-SQL questions directly"""
+        return f"""Exception: if the question cannot be answered by querying this database (for example a general question about SQL or databases), do not write a query. Instead respond with {NOT_SQL_PREFIX} followed by a clear, concise answer.
+
+Example: {NOT_SQL_PREFIX} A LEFT JOIN returns all rows from the left table, even when there is no match in the right table."""
+    
+    def _generate_static_prefix(self, allow_non_sql):
+        """Instructions that are identical on every call, so provider prompt caching can reuse them"""
+        sections = [
+            "You are a SQL expert assistant. The database schema you have access to follows these instructions.\n",
             self._generate_instructions_section()
         ]
+        if allow_non_sql:
+            sections.append(self._generate_non_sql_section())
+        return "\n".join(sections)
+    
+    def generate_prompt(self, query, allow_non_sql=False):
+        """
+        Generate a prompt with relevant schema information
+        
+        The static instructions come first and the query-specific schema last,
+        so consecutive prompts share the longest possible prefix.
         
-        return "\n".join(prompt_sections)
\ No newline at end of file
+        Args:
+            query: The user query
+            allow_non_sql: Let the model reply with NOT_SQL_PREFIX and an answer instead of SQL
+        """
+        return self.generate_prompts([query], allow_non_sql)[0]
+    
+    def generate_prompts(self, queries, allow_non_sql=False):
+        """
+        Generate the prompts of several queries, scoring table relevance for all of them in one pass
+        
+        Returns:
+            One prompt per query
+        """
+        # Schemas from the shared in-process snapshot
+        schemas = self.schema_manager.get_snapshot().schemas
+        
+        # Analyze which tables are relevant to each query, adding the tables needed to join them
+        with span("retrieval", queries=len(queries)) as retrieval_span:
+            all_relevant_tables = self.relevance_analyzer.analyze_queries(queries)
+            all_bridge_tables = [
+                self.relationship_analyzer.expand_tables(relevant_tables)[0]
+                for relevant_tables in all_relevant_tables
+            ]
+            retrieval_span.set(
+                tables=sum(map(len, all_relevant_tables)),
+                bridges=sum(map(len, all_bridge_tables))
+            )
+        
+        prompts = []
+        for query, relevant_tables, bridge_tables in zip(queries, all_relevant_tables, all_bridge_tables):
+            with span("prompt_build") as build_span:
+                schema_section, tables = self._generate_schema_section(query, schemas, relevant_tables, bridge_tables)
+                bridge_tables = [table_name for table_name in bridge_tables if table_name in tables]
+                
+                # Build the prompt sections
+                prompt = "\n".join([
+                    self._generate_static_prefix(allow_non_sql),
+                    "",
+                    schema_section,
+                    self._generate_relationships_section(tables, bridge_tables)
+                ])
+                tokens = count_tokens(prompt)
+                build_span.set(tokens=tokens, tables=len(tables))
+            logger.info(f"Prompt: {tokens} tokens, {len(tables)} tables ({len(bridge_tables)} bridging)")
+            prompts.append(prompt)
+        return prompts
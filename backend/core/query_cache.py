@@ -0,0 +1,254 @@
+# backend/core/query_cache.py
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+import atexit
+import re
+import time
+import numpy as np
+from sqlalchemy import MetaData, Table, Column, String, Float, Integer, JSON, LargeBinary, bindparam
+from ..config.settings import get_settings
+from ..database.connection import get_engine
+from ..utils.helpers import normalize_question
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class CachedQuery:
+    """A cached question -> SQL entry"""
+
+    def __init__(self, key, question, sql_query, tables, schema_hash, embedding=None,
+                 created_at=None, last_used=None, hits=0):
+        self.key = key
+        self.question = question
+        self.sql_query = sql_query
+        self.tables = tables
+        self.schema_hash = schema_hash
+        self.embedding = embedding
+        self.created_at = created_at or time.time()
+        self.last_used = last_used or self.created_at
+        self.hits = hits
+
+class QueryCache:
+    """
+    Persistent natural-language question -> SQL cache
+
+    Exact hits are matched on the normalized question and near-duplicates by
+    embedding similarity. Every entry records a hash of the schemas of the tables
+    its SQL reads, so a schema change invalidates it. Entries expire after a TTL
+    and the least recently used ones are evicted beyond max_entries. Hit counts
+    and last-use times are kept in memory and written out every flush_interval seconds.
+    """
+
+    def __init__(self, schema_manager, model=None, cache_db_url=None, max_entries=None,
+                 ttl=None, similarity=None, case_sensitive=False, flush_interval=30.0):
+        settings = get_settings()
+        self.schema_manager = schema_manager
+        # Provides embed(texts); None disables near-duplicate matching
+        self.model = model
+        self.max_entries = max_entries or settings.QUERY_CACHE_MAX_ENTRIES
+        self.ttl = settings.QUERY_CACHE_TTL if ttl is None else ttl
+        self.similarity = similarity or settings.QUERY_CACHE_SIMILARITY
+        # Whether questions differing only in case get separate entries (see normalize_question)
+        self.case_sensitive = case_sensitive
+        self.flush_interval = flush_interval
+
+        if cache_db_url is None:
+            cache_db_url = settings.QUERY_CACHE_URL
+        if cache_db_url.startswith("sqlite:///"):
+            Path(cache_db_url[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+
+        self.cache_engine = get_engine(cache_db_url)
+        self.metadata = MetaData()
+        self.cache_table = Table(
+            'query_cache',
+            self.metadata,
+            Column('question_key', String, primary_key=True),
+            Column('question', String),
+            Column('sql_query', String),
+            Column('tables', JSON),
+            Column('schema_hash', String),
+            Column('embedding', LargeBinary),
+            Column('created_at', Float),
+            Column('last_used', Float),
+            Column('hits', Integer)
+        )
+        self.metadata.create_all(self.cache_engine)
+
+        # Most recently used entries last
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._embedding_keys = []
+        self._embedding_matrix = None
+        # Keys whose hits and last use have not been written out yet
+        self._dirty = set()
+        self._flushed_at = time.monotonic()
+
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        """Load persisted entries, most recently used last"""
+        with self.cache_engine.connect() as conn:
+            rows = conn.execute(
+                self.cache_table.select().order_by(self.cache_table.c.last_used)
+            ).fetchall()
+
+        for row in rows:
+            embedding = np.frombuffer(row.embedding, dtype=np.float32) if row.embedding else None
+            self._entries[row.question_key] = CachedQuery(
+                row.question_key, row.question, row.sql_query, row.tables or [],
+                row.schema_hash, embedding, row.created_at, row.last_used, row.hits or 0
+            )
+        self._embedding_matrix = None
+        logger.info(f"Loaded {len(self._entries)} cached queries")
+
+    def _value_tokens(self, question):
+        """Literal values in a question (numbers, addresses, hyphenated names, quoted strings)"""
+        quoted = re.findall(r"'[^']*'|\"[^\"]*\"", question)
+        tokens = re.findall(r"[\w%.\-]*[\d\-%.][\w%.\-]*", question.lower())
+        return set(quoted) | {token.strip('.-') for token in tokens if token.strip('.-')}
+
+    def _is_valid(self, entry):
+        """Check an entry against its TTL and the current schemas of its tables"""
+        if self.ttl and time.time() - entry.created_at > self.ttl:
+            return False
+        return entry.schema_hash == self.schema_manager.fingerprint_tables(entry.tables)
+
+    def _embed(self, question):
+        try:
+            return np.asarray(self.model.embed([question])[0], dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Query cache embedding failed: {str(e)}")
+            return None
+
+    def _nearest(self, embedding):
+        """Return the key of the most similar cached question above the threshold"""
+        if self._embedding_matrix is None:
+            self._embedding_keys = [key for key, entry in self._entries.items() if entry.embedding is not None]
+            self._embedding_matrix = (
+                np.vstack([self._entries[key].embedding for key in self._embedding_keys])
+                if self._embedding_keys else None
+            )
+        if self._embedding_matrix is None:
+            return None
+
+        scores = self._embedding_matrix @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity:
+            return self._embedding_keys[best]
+        return None
+
+    def _remove(self, key):
+        """Drop an entry from memory and disk (lock must be held)"""
+        entry = self._entries.pop(key, None)
+        self._dirty.discard(key)
+        if entry is not None and entry.embedding is not None:
+            self._embedding_matrix = None
+        with self.cache_engine.begin() as conn:
+            conn.execute(self.cache_table.delete().where(self.cache_table.c.question_key == key))
+
+    def lookup(self, question):
+        """
+        Return cached SQL for the question, or None on a miss
+
+        Args:
+            question: The user query
+        """
+        key = normalize_question(question, self.case_sensitive)
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None and self.model is not None and self._entries:
+            embedding = self._embed(key)
+            if embedding is not None:
+                with self._lock:
+                    near_key = self._nearest(embedding)
+                    entry = self._entries.get(near_key) if near_key else None
+                # Near-duplicates must mention exactly the same literal values
+                if entry is not None and self._value_tokens(entry.key) != self._value_tokens(key):
+                    entry = None
+
+        if entry is None:
+            return None
+
+        with self._lock:
+            if not self._is_valid(entry):
+                self._remove(entry.key)
+                return None
+
+            entry.last_used = time.time()
+            entry.hits += 1
+            self._entries.move_to_end(entry.key)
+            self._dirty.add(entry.key)
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush()
+        return entry.sql_query
+
+    def _flush(self):
+        """Write pending hit counts and last-use times in one statement (lock must be held)"""
+        rows = [
+            {'key': key, 'b_last_used': self._entries[key].last_used, 'b_hits': self._entries[key].hits}
+            for key in self._dirty if key in self._entries
+        ]
+        if rows:
+            with self.cache_engine.begin() as conn:
+                conn.execute(
+                    self.cache_table.update()
+                    .where(self.cache_table.c.question_key == bindparam('key'))
+                    .values(last_used=bindparam('b_last_used'), hits=bindparam('b_hits')),
+                    rows
+                )
+        self._dirty.clear()
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        """Write pending hit counts and last-use times now"""
+        with self._lock:
+            self._flush()
+
+    def store(self, question, sql_query, tables):
+        """
+        Cache the SQL generated for a question
+
+        Args:
+            question: The user query
+            sql_query: SQL that executed successfully for it
+            tables: Tables the SQL reads; their schemas key the entry
+        """
+        key = normalize_question(question, self.case_sensitive)
+        tables = sorted(tables)
+        embedding = self._embed(key) if self.model is not None else None
+        entry = CachedQuery(key, question, sql_query, tables, self.schema_manager.fingerprint_tables(tables), embedding)
+
+        with self._lock:
+            with self.cache_engine.begin() as conn:
+                conn.execute(self.cache_table.delete().where(self.cache_table.c.question_key == key))
+                conn.execute(self.cache_table.insert().values(
+                    question_key=key,
+                    question=question,
+                    sql_query=sql_query,
+                    tables=tables,
+                    schema_hash=entry.schema_hash,
+                    embedding=embedding.tobytes() if embedding is not None else None,
+                    created_at=entry.created_at,
+                    last_used=entry.last_used,
+                    hits=0
+                ))
+            self._entries.pop(key, None)
+            self._dirty.discard(key)
+            self._entries[key] = entry
+            self._embedding_matrix = None
+
+            # Evict least recently used entries
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            with self.cache_engine.begin() as conn:
+                conn.execute(self.cache_table.delete())
+            self._entries.clear()
+            self._dirty.clear()
+            self._embedding_matrix = None
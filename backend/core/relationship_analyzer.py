@@ -1,41 +1,187 @@
 # sql_agent/core/relationship_analyzer.py
-from sqlalchemy import inspect
+from collections import deque
+from threading import Lock
+from ..config.settings import get_settings
 from ..utils.logger import get_logger
-from backend.database.connection import get_database_engine
 
 logger = get_logger(__name__)
 
+class JoinEdge:
+    """A foreign key between two tables, usable in either direction"""
+
+    def __init__(self, table, columns, referred_table, referred_columns):
+        self.table = table
+        self.columns = list(columns)
+        self.referred_table = referred_table
+        self.referred_columns = list(referred_columns)
+
+    def other(self, table_name):
+        return self.referred_table if table_name == self.table else self.table
+
+    @property
+    def referred_alias(self):
+        """Name of the referred side in the join; a self-referencing key needs an alias for it"""
+        return f"{self.referred_table}_ref" if self.referred_table == self.table else self.referred_table
+
+    def join_target(self):
+        """Referred table as written after JOIN (with its alias for a self-referencing key)"""
+        if self.referred_alias == self.referred_table:
+            return self.referred_table
+        return f"{self.referred_table} AS {self.referred_alias}"
+
+    def condition(self):
+        """Join condition over every column of the key (composite keys included)"""
+        return " AND ".join(
+            f"{self.table}.{column} = {self.referred_alias}.{referred_column}"
+            for column, referred_column in zip(self.columns, self.referred_columns)
+        )
+
 class RelationshipAnalyzer:
-    def __init__(self, schema_manager):
+    """
+    Foreign-key graph over the schema snapshot
+
+    Shortest join paths are precomputed for every pair of tables when the schema
+    has at most precompute_max_tables tables; larger schemas compute them per
+    source table on first use. Either way they are rebuilt when the snapshot changes.
+    """
+
+    def __init__(self, schema_manager, max_hops=None, precompute_max_tables=None):
+        settings = get_settings()
         self.schema_manager = schema_manager
-        self.engine = get_database_engine()
-    
+        # Longest join path (in foreign keys) considered when bridging two tables
+        self.max_hops = max_hops or settings.JOIN_PATH_MAX_HOPS
+        self.precompute_max_tables = precompute_max_tables or settings.JOIN_PATH_PRECOMPUTE_MAX_TABLES
+
+        self._version = None
+        # table -> [JoinEdge, ...] touching it
+        self._adjacency = {}
+        # source table -> {target table: (JoinEdge, ...)}
+        self._paths = {}
+        self._lock = Lock()
+
+    def _build(self, snapshot):
+        """Build the graph (and, for small schemas, all-pairs paths) from a snapshot"""
+        adjacency = {table_name: [] for table_name in snapshot.schemas}
+        for table_name, schema in snapshot.schemas.items():
+            for fk in schema.get('foreign_keys', []):
+                if fk['referred_table'] not in adjacency:
+                    continue
+                edge = JoinEdge(table_name, fk['constrained_columns'], fk['referred_table'], fk['referred_columns'])
+                adjacency[table_name].append(edge)
+                # A self-referencing key (e.g. employee.manager_id -> employee.id) is listed once
+                if fk['referred_table'] != table_name:
+                    adjacency[fk['referred_table']].append(edge)
+
+        self._adjacency = adjacency
+        self._paths = {}
+        if len(adjacency) <= self.precompute_max_tables:
+            for table_name in adjacency:
+                self._paths[table_name] = self._shortest_paths(table_name)
+        self._version = snapshot.version
+
+    def _ensure_graph(self):
+        snapshot = self.schema_manager.get_snapshot()
+        if self._version != snapshot.version:
+            with self._lock:
+                if self._version != snapshot.version:
+                    self._build(snapshot)
+
+    def _shortest_paths(self, source):
+        """Breadth-first search: target table -> edges of a shortest path from source"""
+        paths = {source: ()}
+        queue = deque([source])
+        while queue:
+            table_name = queue.popleft()
+            path = paths[table_name]
+            if len(path) >= self.max_hops:
+                continue
+            for edge in self._adjacency.get(table_name, []):
+                neighbor = edge.other(table_name)
+                # Self-referencing keys never lead to another table
+                if neighbor != table_name and neighbor not in paths:
+                    paths[neighbor] = path + (edge,)
+                    queue.append(neighbor)
+        return paths
+
+    def join_path(self, source, target):
+        """Return the edges of a shortest join path between two tables, or None if unconnected"""
+        self._ensure_graph()
+        paths = self._paths.get(source)
+        if paths is None:
+            if source not in self._adjacency:
+                return None
+            paths = self._shortest_paths(source)
+            with self._lock:
+                self._paths[source] = paths
+        return paths.get(target)
+
+    def expand_tables(self, tables):
+        """
+        Add the bridge tables needed to join the given tables
+
+        Each table is connected to the tables already selected by the shortest
+        available path; tables that cannot be reached are kept unconnected.
+
+        Returns:
+            (bridge_tables, edges), bridge tables in the order they were added
+        """
+        self._ensure_graph()
+        selected = []
+        bridges = []
+        edges = []
+        for table_name in tables:
+            if selected and table_name not in selected:
+                best = None
+                for member in selected:
+                    path = self.join_path(member, table_name)
+                    if path is not None and (best is None or len(path) < len(best)):
+                        best = path
+                if best is not None:
+                    for edge in best:
+                        if edge not in edges:
+                            edges.append(edge)
+                        for bridge in (edge.table, edge.referred_table):
+                            if bridge not in selected and bridge != table_name and bridge not in tables:
+                                selected.append(bridge)
+                                bridges.append(bridge)
+            if table_name not in selected:
+                selected.append(table_name)
+        return bridges, edges
+
+    def join_edges(self, tables):
+        """Return every foreign key between tables of the given set"""
+        self._ensure_graph()
+        table_set = set(tables)
+        edges = []
+        for table_name in tables:
+            for edge in self._adjacency.get(table_name, []):
+                if edge.table == table_name and edge.referred_table in table_set:
+                    edges.append(edge)
+        return edges
+
     def analyze_relationships(self, table_name):
         """Analyze relationships for a specific table"""
-        inspector = inspect(self.engine)
+        self._ensure_graph()
+        schema = self.schema_manager.get_snapshot().schemas.get(table_name, {})
         relationships = []
-        
+
         # Get primary key information
-        pk_columns = inspector.get_pk_constraint(table_name)['constrained_columns']
-        for pk_col in pk_columns:
-            relationships.append({
-                'source': f"{table_name}.{pk_col}",
-                'target': f"{table_name}.{pk_col}",
-                'relationship_type': 'primary_key',
-                'description': f"Primary Key: {pk_col}"
-            })
-        
-        # Get foreign key information
-        foreign_keys = inspector.get_foreign_keys(table_name)
-        for fk in foreign_keys:
-            source_col = fk['constrained_columns'][0]
-            target_table = fk['referred_table']
-            target_col = fk['referred_columns'][0]
+        for column in schema.get('columns', []):
+            if column['primary_key']:
+                relationships.append({
+                    'source': f"{table_name}.{column['name']}",
+                    'target': f"{table_name}.{column['name']}",
+                    'relationship_type': 'primary_key',
+                    'description': f"Primary Key: {column['name']}"
+                })
+
+        # Get foreign key information, in both directions
+        for edge in self._adjacency.get(table_name, []):
             relationships.append({
-                'source': f"{table_name}.{source_col}",
-                'target': f"{target_table}.{target_col}",
-                'relationship_type': 'foreign_key',
-                'description': f"Foreign Key: {source_col} -> {target_table}.{target_col}"
+                'source': f"{edge.table}.({', '.join(edge.columns)})",
+                'target': f"{edge.referred_table}.({', '.join(edge.referred_columns)})",
+                'relationship_type': 'foreign_key' if edge.table == table_name else 'referenced_by',
+                'description': f"Join: {edge.condition()}"
             })
-        
-        return relationships
\ No newline at end of file
+
+        return relationships
@@ -0,0 +1,178 @@
+# backend/core/relevance_model.py
+from threading import Lock, local
+import json
+import socket
+import numpy as np
+from ..config.settings import get_settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class RelevanceModel:
+    """Transformers pipelines for schema relevance, loaded on first use"""
+
+    def __init__(self, nli_model=None, embedding_model=None, batch_size=None):
+        settings = get_settings()
+        self.nli_model = nli_model or settings.RELEVANCE_MODEL
+        self.embedding_model = embedding_model or settings.EMBEDDING_MODEL
+        self.batch_size = batch_size or settings.RELEVANCE_BATCH_SIZE
+
+        self._classifier = None
+        self._extractor = None
+        self._lock = Lock()
+
+    def _load_pipeline(self, task, model_name):
+        # transformers (and torch) are imported here so importing backend.core stays fast
+        from transformers import pipeline
+        logger.info(f"Loading {task} model {model_name}")
+        return pipeline(task, model=model_name)
+
+    @property
+    def classifier(self):
+        """Zero-shot classification pipeline"""
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    self._classifier = self._load_pipeline("zero-shot-classification", self.nli_model)
+        return self._classifier
+
+    @property
+    def extractor(self):
+        """Feature extraction pipeline used for embeddings"""
+        if self._extractor is None:
+            with self._lock:
+                if self._extractor is None:
+                    self._extractor = self._load_pipeline("feature-extraction", self.embedding_model)
+        return self._extractor
+
+    def is_loaded(self, mode):
+        """Check whether the pipeline needed by a relevance mode is loaded"""
+        if mode == "nli":
+            return self._classifier is not None
+        if mode == "embedding":
+            return self._extractor is not None
+        return True
+
+    def warm_up(self, mode):
+        """Load the pipeline needed by a relevance mode ahead of the first query"""
+        if mode == "nli":
+            self.classifier
+        elif mode == "embedding":
+            self.extractor
+
+    def classify(self, query, labels, hypothesis_template):
+        """
+        Score every label against the query in one batched classifier call
+
+        Returns:
+            List of scores in the same order as labels
+        """
+        return self.classify_many([query], labels, hypothesis_template)[0]
+
+    def classify_many(self, queries, labels, hypothesis_template):
+        """
+        Score the same labels against several queries in one batched classifier call
+
+        Returns:
+            One list of scores per query, in the same order as labels
+        """
+        # multi_label scores every label independently, which matches the
+        # per-table entailment score of single-label calls
+        results = self.classifier(
+            list(queries),
+            candidate_labels=list(labels),
+            hypothesis_template=hypothesis_template,
+            multi_label=True,
+            batch_size=self.batch_size
+        )
+        if isinstance(results, dict):
+            results = [results]
+
+        all_scores = []
+        for result in results:
+            scores = dict(zip(result['labels'], result['scores']))
+            all_scores.append([scores[label] for label in labels])
+        return all_scores
+
+    def embed(self, texts):
+        """Embed texts into an array of L2-normalized mean-pooled vectors"""
+        vectors = []
+        for output in self.extractor(list(texts)):
+            # Each output has shape [1, tokens, hidden]; mean-pool over tokens
+            vectors.append(np.asarray(output[0], dtype=np.float32).mean(axis=0))
+        matrix = np.vstack(vectors)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+class RemoteRelevanceModel:
+    """Client for a shared relevance model served by backend.core.relevance_server"""
+
+    def __init__(self, socket_path, embedding_model=None, timeout=30.0):
+        self.socket_path = socket_path
+        # Must match the server's EMBEDDING_MODEL; used to fingerprint stored embeddings
+        self.embedding_model = embedding_model or get_settings().EMBEDDING_MODEL
+        self.timeout = timeout
+        # One connection per thread, reused across requests
+        self._local = local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock, sock.makefile('rb')
+
+    def _request(self, payload):
+        """Send one newline-delimited JSON request and wait for its reply"""
+        message = (json.dumps(payload) + "\n").encode("utf-8")
+        for attempt in range(2):
+            if getattr(self._local, 'conn', None) is None:
+                self._local.conn = self._connect()
+            sock, reader = self._local.conn
+            try:
+                sock.sendall(message)
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("Relevance server closed the connection")
+                break
+            except OSError:
+                # Stale connection (e.g. the server restarted): reconnect once
+                sock.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(f"Relevance server error: {reply['error']}")
+        return reply['result']
+
+    def is_loaded(self, mode):
+        if mode not in ("nli", "embedding"):
+            return True
+        try:
+            return mode in self._request({'op': 'ping'})['loaded']
+        except Exception:
+            return False
+
+    def warm_up(self, mode):
+        # The server loads its models at startup; this only checks it is reachable
+        self._request({'op': 'ping'})
+
+    def classify(self, query, labels, hypothesis_template):
+        return self._request({
+            'op': 'classify',
+            'query': query,
+            'labels': list(labels),
+            'hypothesis_template': hypothesis_template
+        })
+
+    def embed(self, texts):
+        return np.asarray(self._request({'op': 'embed', 'texts': list(texts)}), dtype=np.float32)
+
+def get_relevance_model(nli_model=None, batch_size=None):
+    """Return the remote model when RELEVANCE_SOCKET is set, otherwise an in-process one"""
+    settings = get_settings()
+    if settings.RELEVANCE_SOCKET:
+        return RemoteRelevanceModel(settings.RELEVANCE_SOCKET)
+    return RelevanceModel(nli_model=nli_model, batch_size=batch_size)
@@ -0,0 +1,165 @@
+# backend/core/relevance_server.py
+"""
+Shared relevance scoring server.
+
+Loads the relevance model once and serves every web worker on the box over a
+Unix socket, so N workers share one copy of the weights instead of loading N.
+Workers use it by setting RELEVANCE_SOCKET to the same path.
+
+    python -m backend.core.relevance_server --socket /tmp/sql-agent-relevance.sock
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from .relevance_model import RelevanceModel
+from ..config.settings import get_settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class _PendingRequest:
+    """A request waiting for the model thread"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+class RelevanceServer:
+    """Serve one RelevanceModel to many clients, batching concurrent requests"""
+
+    def __init__(self, socket_path, modes=("nli",), model=None, batch_window_ms=None, max_batch=64):
+        settings = get_settings()
+        self.socket_path = socket_path
+        self.modes = tuple(modes)
+        self.model = model or RelevanceModel()
+        self.batch_window = (settings.RELEVANCE_BATCH_WINDOW_MS if batch_window_ms is None else batch_window_ms) / 1000
+        self.max_batch = max_batch
+
+        self._queue = queue.Queue()
+        self._server = None
+
+    def _collect_batch(self):
+        """Wait for one request, then gather whatever else arrives within the batch window"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        """Run a batch of requests with as few model calls as possible"""
+        # Embedding requests are merged into a single call
+        embeds = [request for request in batch if request.payload['op'] == 'embed']
+        if embeds:
+            texts = [text for request in embeds for text in request.payload['texts']]
+            try:
+                vectors = self.model.embed(texts).tolist() if texts else []
+                offset = 0
+                for request in embeds:
+                    count = len(request.payload['texts'])
+                    request.result = vectors[offset:offset + count]
+                    offset += count
+            except Exception as e:
+                for request in embeds:
+                    request.error = str(e)
+
+        # Classification requests with the same labels share one call
+        groups = {}
+        for request in batch:
+            if request.payload['op'] == 'classify':
+                key = (tuple(request.payload['labels']), request.payload['hypothesis_template'])
+                groups.setdefault(key, []).append(request)
+
+        for (labels, hypothesis_template), requests in groups.items():
+            try:
+                all_scores = self.model.classify_many(
+                    [request.payload['query'] for request in requests],
+                    labels,
+                    hypothesis_template
+                )
+                for request, scores in zip(requests, all_scores):
+                    request.result = scores
+            except Exception as e:
+                for request in requests:
+                    request.error = str(e)
+
+        for request in batch:
+            request.done.set()
+
+    def _model_loop(self):
+        """Run model calls on a single thread so requests can be batched"""
+        while True:
+            self._run_batch(self._collect_batch())
+
+    def submit(self, payload):
+        """Handle one decoded request and return the reply"""
+        op = payload.get('op')
+        if op == 'ping':
+            loaded = [mode for mode in ("nli", "embedding") if self.model.is_loaded(mode)]
+            return {'result': {'loaded': loaded}}
+        if op not in ('classify', 'embed'):
+            return {'error': f"Unknown op: {op}"}
+
+        request = _PendingRequest(payload)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            return {'error': request.error}
+        return {'result': request.result}
+
+    def serve_forever(self):
+        """Load the models, then serve requests until interrupted"""
+        for mode in self.modes:
+            self.model.warm_up(mode)
+        threading.Thread(target=self._model_loop, name="relevance-model", daemon=True).start()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                # One connection carries many newline-delimited JSON requests
+                for line in self.rfile:
+                    try:
+                        reply = server.submit(json.loads(line))
+                    except Exception as e:
+                        reply = {'error': str(e)}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        self._server = _UnixServer(self.socket_path, Handler)
+        logger.info(f"Relevance server listening on {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+if __name__ == '__main__':
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Serve the schema relevance model over a Unix socket")
+    parser.add_argument('--socket', default=settings.RELEVANCE_SOCKET or "/tmp/sql-agent-relevance.sock",
+                        help="Unix socket path (set RELEVANCE_SOCKET to the same path in the web workers)")
+    parser.add_argument('--modes', nargs='+', default=[settings.RELEVANCE_MODE],
+                        choices=["nli", "embedding"], help="Models to load at startup")
+    args = parser.parse_args()
+
+    RelevanceServer(args.socket, modes=args.modes).serve_forever()
@@ -0,0 +1,146 @@
+# backend/core/schema_embedding_index.py
+import hashlib
+from pathlib import Path
+import numpy as np
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class SchemaEmbeddingIndex:
+    """Precomputed table embeddings ranked with a single vectorized dot product"""
+
+    def __init__(self, model, index_path):
+        # model provides embed(texts) and the embedding_model name
+        self.model = model
+        self.model_name = model.embedding_model
+        self.index_path = Path(index_path)
+
+        # (table_names, fingerprints, matrix), replaced as a whole so a concurrent
+        # rank_many always sees one consistent index. Row i of the matrix is the
+        # normalized embedding of table_names[i].
+        self._index = self._snapshot([], [], np.zeros((0, 0), dtype=np.float32))
+
+        self._load()
+
+    @staticmethod
+    def _snapshot(table_names, fingerprints, matrix):
+        """Freeze an index so it can be shared with readers without a lock"""
+        matrix.flags.writeable = False
+        return tuple(table_names), tuple(fingerprints), matrix
+
+    def _table_text(self, table_name, schema, description=""):
+        """Build the text that is embedded for a table"""
+        columns = ", ".join(column['name'].replace('_', ' ') for column in schema.get('columns', []))
+        text = f"Table {table_name.replace('_', ' ')} with columns {columns}"
+        if description:
+            text += f". {description}"
+        return text
+
+    def _fingerprint(self, text):
+        """Hash the embedded text together with the model so stale vectors are detected"""
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """Load a previously saved index from disk"""
+        if not self.index_path.exists():
+            return
+        try:
+            data = np.load(self.index_path, allow_pickle=False)
+            if str(data['model_name']) != self.model_name:
+                logger.info(f"Ignoring schema embeddings built with {data['model_name']}")
+                return
+            self._index = self._snapshot(
+                [str(name) for name in data['table_names']],
+                [str(fp) for fp in data['fingerprints']],
+                data['matrix'].astype(np.float32)
+            )
+        except Exception as e:
+            logger.error(f"Failed to load schema embeddings: {str(e)}")
+
+    def _save(self):
+        """Save the index next to the schema metadata database"""
+        table_names, fingerprints, matrix = self._index
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write through a file object so numpy does not append another suffix
+        with open(self.index_path, 'wb') as f:
+            np.savez(
+                f,
+                model_name=np.array(self.model_name),
+                table_names=np.array(table_names, dtype=str),
+                fingerprints=np.array(fingerprints, dtype=str),
+                matrix=matrix
+            )
+
+    def build(self, schemas, descriptions=None):
+        """
+        Embed every table once, reusing vectors whose table text has not changed
+
+        Args:
+            schemas: Mapping of table name to schema (as stored by SchemaManager)
+            descriptions: Optional mapping of table name to description
+        """
+        descriptions = descriptions or {}
+        current_names, current_fingerprints, current_matrix = self._index
+        existing = {
+            (name, fp): i for i, (name, fp) in enumerate(zip(current_names, current_fingerprints))
+        }
+
+        table_names = sorted(schemas)
+        fingerprints = []
+        texts_to_embed = []
+        for table_name in table_names:
+            text = self._table_text(table_name, schemas[table_name] or {}, descriptions.get(table_name) or "")
+            fingerprint = self._fingerprint(text)
+            fingerprints.append(fingerprint)
+            if (table_name, fingerprint) not in existing:
+                texts_to_embed.append((table_name, text))
+
+        if not texts_to_embed and tuple(table_names) == current_names:
+            return
+
+        new_vectors = {}
+        if texts_to_embed:
+            embedded = self.model.embed(text for _, text in texts_to_embed)
+            new_vectors = {name: embedded[i] for i, (name, _) in enumerate(texts_to_embed)}
+
+        rows = []
+        for table_name, fingerprint in zip(table_names, fingerprints):
+            if table_name in new_vectors:
+                rows.append(new_vectors[table_name])
+            else:
+                rows.append(current_matrix[existing[(table_name, fingerprint)]])
+
+        matrix = np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+        self._index = self._snapshot(table_names, fingerprints, matrix)
+        self._save()
+        logger.info(f"Embedded {len(texts_to_embed)} of {len(table_names)} tables")
+
+    def rank(self, query):
+        """
+        Rank all indexed tables against the query
+
+        Returns:
+            List of (table_name, score) sorted by descending cosine similarity
+        """
+        return self.rank_many([query])[0]
+
+    def rank_many(self, queries):
+        """
+        Rank all indexed tables against several queries with one embedding call and one matrix product
+
+        Returns:
+            One ranking per query, as in rank
+        """
+        queries = list(queries)
+        # Read the index once; build may publish a new one meanwhile
+        table_names, _, matrix = self._index
+        if not table_names or not queries:
+            return [[] for _ in queries]
+        # tables x queries
+        scores = matrix @ self.model.embed(queries).T
+        rankings = []
+        for column in range(scores.shape[1]):
+            query_scores = scores[:, column]
+            order = np.argsort(-query_scores)
+            rankings.append([(table_names[i], float(query_scores[i])) for i in order])
+        return rankings
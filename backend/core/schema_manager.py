@@ -1,21 +1,48 @@
 # sql_agent/core/schema_manager.py
-from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, JSON, inspect
+from sqlalchemy import MetaData, Table, Column, String, Integer, JSON, inspect
 from datetime import datetime
+import hashlib
+import json
 from pathlib import Path
+from threading import Lock
+import time
 from ..utils.logger import get_logger
-from ..database.connection import get_database_engine
+from ..database.connection import get_database_engine, get_engine
+from ..config.settings import get_settings
 
 logger = get_logger(__name__)
 
+# Most bound parameters one statement may use (SQLite before 3.32 allows 999)
+MAX_BIND_PARAMETERS = 999
+
+class SchemaSnapshot:
+    """Versioned, read-only view of every stored table schema"""
+    
+    def __init__(self, version, schemas, descriptions, generation=0):
+        self.version = version
+        self.schemas = schemas
+        self.descriptions = descriptions
+        # Invalidation generation the snapshot was read in (see SchemaManager.invalidate_snapshot)
+        self.generation = generation
+        self.created_at = time.monotonic()
+    
+    @property
+    def table_names(self):
+        return list(self.schemas)
+    
+    def age(self):
+        """Seconds since the snapshot was read"""
+        return time.monotonic() - self.created_at
+
 class SchemaManager:
-    def __init__(self, schema_db_url=None):
+    def __init__(self, schema_db_url=None, snapshot_ttl=None):
         if schema_db_url is None:
             # Use data/schema.db as default
             data_dir = Path(__file__).parent.parent.parent / 'data'
             data_dir.mkdir(exist_ok=True)
             schema_db_url = f"sqlite:///{data_dir}/schema.db"
         
-        self.schema_engine = create_engine(schema_db_url)
+        self.schema_engine = get_engine(schema_db_url)
         self.metadata = MetaData()
 
         # Create schema metadata table with relationship information
@@ -30,34 +57,259 @@ class SchemaManager:
         )
         
         self.metadata.create_all(self.schema_engine)
+        
+        # In-process snapshot shared by the relevance analyzer and prompt generator
+        self.snapshot_ttl = get_settings().SCHEMA_SNAPSHOT_TTL if snapshot_ttl is None else snapshot_ttl
+        self._snapshot = None
+        self._snapshot_version = 0
+        # Bumped by every invalidation; a snapshot read in an older generation is stale
+        self._generation = 0
+        self._generation_lock = Lock()
+        # Held by the one caller re-reading the schemas
+        self._snapshot_lock = Lock()
+        
+        # Callbacks notified with (table_name, schema) after a table's schema is written
+        self._listeners = []
     
-    def load_schema(self, table_name):
-        """Load schema information for a table"""
-        # Use the main database engine to inspect tables
-        engine = get_database_engine()
+    def add_listener(self, callback):
+        """Register a callback invoked whenever a table's schema changes"""
+        self._listeners.append(callback)
+    
+    def _is_current(self, snapshot):
+        """Check that a snapshot was read after the last invalidation and is within its TTL"""
+        return (
+            snapshot is not None
+            and snapshot.generation == self._generation
+            and not (self.snapshot_ttl and snapshot.age() > self.snapshot_ttl)
+        )
+    
+    def get_snapshot(self):
+        """Return the current schema snapshot, re-reading it if invalidated or past its TTL"""
+        snapshot = self._snapshot
+        if not self._is_current(snapshot):
+            snapshot = self.refresh_snapshot()
+        return snapshot
+    
+    def refresh_snapshot(self):
+        """
+        Re-read all schemas into a new snapshot
+        
+        One caller reads at a time; callers that waited for it reuse its snapshot.
+        The version only goes up when the stored schemas changed.
+        """
+        with self._snapshot_lock:
+            if self._is_current(self._snapshot):
+                return self._snapshot
+            
+            with self._generation_lock:
+                generation = self._generation
+            with self.schema_engine.connect() as conn:
+                results = conn.execute(self.schema_table.select()).fetchall()
+            schemas = {result.table_name: result.schema for result in results}
+            descriptions = {result.table_name: result.description for result in results}
+            
+            previous = self._snapshot
+            if previous is None or previous.schemas != schemas or previous.descriptions != descriptions:
+                self._snapshot_version += 1
+            # An invalidation during the read leaves this snapshot stale, so the next call reads again
+            self._snapshot = SchemaSnapshot(self._snapshot_version, schemas, descriptions, generation)
+            return self._snapshot
+    
+    def fingerprint_tables(self, table_names):
+        """Hash the current stored definitions of several tables (missing tables hash as None)"""
+        schemas = self.get_snapshot().schemas
+        return self._fingerprint({table_name: schemas.get(table_name) for table_name in sorted(table_names)})
+    
+    def invalidate_snapshot(self):
+        """Force the next get_snapshot call to re-read the schemas"""
+        with self._generation_lock:
+            self._generation += 1
+    
+    def _notify_listeners(self, table_name, schema_data):
+        """Notify listeners that a table's schema changed"""
+        for listener in self._listeners:
+            try:
+                listener(table_name, schema_data)
+            except Exception as e:
+                logger.error(f"Schema listener failed for {table_name}: {str(e)}")
+    
+    def _reflect_schemas(self, engine, table_names=None):
+        """
+        Reflect columns and foreign keys for many tables with bulk inspector calls
+        
+        Args:
+            engine: Engine of the database to reflect
+            table_names: Tables to reflect, or None for all tables
+            
+        Returns:
+            Dict of table name -> {'columns': [...], 'foreign_keys': [...]}
+        """
         inspector = inspect(engine)
+        all_columns = inspector.get_multi_columns(filter_names=table_names)
+        all_primary_keys = inspector.get_multi_pk_constraint(filter_names=table_names)
+        all_foreign_keys = inspector.get_multi_foreign_keys(filter_names=table_names)
         
-        columns = []
-        for column in inspector.get_columns(table_name):
-            col_info = {
-                'name': column['name'],
-                'type': str(column['type']),
-                'nullable': column.get('nullable', True),
-                'primary_key': column.get('primary_key', False)
+        schemas = {}
+        for (_, table_name), table_columns in all_columns.items():
+            pk_columns = (all_primary_keys.get((None, table_name)) or {}).get('constrained_columns') or []
+            columns = []
+            for column in table_columns:
+                col_info = {
+                    'name': column['name'],
+                    'type': str(column['type']),
+                    'nullable': column.get('nullable', True),
+                    'primary_key': column['name'] in pk_columns
+                }
+                columns.append(col_info)
+            
+            # Get foreign key information
+            foreign_keys = []
+            for fk in all_foreign_keys.get((None, table_name), []):
+                foreign_keys.append({
+                    'constrained_columns': fk['constrained_columns'],
+                    'referred_table': fk['referred_table'],
+                    'referred_columns': fk['referred_columns']
+                })
+            
+            schemas[table_name] = {'columns': columns, 'foreign_keys': foreign_keys}
+        return schemas
+    
+    def _fingerprint(self, schema_data):
+        """Hash a table definition so unchanged tables can be skipped"""
+        payload = json.dumps(schema_data, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _upsert(self, conn, rows):
+        """Insert or update rows, keeping existing descriptions"""
+        dialect = conn.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(self.schema_table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[self.schema_table.c.table_name],
+                set_={
+                    'schema': stmt.excluded.schema,
+                    'relationships': stmt.excluded.relationships,
+                    'last_updated': stmt.excluded.last_updated
+                }
+            )
+            conn.execute(stmt)
+        elif dialect in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(self.schema_table).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                schema=stmt.inserted.schema,
+                relationships=stmt.inserted.relationships,
+                last_updated=stmt.inserted.last_updated
+            )
+            conn.execute(stmt)
+        else:
+            # No native upsert: update existing rows, insert the rest
+            names = [row['table_name'] for row in rows]
+            existing = {
+                row.table_name for row in conn.execute(
+                    self.schema_table.select().where(self.schema_table.c.table_name.in_(names))
+                )
+            }
+            for row in rows:
+                if row['table_name'] in existing:
+                    conn.execute(
+                        self.schema_table.update()
+                        .where(self.schema_table.c.table_name == row['table_name'])
+                        .values(
+                            schema=row['schema'],
+                            relationships=row['relationships'],
+                            last_updated=row['last_updated']
+                        )
+                    )
+                else:
+                    conn.execute(self.schema_table.insert().values(**row))
+    
+    def sync_schemas(self, engine, batch_size=None):
+        """
+        Bring stored schemas in line with the database, writing only what changed
+        
+        Tables are reflected in bulk, each definition is fingerprinted and compared
+        against the stored one, and changed rows are upserted (and dropped tables
+        deleted) in a single transaction.
+        
+        Args:
+            engine: Engine of the database to reflect
+            batch_size: Maximum rows per upsert statement (defaults to as many as
+                fit in MAX_BIND_PARAMETERS)
+            
+        Returns:
+            Dict with the number of 'changed', 'removed' and 'unchanged' tables
+        """
+        if batch_size is None:
+            batch_size = MAX_BIND_PARAMETERS // len(self.schema_table.columns)
+        reflected = self._reflect_schemas(engine)
+        
+        with self.schema_engine.connect() as conn:
+            stored = {
+                row.table_name: self._fingerprint(row.schema)
+                for row in conn.execute(
+                    self.schema_table.select().with_only_columns(
+                        self.schema_table.c.table_name,
+                        self.schema_table.c.schema
+                    )
+                )
             }
-            columns.append(col_info)
         
-        # Get foreign key information
-        foreign_keys = []
-        for fk in inspector.get_foreign_keys(table_name):
-            foreign_keys.append({
-                'constrained_columns': fk['constrained_columns'],
-                'referred_table': fk['referred_table'],
-                'referred_columns': fk['referred_columns']
-            })
+        now = datetime.now().isoformat()
+        rows = [
+            {
+                'table_name': table_name,
+                'schema': schema_data,
+                'relationships': schema_data['foreign_keys'],
+                'last_updated': now,
+                'description': ""
+            }
+            for table_name, schema_data in reflected.items()
+            if stored.get(table_name) != self._fingerprint(schema_data)
+        ]
+        removed = [table_name for table_name in stored if table_name not in reflected]
+        
+        if rows or removed:
+            with self.schema_engine.begin() as conn:
+                for start in range(0, len(rows), batch_size):
+                    self._upsert(conn, rows[start:start + batch_size])
+                for start in range(0, len(removed), MAX_BIND_PARAMETERS):
+                    conn.execute(
+                        self.schema_table.delete().where(
+                            self.schema_table.c.table_name.in_(removed[start:start + MAX_BIND_PARAMETERS])
+                        )
+                    )
+            
+            self.invalidate_snapshot()
+            for row in rows:
+                self._notify_listeners(row['table_name'], row['schema'])
+            for table_name in removed:
+                self._notify_listeners(table_name, None)
+        
+        logger.info(
+            f"Schema sync: {len(rows)} changed, {len(removed)} removed, "
+            f"{len(reflected) - len(rows)} unchanged"
+        )
+        return {
+            'changed': len(rows),
+            'removed': len(removed),
+            'unchanged': len(reflected) - len(rows)
+        }
+    
+    def load_schema(self, table_name):
+        """Load schema information for a table"""
+        # Use the main database engine to inspect tables
+        engine = get_database_engine()
+        schema_data = self._reflect_schemas(engine, [table_name]).get(table_name)
+        if schema_data is None:
+            raise ValueError(f"Table not found: {table_name}")
         
         # Update schema in metadata database
-        self.update_schema(table_name, columns, foreign_keys)
+        self.update_schema(table_name, schema_data['columns'], schema_data['foreign_keys'])
     
     def update_schema(self, table_name, columns, relationships=None, description=""):
         """Update or insert schema information for a table"""
@@ -98,6 +350,9 @@ class SchemaManager:
                     )
                 )
             conn.commit()
+        
+        self.invalidate_snapshot()
+        self._notify_listeners(table_name, schema_data)
     
     def get_schema(self, table_name):
         """Retrieve schema for a specific table"""
@@ -116,4 +371,4 @@ class SchemaManager:
             results = conn.execute(self.schema_table.select()).fetchall()
             for result in results:
                 schemas[result.table_name] = result.schema
-        return schemas
\ No newline at end of file
+        return schemas
@@ -1,21 +1,37 @@
-from transformers import pipeline
 import re
-from sqlalchemy import inspect
-from backend.database.connection import get_database_engine
+from backend.config.settings import get_settings
 from functools import lru_cache
+from threading import Lock
+from .keyword_index import KeywordIndex
+from .relevance_model import get_relevance_model
+from .schema_embedding_index import SchemaEmbeddingIndex
+from .schema_manager import SchemaManager
+from ..utils.tracing import span
 
 class SchemaRelevanceAnalyzer:
-    def __init__(self):
-        # Initialize a zero-shot classification pipeline
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli"
-        )
-        # Get database engine
-        self.engine = get_database_engine()
-        
-        # Cache for table keywords to avoid recomputing
-        self._keyword_cache = {}
+    def __init__(self, schema_manager=None, model_name=None, batch_size=None, mode=None, model=None):
+        settings = get_settings()
+        self.schema_manager = schema_manager or SchemaManager(settings.SCHEMA_DB_URL)
+        self.mode = mode or settings.RELEVANCE_MODE
+        if self.mode not in ("nli", "embedding", "keyword"):
+            raise ValueError(f"Unknown relevance mode: {self.mode}")
+        
+        # Models are loaded on first use (or by warm_up), not here
+        self.model = model or get_relevance_model(nli_model=model_name, batch_size=batch_size)
+        
+        # Table vectors are computed once per schema snapshot (see build_index)
+        self.embedding_index = None
+        self._embedded_version = None
+        self._embedding_lock = Lock()
+        if self.mode == "embedding":
+            self.embedding_index = SchemaEmbeddingIndex(self.model, settings.SCHEMA_EMBEDDINGS_PATH)
+        
+        # Inverted keyword index, built once from the schema snapshot and
+        # updated table by table when the snapshot version changes
+        self._keyword_index = KeywordIndex()
+        self._indexed_schemas = {}
+        self._indexed_version = None
+        self._keyword_index_lock = Lock()
     
     def _extract_keywords_from_name(self, name):
         """Extract keywords from table or column names"""
@@ -34,107 +50,239 @@ class SchemaRelevanceAnalyzer:
         
         return list(set(keywords))  # Remove duplicates
     
-    def _get_table_keywords(self, table_name):
-        """Get keywords for a table based on its name and column names (cached)"""
-        if table_name in self._keyword_cache:
-            return self._keyword_cache[table_name]
+    def _get_table_keywords(self, table_name, schema):
+        """Get keywords for a table based on its name and column names
+        
+        A keyword repeats once per name it appears in, which gives the index its term frequencies.
+        """
+        keywords = self._extract_keywords_from_name(table_name)
+        for column in (schema or {}).get('columns', []):
+            keywords.extend(self._extract_keywords_from_name(column['name']))
+        return keywords
+    
+    def _get_keyword_index(self, snapshot):
+        """Return the keyword index, re-indexing only the tables that changed since its last snapshot"""
+        with self._keyword_index_lock:
+            if self._indexed_version == snapshot.version:
+                return self._keyword_index
+            
+            for table_name in list(self._indexed_schemas):
+                if table_name not in snapshot.schemas:
+                    self._keyword_index.remove_table(table_name)
+                    del self._indexed_schemas[table_name]
+            
+            for table_name, schema in snapshot.schemas.items():
+                if self._indexed_schemas.get(table_name) != schema:
+                    self._keyword_index.add_table(table_name, self._get_table_keywords(table_name, schema))
+                    self._indexed_schemas[table_name] = schema
             
-        keywords = set()
-        
-        # Add keywords from table name
-        keywords.update(self._extract_keywords_from_name(table_name))
-        
-        # Add keywords from column names
-        inspector = inspect(self.engine)
-        try:
-            columns = inspector.get_columns(table_name)
-            for column in columns:
-                column_keywords = self._extract_keywords_from_name(column['name'])
-                keywords.update(column_keywords)
-        except Exception:
-            # If we can't get columns, just use table name
-            pass
-        
-        # Cache the result
-        result = list(keywords)
-        self._keyword_cache[table_name] = result
-        return result
+            self._indexed_version = snapshot.version
+            return self._keyword_index
     
-    @lru_cache(maxsize=1000)
-    def _classify_table_relevance(self, query, table_name):
-        """Cached AI classification for table relevance"""
-        result = self.classifier(
-            query,
-            candidate_labels=[f"Information about {table_name}"],
-            hypothesis_template="This query is asking for {}"
-        )
-        return result['scores'][0]
+    def _term_variants(self, term):
+        """Return the term together with naive singular forms ("vips" -> "vip")"""
+        variants = [term]
+        if len(term) > 3 and term.endswith('es'):
+            variants.append(term[:-2])
+        if len(term) > 3 and term.endswith('s'):
+            variants.append(term[:-1])
+        return variants
     
-    def analyze_query(self, query, max_tables=10):
-        """
-        Determine which tables are relevant to the query
+    def build_index(self, snapshot=None):
+        """Precompute retrieval structures for a schema snapshot (defaults to the current one)"""
+        snapshot = snapshot or self.schema_manager.get_snapshot()
+        self._get_keyword_index(snapshot)
+        if self.embedding_index is not None and self._embedded_version != snapshot.version:
+            with self._embedding_lock:
+                if self._embedded_version != snapshot.version:
+                    self.embedding_index.build(snapshot.schemas, snapshot.descriptions)
+                    self._embedded_version = snapshot.version
+    
+    def is_ready(self):
+        """Check whether the model needed for Stage 2 is loaded"""
+        return self.model.is_loaded(self.mode)
+    
+    def warm_up(self):
+        """Load the Stage 2 model and build the retrieval indexes ahead of the first query"""
+        self.model.warm_up(self.mode)
+        self.build_index()
+    
+    @lru_cache(maxsize=1000)
+    def _classify_tables_relevance(self, query, table_names):
+        """Cached AI classification for several tables in one batched classifier call
         
         Args:
             query: The user query
-            max_tables: Maximum number of tables to return (for performance)
+            table_names: Tuple of table names to score
+            
+        Returns:
+            Tuple of scores in the same order as table_names
+        """
+        labels = [f"Information about {table_name}" for table_name in table_names]
+        return tuple(self.model.classify(query, labels, "This query is asking for {}"))
+    
+    def _match_keywords(self, query, snapshot):
         """
-        # Get all available tables from the database
-        inspector = inspect(self.engine)
-        available_tables = inspector.get_table_names()
+        Stage 1: match query terms against the keyword index
         
+        Returns:
+            (high_confidence_tables, partial_matches): lists of (table, score), where
+            partial matches are scored by BM25 weight and sorted strongest first
+        """
         # Extract potential table names from the query
         query_lower = query.lower()
-        query_terms = set(re.findall(r'\w+', query_lower))
+        query_terms = set()
+        for term in re.findall(r'\w+', query_lower):
+            query_terms.update(self._term_variants(term))
         
-        # Stage 1: Fast keyword matching
+        # The inverted index only touches tables that share a term with the query
+        keyword_index = self._get_keyword_index(snapshot)
         high_confidence_tables = []
-        maybe_relevant_tables = []
+        partial_matches = []
         
-        for table in available_tables:
-            # Check for direct table name mentions (highest confidence)
-            if table.lower() in query_lower:
+        # Check for direct table name mentions (highest confidence)
+        mentioned_tables = set()
+        for term in query_terms:
+            table = keyword_index.find_table(term)
+            if table is not None and table not in mentioned_tables:
+                mentioned_tables.add(table)
                 high_confidence_tables.append((table, 1.0))
+        
+        # Check dynamic keywords
+        for table, (keyword_matches, bm25_score) in keyword_index.search(query_terms).items():
+            if table in mentioned_tables:
                 continue
             
-            # Check dynamic keywords
-            table_keywords = self._get_table_keywords(table)
-            keyword_matches = sum(1 for keyword in table_keywords if keyword in query_terms)
-            
-            if keyword_matches > 0:
-                # Score based on number of keyword matches
-                score = min(keyword_matches / len(table_keywords), 0.9)
-                if score > 0.3:
-                    high_confidence_tables.append((table, score))
-                else:
-                    maybe_relevant_tables.append(table)
+            # Score based on the share of the table's keywords that matched
+            score = min(keyword_matches / keyword_index.keyword_count(table), 0.9)
+            if score > 0.3:
+                high_confidence_tables.append((table, score))
             else:
-                maybe_relevant_tables.append(table)
+                partial_matches.append((table, bm25_score))
         
-        # Stage 2: AI classification for uncertain cases (limited to avoid performance issues)
-        ai_classified_tables = []
-        if len(high_confidence_tables) < max_tables and maybe_relevant_tables:
-            # Only classify a subset to avoid performance issues
-            tables_to_classify = maybe_relevant_tables[:min(20, max_tables * 2)]
+        partial_matches.sort(key=lambda x: x[1], reverse=True)
+        return high_confidence_tables, partial_matches
+    
+    def is_data_question(self, query, min_score=None):
+        """
+        Cheaply decide whether a question is about the data in this schema
+        
+        Used for local intent routing instead of an LLM classifier call.
+        
+        Args:
+            query: The user query
+            min_score: Minimum BM25 weight for a partial keyword match to count
+        """
+        if min_score is None:
+            min_score = get_settings().LOCAL_INTENT_MIN_SCORE
+        
+        snapshot = self.schema_manager.get_snapshot()
+        high_confidence_tables, partial_matches = self._match_keywords(query, snapshot)
+        if high_confidence_tables:
+            return True
+        if partial_matches and partial_matches[0][1] >= min_score:
+            return True
+        
+        if self.mode == "embedding":
+            self.build_index(snapshot)
+            ranked_tables = self.embedding_index.rank(query)
+            return bool(ranked_tables) and ranked_tables[0][1] > 0.3
+        return False
+    
+    def analyze_query(self, query, max_tables=10):
+        """
+        Determine which tables are relevant to the query
+        
+        Args:
+            query: The user query
+            max_tables: Maximum number of tables to return (for performance)
+        """
+        return self.analyze_queries([query], max_tables)[0]
+    
+    def analyze_queries(self, queries, max_tables=10):
+        """
+        Determine which tables are relevant to each of several queries
+        
+        In embedding mode every query is embedded in one model call and scored
+        against all tables with one matrix product. NLI scores each query's own
+        candidate tables (batched across workers by a shared relevance server).
+        
+        Args:
+            queries: The user queries
+            max_tables: Maximum number of tables to return per query (for performance)
+        
+        Returns:
+            One list of relevant tables per query
+        """
+        # Get all available tables from the shared schema snapshot
+        snapshot = self.schema_manager.get_snapshot()
+        available_tables = snapshot.table_names
+        
+        # Stage 1: Fast keyword matching
+        with span("keyword_match", queries=len(queries)):
+            matches = [self._match_keywords(query, snapshot) for query in queries]
+        
+        high_confidence = []
+        maybe_relevant = []
+        for high_confidence_tables, partial_matches in matches:
+            # Partial matches are tried first in Stage 2, strongest BM25 weight first
+            maybe_relevant_tables = [table for table, _ in partial_matches]
+            matched = {table for table, _ in high_confidence_tables}.union(maybe_relevant_tables)
+            maybe_relevant_tables.extend(table for table in available_tables if table not in matched)
+            high_confidence.append(high_confidence_tables)
+            maybe_relevant.append(maybe_relevant_tables)
+        
+        # Stage 2: AI classification for uncertain cases
+        ai_classified = [[] for _ in queries]
+        uncertain = [index for index, tables in enumerate(high_confidence) if len(tables) < max_tables]
+        if self.mode == "embedding" and uncertain:
+            # One embedding per query scores every table, so no subset is needed
+            try:
+                with span("relevance_model", mode=self.mode, queries=len(uncertain)):
+                    self.build_index(snapshot)
+                    rankings = self.embedding_index.rank_many(queries[index] for index in uncertain)
+            except Exception:
+                # If embedding fails, rely on keyword matches only
+                rankings = [[] for _ in uncertain]
             
-            for table in tables_to_classify:
+            for index, ranked_tables in zip(uncertain, rankings):
+                candidates = set(maybe_relevant[index])
+                for table, ai_score in ranked_tables:
+                    if ai_score <= 0.3:
+                        break
+                    if table in candidates:
+                        ai_classified[index].append((table, ai_score))
+        elif self.mode == "nli":
+            for index in uncertain:
+                if not maybe_relevant[index]:
+                    continue
+                # Only classify a subset to avoid performance issues
+                tables_to_classify = tuple(maybe_relevant[index][:min(20, max_tables * 2)])
+                
                 try:
-                    ai_score = self._classify_table_relevance(query, table)
-                    if ai_score > 0.3:
-                        ai_classified_tables.append((table, ai_score))
+                    with span("relevance_model", mode=self.mode, tables=len(tables_to_classify)):
+                        ai_scores = self._classify_tables_relevance(queries[index], tables_to_classify)
                 except Exception:
-                    # If AI classification fails, skip this table
-                    continue
-        
-        # Combine and sort results
-        all_relevant = high_confidence_tables + ai_classified_tables
-        all_relevant.sort(key=lambda x: x[1], reverse=True)  # Sort by confidence score
-        
-        # Return top tables, respecting max_tables limit
-        relevant_tables = [table for table, score in all_relevant[:max_tables]]
+                    # If AI classification fails, rely on keyword matches only
+                    ai_scores = ()
+                
+                for table, ai_score in zip(tables_to_classify, ai_scores):
+                    if ai_score > 0.3:
+                        ai_classified[index].append((table, ai_score))
         
-        # Fallback: if no tables found, return a few most likely candidates
-        if not relevant_tables:
-            # Return first few tables as fallback, but limit the number
-            relevant_tables = available_tables[:min(5, len(available_tables))]
+        results = []
+        for high_confidence_tables, ai_classified_tables in zip(high_confidence, ai_classified):
+            # Combine and sort results
+            all_relevant = high_confidence_tables + ai_classified_tables
+            all_relevant.sort(key=lambda x: x[1], reverse=True)  # Sort by confidence score
+            
+            # Return top tables, respecting max_tables limit
+            relevant_tables = [table for table, score in all_relevant[:max_tables]]
+            
+            # Fallback: if no tables found, return a few most likely candidates
+            if not relevant_tables:
+                # Return first few tables as fallback, but limit the number
+                relevant_tables = available_tables[:min(5, len(available_tables))]
+            results.append(relevant_tables)
         
-        return relevant_tables
\ No newline at end of file
+        return results
\ No newline at end of file
@@ -0,0 +1,57 @@
+# backend/core/sql_repair.py
+from threading import Lock
+
+class SqlExecutionError(Exception):
+    """Raised when generated SQL fails to execute"""
+
+class SqlAttempt:
+    """One execution attempt of a query, including the repair call that produced it"""
+
+    def __init__(self, number, sql_query, latency, error=None):
+        self.number = number
+        self.sql_query = sql_query
+        # Seconds spent on this attempt (model repair call plus execution)
+        self.latency = latency
+        self.error = error
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+class RepairStats:
+    """Counters and per-attempt latency of the SQL repair loop"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.queries = 0
+        self.repaired = 0
+        self.failed = 0
+        # attempt number -> [count, total latency in seconds]
+        self._latency = {}
+
+    def record(self, attempts):
+        """Record the attempts made for one query"""
+        with self._lock:
+            self.queries += 1
+            if attempts and attempts[-1].succeeded:
+                if len(attempts) > 1:
+                    self.repaired += 1
+            else:
+                self.failed += 1
+            for attempt in attempts:
+                entry = self._latency.setdefault(attempt.number, [0, 0.0])
+                entry[0] += 1
+                entry[1] += attempt.latency
+
+    def stats(self):
+        """Return counters and mean latency per attempt number"""
+        with self._lock:
+            return {
+                'queries': self.queries,
+                'repaired': self.repaired,
+                'failed': self.failed,
+                'attempts': {
+                    number: {'count': count, 'mean_latency_ms': 1000 * total / count}
+                    for number, (count, total) in sorted(self._latency.items())
+                }
+            }
@@ -1,7 +1,162 @@
 # sql_agent/database/connection.py
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from threading import Lock
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from ..config.settings import get_settings
 
+# Process-wide engines, one per URL, so every component shares a single pool per database
+_engines = {}
+_async_engines = {}
+_engines_lock = Lock()
+
+# sync engine -> connection event counters, for pool metrics
+_pool_events = {}
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _engine_options(url):
+    """Pool options for a URL (in-memory SQLite uses a single-connection pool without sizing)"""
+    settings = get_settings()
+    options = {
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'pool_recycle': settings.DB_POOL_RECYCLE
+    }
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT
+        )
+    return options
+
+# SQLite VM instructions between checks of a statement deadline
+_PROGRESS_INTERVAL = 10000
+
+def _configure_connection(dbapi_connection, connection_record, backend):
+    """Apply per-connection settings: SQLite pragmas or a server-side statement timeout"""
+    settings = get_settings()
+    if backend == "sqlite" and hasattr(dbapi_connection, "set_progress_handler"):
+        # Non-zero aborts the running statement once statement_deadline's deadline has passed
+        info = connection_record.info
+        dbapi_connection.set_progress_handler(
+            lambda: int(info.get('deadline', float('inf')) < time.monotonic()),
+            _PROGRESS_INTERVAL
+        )
+
+    cursor = dbapi_connection.cursor()
+    try:
+        if backend == "sqlite":
+            if settings.SQLITE_WAL:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        elif settings.DB_STATEMENT_TIMEOUT_MS:
+            if backend == "postgresql":
+                cursor.execute(f"SET statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+            elif backend in ("mysql", "mariadb"):
+                cursor.execute(f"SET SESSION max_execution_time = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+    finally:
+        cursor.close()
+
+def _instrument(sync_engine):
+    """Configure new connections and count pool events for an engine"""
+    backend = sync_engine.url.get_backend_name()
+    counters = _pool_events.setdefault(sync_engine, {'connects': 0, 'checkouts': 0, 'invalidations': 0})
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        counters['connects'] += 1
+        _configure_connection(dbapi_connection, connection_record, backend)
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters['checkouts'] += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        counters['invalidations'] += 1
+
+@contextmanager
+def statement_deadline(connection, timeout_ms=None):
+    """
+    Abort SQLite statements run on the connection once the timeout has elapsed
+
+    PostgreSQL and MySQL enforce DB_STATEMENT_TIMEOUT_MS on the server instead.
+
+    Args:
+        connection: SQLAlchemy Connection
+        timeout_ms: Timeout in milliseconds (defaults to DB_STATEMENT_TIMEOUT_MS; 0 disables it)
+    """
+    if timeout_ms is None:
+        timeout_ms = get_settings().DB_STATEMENT_TIMEOUT_MS
+    info = connection.connection.info
+    if timeout_ms:
+        info['deadline'] = time.monotonic() + timeout_ms / 1000
+    try:
+        yield
+    finally:
+        info.pop('deadline', None)
+
+def get_engine(database_url):
+    """Return the shared engine for a database URL, creating it on first use"""
+    engine = _engines.get(database_url)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(database_url)
+            if engine is None:
+                engine = create_engine(database_url, **_engine_options(make_url(database_url)))
+                _instrument(engine)
+                _engines[database_url] = engine
+    return engine
+
+def get_async_engine(database_url):
+    """Return the shared async engine for a database URL, creating it on first use"""
+    engine = _async_engines.get(database_url)
+    if engine is None:
+        # Imported here so sync-only deployments do not need greenlet or an async driver
+        from sqlalchemy.ext.asyncio import create_async_engine
+        with _engines_lock:
+            engine = _async_engines.get(database_url)
+            if engine is None:
+                engine = create_async_engine(database_url, **_engine_options(make_url(database_url)))
+                _instrument(engine.sync_engine)
+                _async_engines[database_url] = engine
+    return engine
+
 def get_database_engine():
     settings = get_settings()
-    return create_engine(settings.DATABASE_URL)
\ No newline at end of file
+    return get_engine(settings.DATABASE_URL)
+
+def get_async_database_engine():
+    settings = get_settings()
+    return get_async_engine(settings.ASYNC_DATABASE_URL)
+
+def pool_stats():
+    """Report pool usage and connection counters for every shared engine"""
+    stats = {}
+    with _engines_lock:
+        engines = [(engine, False) for engine in _engines.values()]
+        engines += [(engine.sync_engine, True) for engine in _async_engines.values()]
+
+    for engine, is_async in engines:
+        pool = engine.pool
+        entry = {'pool': type(pool).__name__, 'async': is_async}
+        # Only queue-based pools report sizing
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, name, None)
+            if callable(method):
+                entry[name] = method()
+        entry.update(_pool_events.get(engine, {}))
+        stats[engine.url.render_as_string(hide_password=True)] = entry
+    return stats
+
+def dispose_engines():
+    """Close every pooled connection (e.g. in a worker after fork)"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        for engine in _async_engines.values():
+            engine.sync_engine.dispose()
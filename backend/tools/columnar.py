@@ -0,0 +1,124 @@
+# backend/tools/columnar.py
+from sqlalchemy import text, Engine
+import numpy as np
+from ..config.settings import get_settings
+from ..database.connection import statement_deadline
+from ..utils.metrics import SQL_ROWS, SQL_BYTES
+from ..utils.tracing import span
+
+# Python value types mapped to the NumPy dtype used when a column holds only that type
+_NUMPY_TYPES = [
+    (bool, np.bool_),
+    (int, np.int64),
+    (float, np.float64),
+]
+
+def _to_array(values):
+    """Convert a column's values to a typed NumPy array, falling back to object"""
+    for python_type, dtype in _NUMPY_TYPES:
+        # bool is a subclass of int, so compare exact types
+        if values and all(type(value) is python_type for value in values):
+            return np.array(values, dtype=dtype)
+    if values and all(type(value) in (int, float) for value in values):
+        return np.array(values, dtype=np.float64)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+class ColumnarResult:
+    """Query result stored column by column: names once, one typed array per column"""
+
+    def __init__(self, columns, arrays, truncated=None):
+        self.columns = list(columns)
+        self.arrays = list(arrays)
+        # Reason the result was cut short, if it was
+        self.truncated = truncated
+
+    @property
+    def num_rows(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def to_dict(self):
+        """Compact JSON-ready form: column names and types once, then one value list per column"""
+        data = []
+        for array in self.arrays:
+            values = array.tolist()
+            if array.dtype == object:
+                values = [value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+                          for value in values]
+            data.append(values)
+        return {
+            'columns': self.columns,
+            'types': [str(array.dtype) for array in self.arrays],
+            'data': data,
+            'num_rows': self.num_rows,
+            'truncated': self.truncated
+        }
+
+    def to_arrow(self):
+        """Convert to a pyarrow Table (numeric columns are shared with NumPy without copying)"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Arrow output requires the optional pyarrow package")
+
+        arrays = [
+            pa.array(array.tolist()) if array.dtype == object else pa.array(array)
+            for array in self.arrays
+        ]
+        return pa.Table.from_arrays(arrays, names=self.columns)
+
+    def to_arrow_ipc(self):
+        """Serialize to the Arrow IPC stream format"""
+        table = self.to_arrow()
+        import pyarrow as pa
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+def execute_columnar(query: str, engine: Engine, max_rows=None) -> ColumnarResult:
+    """
+    Execute a query and collect the result column by column.
+
+    Rows are read in batches from a server-side cursor and transposed straight
+    into per-column lists, so no per-row dictionaries are built.
+
+    Args:
+        query: The SQL query to execute
+        engine: SQLAlchemy engine instance
+        max_rows: Row cap (defaults to RESULT_MAX_ROWS; 0 for unlimited)
+    """
+    settings = get_settings()
+    if max_rows is None:
+        max_rows = settings.RESULT_MAX_ROWS
+
+    truncated = None
+    with span("sql_execute", format="columnar") as execute_span, \
+            engine.connect() as con, statement_deadline(con):
+        result = con.execution_options(
+            stream_results=True,
+            yield_per=settings.RESULT_FETCH_SIZE
+        ).execute(text(query))
+        columns = list(result.keys())
+        values = [[] for _ in columns]
+        row_count = 0
+
+        for batch in result.partitions():
+            if max_rows and row_count + len(batch) > max_rows:
+                batch = batch[:max_rows - row_count]
+                truncated = f"row limit of {max_rows} reached"
+            for column_values, batch_values in zip(values, zip(*batch)):
+                column_values.extend(batch_values)
+            row_count += len(batch)
+            if truncated:
+                break
+
+        arrays = [_to_array(column_values) for column_values in values]
+        size = sum(array.nbytes for array in arrays)
+        execute_span.set(rows=row_count, bytes=size)
+
+    SQL_ROWS.inc(row_count)
+    SQL_BYTES.inc(size)
+    return ColumnarResult(columns, arrays, truncated)
@@ -0,0 +1,236 @@
+# backend/tools/query_guard.py
+from threading import Lock
+import json
+import re
+import time
+from sqlalchemy import text, Engine
+from ..config.settings import get_settings
+from ..utils.logger import get_logger
+from ..utils.sql_parser import dialect_for, try_parse_sql
+from ..utils.tracing import span
+
+logger = get_logger(__name__)
+
+GUARD_ACTIONS = ("reject", "limit", "regenerate", "warn")
+
+class QueryRejected(ValueError):
+    """Raised when a query's estimated cost exceeds the guard thresholds"""
+
+    def __init__(self, issues):
+        self.issues = issues
+        super().__init__("Query rejected as too expensive: " + "; ".join(issues))
+
+class QueryGuard:
+    """
+    Pre-execution cost check for generated SQL
+
+    Runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) and flags full scans of large
+    tables and nested-loop scans whose estimated row count suggests a Cartesian
+    product. Depending on the action, a flagged query is rejected, given a LIMIT,
+    rejected so the caller can regenerate it, or only logged.
+    """
+
+    def __init__(self, engine: Engine, action=None, max_scan_rows=None, max_join_rows=None,
+                 max_cost=None, limit=None, stats_ttl=300):
+        settings = get_settings()
+        self.engine = engine
+        self.dialect = dialect_for(engine)
+        self.action = settings.QUERY_GUARD_ACTION if action is None else action
+        if self.action not in GUARD_ACTIONS:
+            raise ValueError(f"Unknown QUERY_GUARD_ACTION: {self.action}")
+        # Thresholds and the appended LIMIT are disabled by 0
+        self.max_scan_rows = settings.QUERY_GUARD_MAX_SCAN_ROWS if max_scan_rows is None else max_scan_rows
+        self.max_join_rows = settings.QUERY_GUARD_MAX_JOIN_ROWS if max_join_rows is None else max_join_rows
+        self.max_cost = settings.QUERY_GUARD_MAX_COST if max_cost is None else max_cost
+        self.limit = settings.QUERY_GUARD_LIMIT if limit is None else limit
+
+        # table -> (row count, read at), so EXPLAIN checks do not count rows every time
+        self.stats_ttl = stats_ttl
+        self._row_counts = {}
+        self._lock = Lock()
+
+    def check(self, sql_query):
+        """
+        Check a query and return the SQL to execute
+
+        Raises:
+            QueryRejected: if the query is flagged and the action is "reject" or "regenerate"
+        """
+        try:
+            with span("sql_guard") as guard_span:
+                issues = self.inspect(sql_query)
+                guard_span.set(issues=len(issues))
+        except Exception as e:
+            # A query EXPLAIN cannot plan will fail at execution with a clearer error
+            logger.error(f"Query plan inspection failed: {str(e)}")
+            return sql_query
+
+        if not issues:
+            return sql_query
+
+        logger.info(f"Query guard flagged query ({self.action}): {'; '.join(issues)}")
+        if self.action in ("reject", "regenerate"):
+            raise QueryRejected(issues)
+        if self.action == "limit":
+            return self.add_limit(sql_query)
+        return sql_query
+
+    def inspect(self, sql_query):
+        """Return descriptions of the costly operations in the query plan (empty if none)"""
+        backend = self.engine.url.get_backend_name()
+        statement = sql_query.strip().rstrip(';')
+        parsed = try_parse_sql(statement, self.dialect)
+        # A query that stops at its LIMIT reads few rows however large its tables are,
+        # so only a PostgreSQL plan's total cost (which accounts for the LIMIT) is checked
+        bounded = parsed is not None and self._stops_early(parsed)
+        if bounded and backend != "postgresql":
+            return []
+        with self.engine.connect() as conn:
+            if backend == "sqlite":
+                return self._inspect_sqlite(conn, statement, parsed)
+            if backend == "postgresql":
+                return self._inspect_postgresql(conn, statement, bounded)
+            if backend in ("mysql", "mariadb"):
+                return self._inspect_mysql(conn, statement)
+        return []
+
+    @staticmethod
+    def _stops_early(parsed):
+        """Whether a query returns as soon as its top-level LIMIT is reached, without reading every row first"""
+        expression = parsed.expression
+        return (
+            parsed.has_limit
+            and not parsed.is_aggregate
+            and expression.args.get('order') is None
+            and expression.args.get('distinct') is None
+        )
+
+    def add_limit(self, sql_query):
+        """
+        Append a LIMIT to a query that has no top-level one
+
+        Grouped and aggregate queries are left alone: a LIMIT would silently
+        drop groups from their result rather than bound the work.
+        """
+        parsed = try_parse_sql(sql_query, self.dialect)
+        if not self.limit or parsed is None or parsed.has_limit:
+            return sql_query
+        if parsed.is_aggregate:
+            logger.info("Query guard left an aggregate query without a LIMIT")
+            return sql_query
+        return f"{sql_query.strip().rstrip(';').rstrip()}\nLIMIT {self.limit};"
+
+    def _row_count(self, conn, table_name):
+        """
+        Row count of a SQLite table (cached)
+
+        Taken from sqlite_stat1 when ANALYZE has run, else counted up to just past
+        the largest threshold, which is all a comparison with the thresholds needs.
+        Raises for names that are not tables (e.g. a CTE), which are skipped.
+        """
+        with self._lock:
+            cached = self._row_counts.get(table_name)
+        if cached is not None and time.monotonic() - cached[1] < self.stats_ttl:
+            return cached[0]
+
+        count = self._analyzed_row_count(conn, table_name)
+        if count is None:
+            quoted = '"' + table_name.replace('"', '""') + '"'
+            cap = max(self.max_scan_rows, self.max_join_rows)
+            if cap:
+                count = conn.execute(
+                    text(f"SELECT COUNT(*) FROM (SELECT 1 FROM {quoted} LIMIT :cap)"), {'cap': cap + 1}
+                ).scalar()
+            else:
+                count = conn.execute(text(f"SELECT COUNT(*) FROM {quoted}")).scalar()
+
+        with self._lock:
+            self._row_counts[table_name] = (count, time.monotonic())
+        return count
+
+    @staticmethod
+    def _analyzed_row_count(conn, table_name):
+        """Row count recorded by ANALYZE in sqlite_stat1, or None if there is none"""
+        has_stats = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        ).scalar()
+        if not has_stats:
+            return None
+        stat = conn.execute(
+            text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table_name LIMIT 1"), {'table_name': table_name}
+        ).scalar()
+        # stat starts with the number of rows in the table
+        try:
+            return int(stat.split()[0])
+        except (AttributeError, IndexError, ValueError):
+            return None
+
+    def _inspect_sqlite(self, conn, statement, parsed=None):
+        plan = conn.execute(text(f"EXPLAIN QUERY PLAN {statement}")).fetchall()
+        aliases = parsed.aliases if parsed is not None else {}
+        issues = []
+        # Tables scanned in the top-level nested loop, with their sizes
+        loop_scans = []
+
+        for _, parent, _, detail in plan:
+            match = re.match(r'SCAN (?:TABLE )?"?(\w+)"?', detail)
+            if not match:
+                continue
+            table_name = aliases.get(match.group(1), match.group(1))
+            try:
+                rows = self._row_count(conn, table_name)
+            except Exception:
+                # Not a rowid table (e.g. a CTE, subquery or view)
+                continue
+
+            issue = f"full scan of {table_name} (~{rows} rows)"
+            if self.max_scan_rows and rows > self.max_scan_rows and issue not in issues:
+                issues.append(issue)
+            if parent == 0:
+                loop_scans.append((table_name, rows))
+
+        if len(loop_scans) > 1:
+            estimate = 1
+            for _, rows in loop_scans:
+                estimate *= max(rows, 1)
+            if self.max_join_rows and estimate > self.max_join_rows:
+                names = ", ".join(table_name for table_name, _ in loop_scans)
+                issues.append(f"nested-loop scan of {names} (~{estimate} row combinations, possible Cartesian product)")
+        return issues
+
+    def _inspect_postgresql(self, conn, statement, bounded=False):
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]['Plan']
+        issues = []
+
+        if self.max_cost and root.get('Total Cost', 0) > self.max_cost:
+            issues.append(f"estimated cost {root['Total Cost']:.0f} exceeds {self.max_cost:.0f}")
+        if bounded:
+            return issues
+
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get('Plans', []))
+            rows = node.get('Plan Rows', 0)
+            if node.get('Node Type') == 'Seq Scan' and self.max_scan_rows and rows > self.max_scan_rows:
+                issues.append(f"full scan of {node.get('Relation Name')} (~{rows} rows)")
+            elif (node.get('Node Type') == 'Nested Loop' and 'Join Filter' not in node
+                  and self.max_join_rows and rows > self.max_join_rows):
+                issues.append(f"nested loop producing ~{rows} rows (possible Cartesian product)")
+        return issues
+
+    def _inspect_mysql(self, conn, statement):
+        plan = conn.execute(text(f"EXPLAIN {statement}")).mappings().fetchall()
+        issues = []
+        estimate = 1
+        for row in plan:
+            rows = row.get('rows') or 0
+            estimate *= max(rows, 1)
+            if row.get('type') == 'ALL' and self.max_scan_rows and rows > self.max_scan_rows:
+                issues.append(f"full scan of {row.get('table')} (~{rows} rows)")
+        if len(plan) > 1 and self.max_join_rows and estimate > self.max_join_rows:
+            issues.append(f"join of ~{estimate} row combinations (possible Cartesian product)")
+        return issues
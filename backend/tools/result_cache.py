@@ -0,0 +1,135 @@
+# backend/tools/result_cache.py
+from collections import OrderedDict
+from threading import Lock
+import re
+import time
+from ..utils.helpers import referenced_tables
+from ..utils.sql_parser import try_parse_sql
+
+class ResultCache:
+    """
+    In-memory LRU cache of query results keyed by normalized SQL
+
+    Entries expire after ttl seconds, the total size is bounded by max_bytes,
+    and invalidate_table drops every entry that reads a given table.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # key -> (result, tables, size, created_at), most recently used last
+        self._entries = OrderedDict()
+        # table name (lowercase) -> keys of entries that read it
+        self._table_keys = {}
+        self._bytes = 0
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _normalize(self, sql_query):
+        """Canonical form of the query from its AST, so formatting differences share an entry"""
+        parsed = try_parse_sql(sql_query)
+        if parsed is not None:
+            return parsed.normalized
+
+        # Collapse whitespace outside string literals and drop the trailing semicolon
+        parts = re.split(r"('(?:[^']|'')*')", sql_query.strip().rstrip(';').strip())
+        return ''.join(
+            part if part.startswith("'") else re.sub(r'\s+', ' ', part)
+            for part in parts
+        )
+
+    def _size(self, result):
+        return len(result.encode('utf-8')) if isinstance(result, str) else len(str(result))
+
+    def _remove(self, key):
+        """Drop an entry (lock must be held)"""
+        result, tables, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._table_keys.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._table_keys[table]
+
+    def get(self, sql_query):
+        """Return the cached result for a query, or None on a miss"""
+        key = self._normalize(sql_query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[3] > self.ttl:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, sql_query, result, tables=None):
+        """
+        Cache a query result
+
+        Args:
+            sql_query: The executed SQL
+            result: Its result
+            tables: Tables the query reads (parsed from the SQL if omitted)
+        """
+        key = self._normalize(sql_query)
+        tables = {table.lower() for table in (tables if tables is not None else referenced_tables(sql_query))}
+        size = self._size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (result, tables, size, time.monotonic())
+            self._bytes += size
+            for table in tables:
+                self._table_keys.setdefault(table, set()).add(key)
+
+            # Evict least recently used entries beyond the byte bound
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_table(self, table_name):
+        """Drop every cached result that reads the table"""
+        with self._lock:
+            keys = list(self._table_keys.get(table_name.lower(), ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._table_keys.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -1,25 +1,154 @@
+from typing import TYPE_CHECKING
+import asyncio
 from sqlalchemy import text, Engine
+from ..config.settings import get_settings
+from ..database.connection import statement_deadline
 from ..utils.logger import get_logger
+from ..utils.metrics import SQL_ROWS, SQL_BYTES
+from ..utils.tracing import span
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
 
 logger = get_logger(__name__)
 
+# Prefix of the string sql_engine returns when a query fails
+ERROR_PREFIX = "Error executing query: "
+
+# Key of the final item stream_rows yields when a row or byte cap cut the result short
+TRUNCATED_KEY = "__truncated__"
+
+def _limits(max_rows, max_bytes):
+    """Fill in the configured row and byte caps (0 means unlimited)"""
+    settings = get_settings()
+    if max_rows is None:
+        max_rows = settings.RESULT_MAX_ROWS
+    if max_bytes is None:
+        max_bytes = settings.RESULT_MAX_BYTES
+    return max_rows, max_bytes
+
+class _RowLimiter:
+    """Track rows and bytes sent against the caps"""
+
+    def __init__(self, max_rows, max_bytes):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+
+    def check(self, record):
+        """Return a truncation reason if the record would exceed a cap, else None"""
+        if self.max_rows and self.rows >= self.max_rows:
+            return f"row limit of {self.max_rows} reached"
+        size = len(str(record))
+        if self.max_bytes and self.bytes + size > self.max_bytes:
+            return f"size limit of {self.max_bytes} bytes reached"
+        self.rows += 1
+        self.bytes += size
+        return None
+
+def stream_rows(query: str, engine: Engine, max_rows=None, max_bytes=None):
+    """
+    Execute a query with a server-side cursor and yield rows as dictionaries.
+
+    Rows are fetched in batches, so memory stays bounded however large the result.
+    If a cap is hit, the last item yielded is {TRUNCATED_KEY: reason}.
+
+    Args:
+        query: The SQL query to execute
+        engine: SQLAlchemy engine instance
+        max_rows: Row cap (defaults to RESULT_MAX_ROWS; 0 for unlimited)
+        max_bytes: Approximate byte cap on the rows' text form (defaults to RESULT_MAX_BYTES; 0 for unlimited)
+    """
+    limiter = _RowLimiter(*_limits(max_rows, max_bytes))
+    with engine.connect() as con, statement_deadline(con):
+        result = con.execution_options(
+            stream_results=True,
+            yield_per=get_settings().RESULT_FETCH_SIZE
+        ).execute(text(query))
+        columns = list(result.keys())
+        for row in result:
+            record = dict(zip(columns, row))
+            reason = limiter.check(record)
+            if reason:
+                yield {TRUNCATED_KEY: reason}
+                return
+            yield record
+
+async def _interrupt_after(con, timeout_ms):
+    """
+    Interrupt the statement running on an aiosqlite connection once timeout_ms elapse
+
+    aiosqlite connections get no progress handler, so this stands in for
+    statement_deadline; server databases enforce the timeout themselves.
+    Returns the timer to cancel, or None.
+    """
+    if not timeout_ms or con.dialect.driver != "aiosqlite":
+        return None
+    driver_connection = (await con.get_raw_connection()).driver_connection
+    return asyncio.get_running_loop().call_later(
+        timeout_ms / 1000,
+        lambda: asyncio.ensure_future(driver_connection.interrupt())
+    )
+
+async def astream_rows(query: str, engine: "AsyncEngine", max_rows=None, max_bytes=None):
+    """Async version of stream_rows for use with an async SQLAlchemy engine"""
+    limiter = _RowLimiter(*_limits(max_rows, max_bytes))
+    async with engine.connect() as con:
+        timer = await _interrupt_after(con, get_settings().DB_STATEMENT_TIMEOUT_MS)
+        try:
+            result = await con.stream(text(query))
+            columns = list(result.keys())
+            async for row in result:
+                record = dict(zip(columns, row))
+                reason = limiter.check(record)
+                if reason:
+                    yield {TRUNCATED_KEY: reason}
+                    return
+                yield record
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+def _format_rows(output, execute_span):
+    """Format collected rows, ending with a truncation marker if the result was cut short"""
+    reason = output.pop()[TRUNCATED_KEY] if output and TRUNCATED_KEY in output[-1] else None
+    formatted = str(output)
+    if reason:
+        formatted = f"{formatted}\n[Result truncated: {reason}]"
+    SQL_ROWS.inc(len(output))
+    SQL_BYTES.inc(len(formatted))
+    execute_span.set(rows=len(output), bytes=len(formatted))
+    return formatted
+
 def sql_engine(query: str, engine: Engine) -> str:
     """
     Execute SQL queries on the database. Returns a string representation of the result.
-    The database schema is managed by SchemaManager.
+    The database schema is managed by SchemaManager. Results are capped at
+    RESULT_MAX_ROWS rows and RESULT_MAX_BYTES bytes.
 
     Args:
         query: The SQL query to execute. This should be valid SQL syntax.
         engine: SQLAlchemy engine instance
     """
-    output = []
     try:
-        with engine.connect() as con:
-            result = con.execute(text(query))
-            columns = result.keys()
-            for row in result:
-                output.append(dict(zip(columns, row)))
-        return str(output)
+        with span("sql_execute") as execute_span:
+            return _format_rows(list(stream_rows(query, engine)), execute_span)
+    except Exception as e:
+        logger.error(f"SQL query execution failed: {str(e)}")
+        return f"{ERROR_PREFIX}{str(e)}"
+
+async def sql_engine_async(query: str, engine: "AsyncEngine") -> str:
+    """
+    Async version of sql_engine for use with an async SQLAlchemy engine.
+
+    Args:
+        query: The SQL query to execute. This should be valid SQL syntax.
+        engine: SQLAlchemy async engine instance
+    """
+    try:
+        with span("sql_execute") as execute_span:
+            return _format_rows([record async for record in astream_rows(query, engine)], execute_span)
     except Exception as e:
         logger.error(f"SQL query execution failed: {str(e)}")
-        return f"Error executing query: {str(e)}"
\ No newline at end of file
+        return f"{ERROR_PREFIX}{str(e)}"
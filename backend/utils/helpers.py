@@ -0,0 +1,22 @@
+# backend/utils/helpers.py
+import re
+from .sql_parser import try_parse_sql
+
+def normalize_question(question, case_sensitive=False):
+    """
+    Normalize a natural-language question for cache and deduplication keys
+
+    Quoted literals are kept as written. The rest is lowercased unless
+    case_sensitive is set, for databases whose string comparisons depend on case
+    (the COLLATE NOCASE prompt rule only makes SQLite lookups case-insensitive).
+    """
+    parts = re.split(r"""('[^']*'|"[^"]*")""", question.strip())
+    for index in range(0, len(parts), 2):
+        text = re.sub(r'\s+', ' ', parts[index])
+        parts[index] = text if case_sensitive else text.lower()
+    return ''.join(parts).rstrip('?!. ')
+
+def referenced_tables(sql_query, dialect=None):
+    """Return the base tables a SQL query reads (CTE names excluded; empty if it does not parse)"""
+    parsed = try_parse_sql(sql_query, dialect)
+    return parsed.tables if parsed is not None else []
@@ -0,0 +1,116 @@
+# backend/utils/metrics.py
+from threading import Lock
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    samples.append((f"{self.name}_bucket", key + (("le", repr(float(bound))),), count))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), entry[-1]))
+                samples.append((f"{self.name}_sum", key, entry[-2]))
+                samples.append((f"{self.name}_count", key, entry[-1]))
+        return samples
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "sql_agent_stage_seconds", "Time spent in each pipeline stage", ["stage"]
+))
+LLM_CALLS = REGISTRY.register(Counter(
+    "sql_agent_llm_calls_total", "LLM calls by model and purpose", ["model", "purpose"]
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "sql_agent_llm_tokens_total", "LLM tokens by model and kind (prompt or completion)", ["model", "kind"]
+))
+SQL_ROWS = REGISTRY.register(Counter(
+    "sql_agent_sql_rows_total", "Rows returned by executed queries"
+))
+SQL_BYTES = REGISTRY.register(Counter(
+    "sql_agent_sql_bytes_total", "Bytes of query results returned"
+))
+REQUESTS = REGISTRY.register(Counter(
+    "sql_agent_requests_total", "Handled /api/query requests by outcome", ["status"]
+))
@@ -0,0 +1,108 @@
+# backend/utils/singleflight.py
+import asyncio
+from threading import Event, Lock
+
+class _Flight:
+    """One in-flight execution and the number of callers waiting on it"""
+
+    def __init__(self, task=None):
+        # Async executions run in a task; sync ones signal completion through the event
+        self.task = task
+        self.done = Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution
+
+    The first caller for a key runs the function; callers that arrive while it
+    is running wait and get its result (or its exception). Once max_waiters
+    callers wait on an execution, the next caller starts a new one, which later
+    callers join instead.
+    """
+
+    def __init__(self, max_waiters=0):
+        # Most callers that can wait on one execution (0 for no limit)
+        self.max_waiters = max_waiters
+        self._flights = {}
+        self._lock = Lock()
+        self._executions = 0
+        self._shared = 0
+        self._overflow = 0
+
+    def _attach(self, key):
+        """
+        Attach a caller to the execution running for key (call with the lock held)
+
+        Returns:
+            The flight to wait on, or None if the caller must start (and register) a new one
+        """
+        flight = self._flights.get(key)
+        if flight is not None and self.max_waiters and flight.waiters >= self.max_waiters:
+            # The running execution is full; its waiters keep their reference to it
+            self._overflow += 1
+            flight = None
+        if flight is None:
+            self._executions += 1
+            return None
+        self._shared += 1
+        flight.waiters += 1
+        return flight
+
+    def do(self, key, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs), or wait for a running call with the same key and return its result"""
+        with self._lock:
+            flight = self._attach(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._release(key, flight)
+            flight.done.set()
+
+    async def ado(self, key, fn, *args, **kwargs):
+        """
+        Async version of do for a coroutine function
+
+        The shared execution runs in its own task, so a caller that is cancelled
+        does not cancel it for the others.
+        """
+        # Tasks belong to one event loop, so flights are not shared across loops
+        key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            flight = self._attach(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(asyncio.ensure_future(fn(*args, **kwargs)))
+                flight.task.add_done_callback(lambda _: self._release(key, flight))
+        return await asyncio.shield(flight.task)
+
+    def _release(self, key, flight):
+        """Unregister a finished flight, unless a newer one has replaced it"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self):
+        """Report executions, callers that shared one, and executions started because one was full"""
+        with self._lock:
+            return {
+                'executions': self._executions,
+                'shared': self._shared,
+                'overflow': self._overflow,
+                'in_flight': len(self._flights)
+            }
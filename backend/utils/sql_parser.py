@@ -0,0 +1,150 @@
+# backend/utils/sql_parser.py
+import re
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, TokenError
+from sqlglot.tokens import Tokenizer, TokenType
+
+# SQLAlchemy backend name -> sqlglot dialect
+DIALECTS = {
+    'sqlite': 'sqlite',
+    'postgresql': 'postgres',
+    'mysql': 'mysql',
+    'mariadb': 'mysql',
+    'mssql': 'tsql',
+    'oracle': 'oracle',
+}
+
+# Statements that modify data or schema; none may appear anywhere in a generated query
+_WRITE_NODES = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter, exp.Command)
+
+def dialect_for(engine):
+    """Return the sqlglot dialect for a SQLAlchemy engine (None parses generic SQL)"""
+    return DIALECTS.get(engine.url.get_backend_name())
+
+class ParsedQuery:
+    """A validated read-only query with its AST and the tables and columns it references"""
+
+    def __init__(self, sql_query, expression, dialect=None):
+        # Statement text as written, ending with a semicolon
+        self.sql = sql_query
+        self.expression = expression
+        self.dialect = dialect
+
+        # CTE names look like tables in the AST but are not base tables
+        cte_names = {cte.alias_or_name.lower() for cte in expression.find_all(exp.CTE)}
+        tables = [table for table in expression.find_all(exp.Table) if table.name.lower() not in cte_names]
+        self.tables = sorted({table.name for table in tables})
+        # alias (or name) -> table name
+        self.aliases = {table.alias_or_name: table.name for table in tables}
+        self.aliases.update({table.name: table.name for table in tables})
+
+        columns = set()
+        # Unqualified columns belong to the only table when there is just one
+        default_table = self.tables[0] if len(self.tables) == 1 else ""
+        for column in expression.find_all(exp.Column):
+            table_name = self.aliases.get(column.table, column.table) or default_table
+            columns.add(f"{table_name}.{column.name}" if table_name else column.name)
+        self.columns = sorted(columns)
+
+    @property
+    def normalized(self):
+        """Canonical single-line form, used as a cache key"""
+        return self.expression.sql(dialect=self.dialect)
+
+    @property
+    def has_limit(self):
+        return self.expression.args.get('limit') is not None
+
+    @property
+    def is_aggregate(self):
+        """Whether the top-level SELECT groups its rows or aggregates them (window functions aside)"""
+        if not isinstance(self.expression, exp.Select):
+            return False
+        if self.expression.args.get('group') is not None:
+            return True
+        return any(
+            node.find_ancestor(exp.Window, exp.Subquery) is None
+            for projection in self.expression.expressions
+            for node in projection.find_all(exp.AggFunc)
+        )
+
+    def pretty(self):
+        """Indented form for display"""
+        return self.expression.sql(dialect=self.dialect, pretty=True)
+
+def _first_statement(text):
+    """Cut text at the first top-level semicolon (semicolons inside literals are kept)"""
+    try:
+        tokens = Tokenizer().tokenize(text)
+    except TokenError:
+        return text
+    for token in tokens:
+        if token.token_type == TokenType.SEMICOLON:
+            return text[:token.start]
+    return text
+
+def extract_sql(content, dialect=None):
+    """
+    Find and validate the query in a model response
+
+    Markdown fences and explanatory text before or after the query are dropped.
+
+    Args:
+        content: Raw model response
+        dialect: sqlglot dialect to parse with
+
+    Returns:
+        ParsedQuery
+
+    Raises:
+        ValueError: if no single valid read-only query is found
+    """
+    content = re.sub(r'```(?:sql)?\s*|\s*```', '', content or '', flags=re.IGNORECASE).strip()
+    error = None
+    # "with" can also appear in prose before the query, so try each candidate start
+    for start in re.finditer(r'\b(SELECT|WITH)\b', content, re.IGNORECASE):
+        statement = _first_statement(content[start.start():]).strip()
+        # Without a semicolon, trailing prose is dropped a line at a time until the query parses
+        lines = statement.splitlines()
+        for end in range(len(lines), 0, -1):
+            try:
+                return parse_sql('\n'.join(lines[:end]), dialect)
+            except ValueError as e:
+                if error is None:
+                    error = e
+    raise error or ValueError("No valid SELECT statement found in response")
+
+def parse_sql(sql_query, dialect=None):
+    """
+    Parse a single read-only query
+
+    Raises:
+        ValueError: on a syntax error, several statements, or a statement that is not a query
+    """
+    statement = sql_query.strip().rstrip(';').strip()
+    try:
+        expressions = [expression for expression in sqlglot.parse(statement, read=dialect) if expression is not None]
+    except ParseError as e:
+        error = e.errors[0] if e.errors else {}
+        raise ValueError(
+            f"Invalid SQL: {error.get('description', str(e))} "
+            f"(line {error.get('line')}, column {error.get('col')})"
+        )
+    except TokenError as e:
+        raise ValueError(f"Invalid SQL: {str(e)}")
+
+    if len(expressions) != 1:
+        raise ValueError("Expected exactly one SQL statement")
+    expression = expressions[0]
+    if not isinstance(expression, exp.Query) or any(isinstance(node, _WRITE_NODES) for node in expression.walk()):
+        raise ValueError("Only read-only SELECT queries are allowed")
+
+    return ParsedQuery(statement + ';', expression, dialect)
+
+def try_parse_sql(sql_query, dialect=None):
+    """parse_sql that returns None instead of raising"""
+    try:
+        return parse_sql(sql_query, dialect)
+    except ValueError:
+        return None
@@ -0,0 +1,28 @@
+# backend/utils/tokens.py
+from functools import lru_cache
+from ..config.settings import get_settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    """Return the tiktoken encoding for a model, or None if it cannot be loaded"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The encoding files are downloaded on first use, which fails offline
+        return None
+
+def count_tokens(text, model=None):
+    """Count tokens with tiktoken when it is installed, else estimate about 4 characters per token"""
+    if tiktoken is not None:
+        encoding = _encoding(model or get_settings().LLM_MODEL)
+        if encoding is not None:
+            return len(encoding.encode(text))
+    return (len(text) + 3) // 4
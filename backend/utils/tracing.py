@@ -0,0 +1,79 @@
+# backend/utils/tracing.py
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+import time
+from .metrics import STAGE_SECONDS
+
+# Trace of the request being handled, if timings were requested
+_current_trace = ContextVar("current_trace", default=None)
+
+class Span:
+    """One timed pipeline stage with its attributes"""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        """Attach attributes (e.g. token or row counts) to the span"""
+        self.attributes.update(attributes)
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def summary(self):
+        """Per-span timings in milliseconds, relative to the start of the trace"""
+        return {
+            'total_ms': round(1000 * (time.perf_counter() - self.started), 2),
+            'spans': [
+                {
+                    'stage': span.name,
+                    'start_ms': round(1000 * (span.started - self.started), 2),
+                    'duration_ms': round(1000 * span.duration, 2),
+                    **span.attributes
+                }
+                for span in sorted(self.spans, key=lambda span: span.started)
+            ]
+        }
+
+@contextmanager
+def trace():
+    """Collect the spans of the enclosed work into a Trace"""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a pipeline stage
+
+    The duration always feeds the stage latency histogram; the span is also
+    added to the current trace when one is active.
+    """
+    current = Span(name, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.started
+        STAGE_SECONDS.observe(current.duration, stage=name)
+        active = _current_trace.get()
+        if active is not None:
+            active.spans.append(current)
+
+def in_context(fn):
+    """Wrap a callable to run in a copy of the current context, so thread pool work joins the trace"""
+    context = copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
@@ -1,9 +1,25 @@
 # scripts/create_test_tables.py
+import random
 from sqlalchemy import create_engine, text
 from backend.database.connection import get_database_engine
 
-def create_test_tables():
-    engine = get_database_engine()
+# Name parts of the synthetic tables, so keyword matching sees realistic identifiers
+SYNTHETIC_ENTITIES = [
+    "pool", "node", "listener", "certificate", "health_check", "route", "rule", "backend",
+    "frontend", "cluster", "region", "zone", "subnet", "firewall", "policy", "session",
+    "tenant", "account", "alert", "metric", "event", "audit", "quota", "snapshot"
+]
+SYNTHETIC_COLUMNS = [
+    ("name", "VARCHAR(100)"), ("status", "VARCHAR(20)"), ("description", "VARCHAR(255)"),
+    ("created_at", "TIMESTAMP"), ("updated_at", "TIMESTAMP"), ("weight", "INTEGER"),
+    ("capacity", "INTEGER"), ("latency_ms", "FLOAT"), ("enabled", "BOOLEAN"),
+    ("owner", "VARCHAR(100)"), ("version", "INTEGER"), ("priority", "INTEGER"),
+    ("protocol", "VARCHAR(20)"), ("address", "VARCHAR(100)"), ("port", "INTEGER"),
+    ("threshold", "FLOAT"), ("label", "VARCHAR(50)"), ("notes", "VARCHAR(255)")
+]
+
+def create_test_tables(engine=None):
+    engine = engine or get_database_engine()
     
     with engine.connect() as conn:
         # Create VIP table
@@ -68,5 +84,82 @@ def create_test_tables():
         
         print("Successfully created test tables and sample data")
 
+def _sample_value(column_type, row_id, rng):
+    if column_type == "INTEGER":
+        return rng.randint(0, 10000)
+    if column_type == "FLOAT":
+        return round(rng.random() * 100, 2)
+    if column_type == "BOOLEAN":
+        return rng.random() < 0.5
+    if column_type == "TIMESTAMP":
+        return f"2024-01-{1 + row_id % 28:02d} 00:00:00"
+    return f"value-{row_id}"
+
+def create_synthetic_tables(num_tables, engine=None, rows_per_table=5, seed=0):
+    """
+    Create the test tables plus synthetic tables up to num_tables in total
+    
+    Each synthetic table has an id, 3 to 18 other columns and a foreign key to
+    an earlier table (the first ones to vip), so the schema forms one connected
+    join graph. The same seed always gives the same schema and data.
+    
+    Args:
+        num_tables: Total number of tables, including the three test tables
+        engine: SQLAlchemy engine (defaults to DATABASE_URL)
+        rows_per_table: Sample rows inserted into each synthetic table
+        seed: Random seed
+    
+    Returns:
+        Names of the synthetic tables, in creation order
+    """
+    engine = engine or get_database_engine()
+    create_test_tables(engine)
+    
+    rng = random.Random(seed)
+    table_names = []
+    with engine.begin() as conn:
+        for index in range(max(num_tables - 3, 0)):
+            table_name = f"{rng.choice(SYNTHETIC_ENTITIES)}_{index}"
+            parent = rng.choice(table_names[-50:]) if table_names else "vip"
+            parent_key = "vip_id" if parent == "vip" else "id"
+            columns = rng.sample(SYNTHETIC_COLUMNS, rng.randint(3, len(SYNTHETIC_COLUMNS)))
+            
+            definitions = ["id INTEGER NOT NULL"]
+            definitions.extend(f"{column} {column_type}" for column, column_type in columns)
+            definitions.append(f"{parent}_id INTEGER")
+            definitions.append("PRIMARY KEY (id)")
+            definitions.append(f"FOREIGN KEY({parent}_id) REFERENCES {parent} ({parent_key})")
+            conn.execute(text(f"CREATE TABLE {table_name} ({', '.join(definitions)})"))
+            
+            if rows_per_table:
+                names = ["id"] + [column for column, _ in columns] + [f"{parent}_id"]
+                rows = [
+                    {
+                        "id": row_id,
+                        **{column: _sample_value(column_type, row_id, rng) for column, column_type in columns},
+                        f"{parent}_id": rng.randint(1, 3 if parent == "vip" else rows_per_table)
+                    }
+                    for row_id in range(1, rows_per_table + 1)
+                ]
+                conn.execute(
+                    text(f"INSERT INTO {table_name} ({', '.join(names)}) "
+                         f"VALUES ({', '.join(':' + name for name in names)})"),
+                    rows
+                )
+            table_names.append(table_name)
+    
+    print(f"Created {len(table_names)} synthetic tables")
+    return table_names
+
 if __name__ == "__main__":
-    create_test_tables() 
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Create the test tables")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="Also create synthetic tables, up to N tables in total")
+    args = parser.parse_args()
+    
+    if args.synthetic:
+        create_synthetic_tables(args.synthetic)
+    else:
+        create_test_tables() 
\ No newline at end of file
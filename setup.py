@@ -7,7 +7,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "flask>=2.0.0",
-        "sqlalchemy>=1.4.0",
+        "sqlalchemy[asyncio]>=2.0.0",
         "transformers>=4.0.0",
         "python-dotenv>=0.19.0",
         "pytest>=6.0.0",
@@ -15,6 +15,11 @@ setup(
         "flake8>=3.9.0",
         "torch>=2.0.0",
         "openai>=1.0.0",
+        "numpy>=1.21.0",
+        "aiosqlite>=0.17.0",
+        "asgiref>=3.5.0",
+        "uvicorn>=0.20.0",
+        "sqlglot>=25.0.0",
     ],
     author="SQL Agent Team",
     author_email="team@sqlagent.dev",
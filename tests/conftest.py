@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+import pytest
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    """Agent over a fresh copy of the sample tables, answering with the mock LLM"""
+    from backend.config.settings import Settings
+    from backend.core.agent import SchemaAwareAgent
+    from backend.database.connection import get_engine, get_async_engine
+    from scripts.create_test_tables import create_test_tables
+    from mock_llm import MockLLM, install
+
+    database_url = f"sqlite:///{tmp_path}/test.db"
+    for name, value in {
+        'DATABASE_URL': database_url,
+        'ASYNC_DATABASE_URL': f"sqlite+aiosqlite:///{tmp_path}/test.db",
+        'SCHEMA_DB_URL': f"sqlite:///{tmp_path}/schema.db",
+        'SCHEMA_EMBEDDINGS_PATH': f"{tmp_path}/schema_embeddings.npz",
+        'RELEVANCE_MODE': "keyword",
+        'INTENT_MODE': "llm",
+        'MODEL_LOADING': "lazy",
+        'QUERY_CACHE_ENABLED': False,
+        'RESULT_CACHE_ENABLED': False,
+        'SINGLE_FLIGHT_ENABLED': False,
+        'SQL_REPAIR_BACKOFF': 0.0,
+    }.items():
+        monkeypatch.setattr(Settings, name, value)
+
+    from backend.core import agent as agent_module
+    monkeypatch.setattr(agent_module, "OpenAI", agent_module.OpenAI)
+    monkeypatch.setattr(agent_module, "AsyncOpenAI", agent_module.AsyncOpenAI)
+    install(MockLLM(delay_scale=0))
+
+    engine = get_engine(database_url)
+    create_test_tables(engine)
+    return SchemaAwareAgent(engine, async_engine=get_async_engine(Settings.ASYNC_DATABASE_URL))
@@ -0,0 +1,126 @@
+"""
+Deterministic stand-in for the OpenAI chat API, for offline benchmarks.
+
+Replies come from a recordings file (see benchmark_recordings.json): the
+classifier answer, the SQL or the general answer recorded for each question.
+Each call sleeps for the delay recorded for its purpose, so end-to-end
+timings include a realistic LLM wait without a network or an API key.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from backend.core.prompt_generator import NOT_SQL_PREFIX
+from backend.utils.tokens import count_tokens
+
+DEFAULT_RECORDINGS = Path(__file__).parent / "benchmark_recordings.json"
+
+class _Message:
+    def __init__(self, content):
+        self.role = "assistant"
+        self.content = content
+
+class _Choice:
+    def __init__(self, content):
+        self.index = 0
+        self.message = _Message(content)
+        self.finish_reason = "stop"
+
+class _Usage:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = prompt_tokens + completion_tokens
+
+class _Response:
+    def __init__(self, model, content, prompt_tokens):
+        self.model = model
+        self.choices = [_Choice(content)]
+        self.usage = _Usage(prompt_tokens, count_tokens(content, model))
+
+class MockLLM:
+    """Recorded completions keyed by question, with per-purpose delays"""
+
+    def __init__(self, recordings=DEFAULT_RECORDINGS, delay_scale=1.0):
+        """
+        Args:
+            recordings: Path of a recordings JSON file, or its parsed content
+            delay_scale: Multiplier of the recorded delays (0 for no delay)
+        """
+        if not isinstance(recordings, dict):
+            with open(recordings) as f:
+                recordings = json.load(f)
+        self.delays = {purpose: delay * delay_scale for purpose, delay in recordings.get("delays", {}).items()}
+        self.default_sql = recordings.get("default_sql", "SELECT 1;")
+        self.questions = {entry["question"]: entry for entry in recordings.get("questions", [])}
+        self.calls = 0
+
+    def purpose(self, messages):
+        """Tell which agent request the messages are, from their system prompt and last turn"""
+        system = messages[0]["content"]
+        last = messages[-1]["content"]
+        if system.startswith("You are a classifier"):
+            return "classify"
+        if system.startswith("You are a helpful"):
+            return "general"
+        if len(messages) > 2 and last.startswith("The query failed"):
+            return "repair"
+        if len(messages) > 2 and last.startswith("This query is too expensive"):
+            return "regenerate"
+        return "generate"
+
+    def reply(self, messages):
+        """Return (purpose, content) for a request"""
+        self.calls += 1
+        purpose = self.purpose(messages)
+        entry = self.questions.get(messages[1]["content"].strip(), {})
+        is_sql = entry.get("is_sql", True)
+        if purpose == "classify":
+            return purpose, "true" if is_sql else "false"
+        if purpose == "general":
+            return purpose, entry.get("answer", "I can only answer questions about the database.")
+        if not is_sql and NOT_SQL_PREFIX in messages[0]["content"]:
+            return purpose, f"{NOT_SQL_PREFIX} {entry.get('answer', '')}"
+        return purpose, entry.get("sql", self.default_sql)
+
+    def create(self, model, messages):
+        purpose, content = self.reply(messages)
+        time.sleep(self.delays.get(purpose, 0))
+        return self._response(model, messages, content)
+
+    async def acreate(self, model, messages):
+        purpose, content = self.reply(messages)
+        await asyncio.sleep(self.delays.get(purpose, 0))
+        return self._response(model, messages, content)
+
+    def _response(self, model, messages, content):
+        prompt_tokens = sum(count_tokens(message["content"], model) for message in messages)
+        return _Response(model, content, prompt_tokens)
+
+class _Completions:
+    def __init__(self, llm, is_async):
+        self.llm = llm
+        self.is_async = is_async
+
+    def create(self, model, messages, **kwargs):
+        if self.is_async:
+            return self.llm.acreate(model, messages)
+        return self.llm.create(model, messages)
+
+class _Chat:
+    def __init__(self, llm, is_async):
+        self.completions = _Completions(llm, is_async)
+
+class MockClient:
+    """Drop-in for openai.OpenAI / openai.AsyncOpenAI backed by a MockLLM"""
+
+    def __init__(self, llm, is_async=False):
+        self.chat = _Chat(llm, is_async)
+
+def install(llm):
+    """Make agents created from now on use the mock instead of the OpenAI clients"""
+    from backend.core import agent
+    agent.OpenAI = lambda *args, **kwargs: MockClient(llm)
+    agent.AsyncOpenAI = lambda *args, **kwargs: MockClient(llm, is_async=True)
+    return llm
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the SQL agent.
+
+Builds synthetic SQLite schemas of increasing size, answers the recorded
+questions with a mock LLM (see mock_llm.py) and reports, per schema size and
+per pipeline stage, throughput, p50/p99 latency and peak RSS. Results are
+written as JSON so runs on different commits can be compared:
+
+    python tests/run_benchmark.py --sizes 10,100,1000 --output before.json
+    python tests/run_benchmark.py --sizes 10,100,1000 --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Benchmarks should not be slowed down by per-query INFO logging
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.config.settings import Settings
+from backend.core.agent import SchemaAwareAgent
+from backend.database.connection import get_engine, dispose_engines
+from backend.utils.metrics import percentile
+from backend.utils.tracing import trace
+from scripts.create_test_tables import create_synthetic_tables
+from mock_llm import MockLLM, DEFAULT_RECORDINGS, install
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_mb():
+    """Resident set size of this process in MB (peak so far where the current value is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except OSError:
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+class RssSampler:
+    """Sample the RSS in a background thread, so the peak of any time window can be looked up"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append((time.perf_counter(), current_rss_mb()))
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def peak(self, start, end):
+        """Highest RSS sampled between two perf_counter times (the closest sample if none fell inside)"""
+        inside = [rss for at, rss in self.samples if start <= at <= end and rss is not None]
+        if inside:
+            return max(inside)
+        before = [rss for at, rss in self.samples if at <= end and rss is not None]
+        return before[-1] if before else current_rss_mb()
+
+def summarize(durations, peak_rss=None, wall_time=None):
+    """
+    Latency summary of one stage
+
+    Throughput is calls per second of wall time when it is given (end to end),
+    else calls per second of time spent in the stage.
+    """
+    total = wall_time if wall_time is not None else sum(durations)
+    summary = {
+        'count': len(durations),
+        'p50_ms': round(1000 * percentile(durations, 50), 3),
+        'p99_ms': round(1000 * percentile(durations, 99), 3),
+        'mean_ms': round(1000 * sum(durations) / len(durations), 3),
+        'throughput_per_s': round(len(durations) / total, 3) if total else None
+    }
+    if peak_rss is not None:
+        summary['peak_rss_mb'] = round(peak_rss, 1)
+    return summary
+
+def configure(work_dir, num_tables, args):
+    """Point the settings at fresh databases for one schema size"""
+    Settings.DATABASE_URL = f"sqlite:///{work_dir}/bench_{num_tables}.db"
+    Settings.SCHEMA_DB_URL = f"sqlite:///{work_dir}/schema_{num_tables}.db"
+    Settings.ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{work_dir}/bench_{num_tables}.db"
+    Settings.SCHEMA_EMBEDDINGS_PATH = f"{work_dir}/schema_embeddings_{num_tables}.npz"
+    Settings.RELEVANCE_MODE = args.relevance_mode
+    Settings.INTENT_MODE = args.intent_mode
+    Settings.MODEL_LOADING = "lazy"
+    # Every question should go through the full pipeline on every iteration, even when
+    # concurrent workers ask the same question at once
+    Settings.QUERY_CACHE_ENABLED = False
+    Settings.RESULT_CACHE_ENABLED = False
+    Settings.SINGLE_FLIGHT_ENABLED = False
+
+def run_size(num_tables, questions, work_dir, args):
+    """Benchmark one schema size and return its result entry"""
+    configure(work_dir, num_tables, args)
+    engine = get_engine(Settings.DATABASE_URL)
+    stage_durations = {}
+    stage_windows = {}
+    setup = {}
+
+    def record(current):
+        for span in current.spans:
+            stage_durations.setdefault(span.name, []).append(span.duration)
+            stage_windows.setdefault(span.name, []).append((span.started, span.started + span.duration))
+
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        create_synthetic_tables(num_tables, engine, rows_per_table=args.rows, seed=args.seed)
+        setup['generate_schema_s'] = round(time.perf_counter() - started, 3)
+
+        agent = SchemaAwareAgent(engine)
+        started = time.perf_counter()
+        with trace() as current:
+            agent.warm_up()
+        record(current)
+        setup['warm_up_s'] = round(time.perf_counter() - started, 3)
+
+        def answer(question):
+            with trace() as current:
+                started = time.perf_counter()
+                error = None
+                try:
+                    agent.run(question)
+                except Exception as e:
+                    error = str(e)
+                return time.perf_counter() - started, current, error
+
+        jobs = [question for _ in range(args.iterations) for question in questions]
+        started = time.perf_counter()
+        if args.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                answers = list(pool.map(answer, jobs))
+        else:
+            answers = [answer(question) for question in jobs]
+        wall_time = time.perf_counter() - started
+        finished = time.perf_counter()
+
+    errors = [error for _, _, error in answers if error]
+    for _, current, _ in answers:
+        record(current)
+
+    stages = {
+        name: summarize(
+            durations,
+            max(sampler.peak(start, end) for start, end in stage_windows[name])
+        )
+        for name, durations in sorted(stage_durations.items())
+    }
+    result = {
+        'tables': num_tables,
+        'setup': setup,
+        'end_to_end': summarize(
+            [duration for duration, _, _ in answers],
+            sampler.peak(finished - wall_time, finished),
+            wall_time
+        ),
+        'stages': stages,
+        'errors': len(errors),
+        'peak_rss_mb': round(max(rss for _, rss in sampler.samples if rss is not None), 1)
+    }
+    if errors:
+        result['first_error'] = errors[0]
+
+    agent._executor.shutdown(wait=False)
+    dispose_engines()
+    return result
+
+def git_commit():
+    """Current commit hash, if the project is a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=project_root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(result, baseline=None):
+    """Print one schema size's stage table, with the change from the baseline when given"""
+    print(f"\n{result['tables']} tables  (schema {result['setup']['generate_schema_s']}s, "
+          f"warm-up {result['setup']['warm_up_s']}s, peak RSS {result['peak_rss_mb']} MB, "
+          f"{result['errors']} errors)")
+    print(f"  {'stage':<20}{'count':>7}{'p50 ms':>11}{'p99 ms':>11}{'per s':>10}{'RSS MB':>9}")
+    rows = [('end_to_end', result['end_to_end'])] + list(result['stages'].items())
+    for name, summary in rows:
+        line = (f"  {name:<20}{summary['count']:>7}{summary['p50_ms']:>11.2f}{summary['p99_ms']:>11.2f}"
+                f"{summary['throughput_per_s'] or 0:>10.1f}{summary.get('peak_rss_mb', 0):>9.1f}")
+        if baseline:
+            previous = baseline['end_to_end'] if name == 'end_to_end' else baseline['stages'].get(name)
+            if previous and previous['p50_ms']:
+                line += f"   p50 {100 * (summary['p50_ms'] / previous['p50_ms'] - 1):+.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline SQL agent benchmark")
+    parser.add_argument('--sizes', default="10,100,1000,10000",
+                        help="Comma-separated schema sizes, in tables (default: 10,100,1000,10000)")
+    parser.add_argument('--iterations', type=int, default=3, help="Passes over the recorded questions")
+    parser.add_argument('--concurrency', type=int, default=1, help="Questions answered at once")
+    parser.add_argument('--recordings', default=str(DEFAULT_RECORDINGS), help="Recorded completions (JSON)")
+    parser.add_argument('--delay-scale', type=float, default=1.0,
+                        help="Multiplier of the recorded LLM delays (0 to time only local work)")
+    parser.add_argument('--relevance-mode', default="keyword", choices=["keyword", "embedding", "nli"])
+    parser.add_argument('--intent-mode', default="llm", choices=["llm", "single", "local"])
+    parser.add_argument('--rows', type=int, default=5, help="Sample rows per synthetic table")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    llm = install(MockLLM(args.recordings, args.delay_scale))
+    with open(args.recordings) as f:
+        questions = [entry['question'] for entry in json.load(f)['questions']]
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result['tables']: result for result in json.load(f)['results']}
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'results': []
+    }
+
+    print("SQL Agent Benchmark")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory(prefix="sql-agent-bench-") as work_dir:
+        for num_tables in (int(size) for size in args.sizes.split(",")):
+            result = run_size(num_tables, questions, work_dir, args)
+            report['results'].append(result)
+            print_result(result, baseline.get(num_tables))
+
+    report['llm_calls'] = llm.calls
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
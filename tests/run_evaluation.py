@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Accuracy evaluation for the SQL agent.
+
+Runs a question set through the agent on a bounded worker pool and compares
+each result with the result of the question's gold SQL. Rows are compared as
+a multiset and columns by their values, so row order, column order and
+column names do not matter. Reports accuracy, latency and token cost per
+question, and backs off (all workers together) when the LLM API rate-limits.
+The question and result caches are off, so every run scores the model.
+Results cut short by RESULT_MAX_ROWS/RESULT_MAX_BYTES are reported as
+truncated instead of being scored.
+
+    python tests/run_evaluation.py --questions tests/eval_questions.json --workers 8
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.config.settings import Settings
+from backend.core.agent import SchemaAwareAgent
+from backend.database.connection import get_database_engine
+from backend.tools.columnar import execute_columnar
+from backend.utils.metrics import percentile
+from backend.utils.tracing import trace
+
+class RateLimitBackoff:
+    """
+    Shared backoff for every worker
+
+    When one call is rate-limited, no worker starts a new call until the
+    retry delay (the server's Retry-After, else exponential with jitter) has passed.
+    """
+
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        self.rate_limited = 0
+
+    @staticmethod
+    def is_rate_limit(error):
+        """Tell whether an exception is an HTTP 429 from the LLM API"""
+        return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+    @staticmethod
+    def _retry_after(error):
+        response = getattr(error, "response", None)
+        try:
+            return float(response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def wait(self):
+        """Block until the shared backoff window has passed"""
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def call(self, fn, *args):
+        """Call fn, retrying rate-limited calls with backoff"""
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            try:
+                return fn(*args)
+            except Exception as e:
+                if not self.is_rate_limit(e) or attempt == self.max_retries:
+                    raise
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+                with self._lock:
+                    self.rate_limited += 1
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+def _normalize_value(value):
+    """Compare numbers by value (1 == 1.0) and round away float noise"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 6)
+    return str(value)
+
+def canonical_result(result):
+    """
+    Order-insensitive form of a ColumnarResult
+
+    Columns are sorted by their sorted values, then rows are counted, so two
+    results are equal when they hold the same rows in any row or column order.
+    """
+    columns = [[_normalize_value(value) for value in array.tolist()] for array in result.arrays]
+    columns.sort(key=lambda values: sorted(map(repr, values)))
+    return Counter(zip(*columns)) if columns else Counter()
+
+def evaluate(agent, engine, item, backoff, prices):
+    """Answer one question and score it against its gold SQL"""
+    question = item['question']
+    entry = {'question': question, 'gold_sql': item['gold_sql']}
+    with trace() as current:
+        try:
+            result, sql_query = backoff.call(agent.run_columnar, question)
+            entry['sql'] = sql_query
+            if sql_query is None:
+                entry['error'] = "Answered without SQL"
+            else:
+                gold = execute_columnar(item['gold_sql'], engine, max_rows=0)
+                entry['rows'] = result.num_rows
+                entry['gold_rows'] = gold.num_rows
+                if result.truncated:
+                    # A capped result cannot be compared with the full gold result
+                    entry['truncated'] = result.truncated
+                    entry['correct'] = None
+                else:
+                    entry['correct'] = canonical_result(result) == canonical_result(gold)
+        except Exception as e:
+            entry['error'] = str(e)
+    entry.setdefault('correct', False)
+
+    summary = current.summary()
+    llm_spans = [span for span in summary['spans'] if span['stage'] == 'llm']
+    entry['latency_ms'] = summary['total_ms']
+    entry['llm_calls'] = len(llm_spans)
+    entry['prompt_tokens'] = sum(span.get('prompt_tokens') or 0 for span in llm_spans)
+    entry['completion_tokens'] = sum(span.get('completion_tokens') or 0 for span in llm_spans)
+    entry['cost_usd'] = round(
+        entry['prompt_tokens'] / 1000 * prices[0] + entry['completion_tokens'] / 1000 * prices[1], 6
+    )
+    return entry
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate SQL agent accuracy against gold SQL")
+    parser.add_argument('--questions', default=str(Path(__file__).parent / "eval_questions.json"),
+                        help="JSON list of {\"question\", \"gold_sql\"} objects")
+    parser.add_argument('--workers', type=int, default=8, help="Questions evaluated at once")
+    parser.add_argument('--max-retries', type=int, default=5, help="Retries of a rate-limited question")
+    parser.add_argument('--prompt-price', type=float, default=0.03, help="USD per 1K prompt tokens")
+    parser.add_argument('--completion-price', type=float, default=0.06, help="USD per 1K completion tokens")
+    parser.add_argument('--mock-llm', metavar='RECORDINGS', nargs='?', const="",
+                        help="Answer with recorded completions instead of the OpenAI API (see mock_llm.py)")
+    parser.add_argument('--output', default="evaluation_results.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    # Score the model on every run: no SQL or results from earlier runs, no answers shared between questions
+    Settings.QUERY_CACHE_ENABLED = False
+    Settings.RESULT_CACHE_ENABLED = False
+    Settings.SINGLE_FLIGHT_ENABLED = False
+
+    if args.mock_llm is not None:
+        from mock_llm import MockLLM, DEFAULT_RECORDINGS, install
+        install(MockLLM(args.mock_llm or DEFAULT_RECORDINGS))
+
+    with open(args.questions) as f:
+        items = json.load(f)
+
+    engine = get_database_engine()
+    agent = SchemaAwareAgent(engine, preload=True)
+    backoff = RateLimitBackoff(max_retries=args.max_retries)
+    prices = (args.prompt_price, args.completion_price)
+
+    print("🤖 SQL Agent Evaluation")
+    print("=" * 50)
+
+    entries = [None] * len(items)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(evaluate, agent, engine, item, backoff, prices): index
+            for index, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            entry = entries[futures[future]] = future.result()
+            mark = "⚠️" if entry['correct'] is None else "✅" if entry['correct'] else "❌"
+            detail = f" ({entry['error']})" if 'error' in entry else ""
+            print(f"{mark} {entry['latency_ms']:>8.0f} ms {entry['prompt_tokens'] + entry['completion_tokens']:>6} tok  "
+                  f"{entry['question']}{detail}")
+    wall_time = time.perf_counter() - started
+
+    scored = [entry for entry in entries if entry['correct'] is not None]
+    correct = sum(entry['correct'] for entry in scored)
+    latencies = [entry['latency_ms'] for entry in entries]
+    summary = {
+        'questions': len(entries),
+        'scored': len(scored),
+        'correct': correct,
+        'accuracy': round(correct / len(scored), 4) if scored else None,
+        'truncated': len(entries) - len(scored),
+        'errors': sum('error' in entry for entry in entries),
+        'latency_p50_ms': percentile(latencies, 50) if entries else None,
+        'latency_p99_ms': percentile(latencies, 99) if entries else None,
+        'prompt_tokens': sum(entry['prompt_tokens'] for entry in entries),
+        'completion_tokens': sum(entry['completion_tokens'] for entry in entries),
+        'cost_usd': round(sum(entry['cost_usd'] for entry in entries), 4),
+        'rate_limited': backoff.rate_limited,
+        'workers': args.workers,
+        'wall_time_s': round(wall_time, 3)
+    }
+
+    with open(args.output, "w") as f:
+        json.dump({'summary': summary, 'questions': entries}, f, indent=2, default=str)
+
+    print("\n" + "=" * 50)
+    print(f"📊 Accuracy: {correct}/{len(scored)} ({100 * (summary['accuracy'] or 0):.1f}%), "
+          f"{summary['truncated']} truncated (not scored), {summary['errors']} errors, "
+          f"{summary['rate_limited']} rate-limited calls")
+    print(f"Latency p50 {summary['latency_p50_ms']} ms, p99 {summary['latency_p99_ms']} ms; "
+          f"{summary['prompt_tokens'] + summary['completion_tokens']} tokens (${summary['cost_usd']}); "
+          f"wall time {summary['wall_time_s']}s")
+    print(f"Results written to {args.output}")
+    return 0 if correct == len(scored) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import asyncio
+from backend.config.settings import Settings
+from backend.core.query_cache import QueryCache
+from backend.utils.helpers import normalize_question
+from backend.utils.tracing import trace
+
+def enable_query_cache(agent, tmp_path):
+    agent.query_cache = QueryCache(agent.schema_manager, cache_db_url=f"sqlite:///{tmp_path}/query_cache.db")
+    agent.run("show vip addresses")
+    return agent.query_cache._entries[normalize_question("show vip addresses")]
+
+def retrieval_spans(current):
+    return [span['queries'] for span in current.summary()['spans'] if span['stage'] == 'retrieval']
+
+def test_identical_questions_are_answered_once(agent):
+    events = list(agent.run_batch(["show vip addresses", "Show VIP addresses?", "show tables"]))
+    assert sorted(event['indices'] for event in events) == [[0, 1], [2]]
+    assert all('error' not in event for event in events)
+
+def test_cached_question_is_looked_up_once(agent, tmp_path):
+    entry = enable_query_cache(agent, tmp_path)
+    list(agent.run_batch(["show vip addresses", "list vip ports"]))
+    assert entry.hits == 1
+
+def test_cached_question_is_looked_up_once_async(agent, tmp_path):
+    entry = enable_query_cache(agent, tmp_path)
+
+    async def main():
+        return [event async for event in agent.arun_batch(["show vip addresses", "list vip ports"])]
+
+    assert len(asyncio.run(main())) == 2
+    assert entry.hits == 1
+
+def test_misses_are_retrieved_in_chunks(agent, tmp_path):
+    enable_query_cache(agent, tmp_path)
+    questions = ["show vip addresses", "list vip ports", "list load balancers", "show lb locations", "count vips"]
+    with trace() as current:
+        events = list(agent.run_batch(questions, concurrency=2))
+    assert len(events) == 5
+    # The cache hit needs no prompt; the four misses are scored two at a time
+    assert retrieval_spans(current) == [2, 2]
@@ -0,0 +1,42 @@
+from backend.core.keyword_index import KeywordIndex
+
+def _index():
+    index = KeywordIndex()
+    index.add_table("load_balancer", ["load", "balancer", "location", "device"])
+    index.add_table("vip", ["vip", "address", "port", "device"])
+    return index
+
+def test_search_counts_matches_and_scores():
+    results = _index().search(["vip", "port", "unknown"])
+    assert set(results) == {"vip"}
+    matches, score = results["vip"]
+    assert matches == 2
+    assert score > 0
+
+def test_rare_terms_outweigh_common_ones():
+    results = _index().search(["device", "location"])
+    assert results["load_balancer"][1] > results["vip"][1]
+    assert results["vip"][0] == 1
+
+def test_reindex_replaces_keywords():
+    index = _index()
+    index.add_table("vip", ["pool"])
+    assert "vip" not in index.search(["port"])
+    assert index.keyword_count("vip") == 1
+    assert len(index) == 2
+
+def test_remove_table_drops_its_postings():
+    index = _index()
+    index.remove_table("vip")
+    assert "vip" not in index
+    assert index.search(["vip", "port"]) == {}
+    assert index.tables() == ["load_balancer"]
+    index.remove_table("vip")
+
+def test_find_table_is_case_insensitive():
+    index = _index()
+    assert index.find_table("VIP") == "vip"
+    assert index.find_table("pool") is None
+
+def test_empty_index():
+    assert KeywordIndex().search(["vip"]) == {}
@@ -0,0 +1,79 @@
+from backend.core.prompt_generator import DynamicPromptGenerator
+from backend.core.schema_manager import SchemaSnapshot
+from backend.utils.tokens import count_tokens
+
+def table(*columns, foreign_keys=()):
+    return {
+        'columns': [
+            {'name': name, 'type': 'INTEGER' if name.endswith('id') else 'VARCHAR',
+             'nullable': name != 'id', 'primary_key': name == 'id'}
+            for name in ('id',) + columns
+        ],
+        'foreign_keys': [
+            {'constrained_columns': [column], 'referred_table': referred, 'referred_columns': ['id']}
+            for column, referred in foreign_keys
+        ]
+    }
+
+SCHEMAS = {
+    'vips': table('address', 'port', 'protocol', 'owner', 'created_at', 'lb_id', foreign_keys=[('lb_id', 'lbs')]),
+    'lbs': table('name', 'location', 'datacenter_id', foreign_keys=[('datacenter_id', 'datacenters')]),
+    'datacenters': table('name', 'region', 'capacity', 'operator', 'opened_at'),
+    'certificates': table('subject', 'issuer', 'expires_at', 'serial', 'algorithm'),
+}
+
+class StaticSchemaManager:
+    def get_snapshot(self):
+        return SchemaSnapshot(1, SCHEMAS, {})
+
+class StaticRelevance:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def analyze_queries(self, queries):
+        return [list(self.tables) for _ in queries]
+
+def generator(relevant_tables=(), **kwargs):
+    return DynamicPromptGenerator(StaticSchemaManager(), StaticRelevance(relevant_tables), **kwargs)
+
+def test_tables_within_budget_are_written_in_full():
+    section, tables = generator(token_budget=100000)._generate_schema_section(
+        "show vip addresses", SCHEMAS, ['vips', 'lbs'])
+    assert tables == ['vips', 'lbs']
+    assert "- address: VARCHAR  NULL" in section
+    assert "- location: VARCHAR  NULL" in section
+
+def test_wide_tables_are_written_compactly():
+    section, _ = generator(token_budget=100000, wide_table_columns=4)._generate_schema_section(
+        "show vip address and port", SCHEMAS, ['vips'])
+    # Key columns first, then the columns the question mentions
+    assert "vips(id INTEGER PK, lb_id INTEGER, address VARCHAR, port VARCHAR" in section
+
+def test_least_relevant_table_is_cut_down_first():
+    prompt_generator = generator()
+    prompt_generator.token_budget = sum(
+        count_tokens(prompt_generator._format_table(name, SCHEMAS[name]['columns'])) for name in ('vips', 'datacenters')
+    ) - 1
+    section, tables = prompt_generator._generate_schema_section("show datacenter regions", SCHEMAS, ['vips', 'datacenters'])
+    assert tables == ['vips', 'datacenters']
+    assert "datacenters(id INTEGER PK, region VARCHAR, ... 4 more columns)" in section
+    assert "- address: VARCHAR  NULL" in section
+
+def test_tables_are_dropped_but_the_most_relevant_is_kept():
+    section, tables = generator(token_budget=1)._generate_schema_section(
+        "show vip addresses", SCHEMAS, ['vips', 'certificates', 'datacenters'])
+    assert tables == ['vips']
+    assert "certificates" not in section
+
+def test_bridge_tables_are_kept_over_budget():
+    prompt = generator(['vips', 'datacenters', 'certificates'], token_budget=1).generate_prompt("vips per datacenter")
+    assert "lbs(id INTEGER PK, datacenter_id INTEGER, ... 2 more columns)" in prompt
+    assert "certificates" not in prompt
+    assert "datacenters" not in prompt.split("Database Schema:")[1].split("Table Relationships:")[0]
+    assert "Join through lbs" in prompt
+
+def test_relationships_list_joins_through_bridge_tables():
+    prompt = generator(['vips', 'datacenters'], token_budget=100000).generate_prompt("vips per datacenter")
+    assert "- vips JOIN lbs ON vips.lb_id = lbs.id" in prompt
+    assert "- lbs JOIN datacenters ON lbs.datacenter_id = datacenters.id" in prompt
+    assert "Join through lbs to connect tables that are not linked directly." in prompt
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from backend.core.query_cache import QueryCache
+from backend.core.schema_manager import SchemaManager
+from backend.utils.helpers import normalize_question
+
+VIP_COLUMNS = [{'name': 'id', 'type': 'INTEGER'}, {'name': 'address', 'type': 'VARCHAR'}]
+
+class WordModel:
+    """Embeds a question as its normalized bag of words, so reworded questions stay close"""
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            vector = np.zeros(64, dtype=np.float32)
+            for word in text.replace("'", " ").split():
+                vector[hash(word.strip('s')) % 64] += 1
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors
+
+@pytest.fixture
+def schema_manager(tmp_path):
+    manager = SchemaManager(f"sqlite:///{tmp_path}/schemas.db")
+    manager.update_schema('vips', VIP_COLUMNS)
+    return manager
+
+def make_cache(schema_manager, tmp_path, **kwargs):
+    return QueryCache(schema_manager, cache_db_url=f"sqlite:///{tmp_path}/query_cache.db", **kwargs)
+
+def test_normalize_question_keeps_quoted_literals():
+    assert normalize_question("  Show  VIPs in 'US-East'? ") == "show vips in 'US-East'"
+    assert normalize_question('Show VIPs in "US-East"', case_sensitive=True) == 'Show VIPs in "US-East"'
+
+def test_exact_hit_ignores_case_and_punctuation(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path)
+    cache.store("show vip addresses", "SELECT address FROM vips", ['vips'])
+    assert cache.lookup("Show VIP addresses?") == "SELECT address FROM vips"
+
+def test_quoted_literals_keep_their_case(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path)
+    cache.store("vips in 'US-East'", "SELECT * FROM vips WHERE region = 'US-East'", ['vips'])
+    assert cache.lookup("VIPs in 'us-east'") is None
+    assert cache.lookup("VIPs in 'US-East'") is not None
+
+def test_case_sensitive_cache_separates_questions(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path, case_sensitive=True)
+    cache.store("vips in US", "SELECT * FROM vips WHERE region = 'US'", ['vips'])
+    assert cache.lookup("vips in us") is None
+    assert cache.lookup("vips in US") is not None
+
+def test_semantic_match_requires_same_literal_values(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path, model=WordModel(), similarity=0.8)
+    cache.store("show vips on port 443", "SELECT * FROM vips WHERE port = 443", ['vips'])
+    assert cache.lookup("show vip on port 443") == "SELECT * FROM vips WHERE port = 443"
+    assert cache.lookup("show vips on port 8443") is None
+
+def test_schema_change_invalidates_entry(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path)
+    cache.store("show vip addresses", "SELECT address FROM vips", ['vips'])
+    schema_manager.update_schema('vips', VIP_COLUMNS + [{'name': 'port', 'type': 'INTEGER'}])
+    assert cache.lookup("show vip addresses") is None
+    assert "show vip addresses" not in cache._entries
+
+def test_expired_entry_is_dropped(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path, ttl=60)
+    cache.store("show vip addresses", "SELECT address FROM vips", ['vips'])
+    cache._entries["show vip addresses"].created_at -= 120
+    assert cache.lookup("show vip addresses") is None
+
+def test_hits_are_written_in_batches(schema_manager, tmp_path):
+    cache = make_cache(schema_manager, tmp_path, flush_interval=3600)
+    cache.store("show vip addresses", "SELECT address FROM vips", ['vips'])
+    for _ in range(3):
+        cache.lookup("show vip addresses")
+    assert make_cache(schema_manager, tmp_path)._entries["show vip addresses"].hits == 0
+
+    cache.flush()
+    assert make_cache(schema_manager, tmp_path)._entries["show vip addresses"].hits == 3
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import create_engine, text
+from backend.tools.query_guard import QueryGuard, QueryRejected
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/guard.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE big (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO big (id, name) VALUES (:id, 'x')"), [{'id': i} for i in range(1, 201)])
+        conn.execute(text("CREATE TABLE small (id INTEGER PRIMARY KEY, name TEXT)"))
+        # One row with a large id: the row count is 1, not 5000
+        conn.execute(text("INSERT INTO small (id, name) VALUES (5000, 'y')"))
+    yield engine
+    engine.dispose()
+
+def guard(engine, action, **kwargs):
+    kwargs.setdefault('max_scan_rows', 100)
+    kwargs.setdefault('max_join_rows', 10000)
+    return QueryGuard(engine, action=action, limit=50, **kwargs)
+
+def test_unflagged_query_passes(engine):
+    assert guard(engine, "reject").check("SELECT * FROM small;") == "SELECT * FROM small;"
+
+def test_row_count_ignores_sparse_ids(engine):
+    assert guard(engine, "reject", max_scan_rows=10).inspect("SELECT * FROM small") == []
+
+def test_row_count_uses_analyze_stats(engine):
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.execute(text("UPDATE sqlite_stat1 SET stat = '5' WHERE tbl = 'big'"))
+    assert guard(engine, "reject").inspect("SELECT * FROM big") == []
+
+def test_reject_raises(engine):
+    with pytest.raises(QueryRejected) as error:
+        guard(engine, "reject").check("SELECT * FROM big;")
+    assert error.value.issues == ["full scan of big (~200 rows)"]
+
+def test_regenerate_raises_for_the_caller(engine):
+    with pytest.raises(QueryRejected):
+        guard(engine, "regenerate").check("SELECT * FROM big;")
+
+def test_warn_returns_query_unchanged(engine):
+    assert guard(engine, "warn").check("SELECT * FROM big;") == "SELECT * FROM big;"
+
+def test_limit_appends_limit(engine):
+    assert guard(engine, "limit").check("SELECT * FROM big;") == "SELECT * FROM big\nLIMIT 50;"
+
+def test_limit_leaves_aggregates_alone(engine):
+    sql_query = "SELECT name, COUNT(*) FROM big GROUP BY name;"
+    assert guard(engine, "limit").check(sql_query) == sql_query
+
+def test_query_with_limit_is_not_flagged(engine):
+    sql_query = "SELECT * FROM big LIMIT 10;"
+    assert guard(engine, "reject").check(sql_query) == sql_query
+
+def test_sorted_query_with_limit_is_still_flagged(engine):
+    with pytest.raises(QueryRejected):
+        guard(engine, "reject").check("SELECT * FROM big ORDER BY name LIMIT 10;")
+
+def test_cartesian_product_is_flagged(engine):
+    issues = guard(engine, "reject", max_scan_rows=1000, max_join_rows=1000).inspect(
+        "SELECT * FROM big a, big b"
+    )
+    assert len(issues) == 1
+    assert issues[0].startswith("nested-loop scan of big, big")
+
+def test_zero_disables_thresholds(engine):
+    query_guard = guard(engine, "reject", max_scan_rows=0, max_join_rows=0)
+    assert query_guard.max_scan_rows == 0
+    assert query_guard.inspect("SELECT * FROM big a, big b") == []
+
+def test_unknown_action():
+    with pytest.raises(ValueError):
+        QueryGuard(create_engine("sqlite://"), action="drop")
@@ -0,0 +1,84 @@
+import pytest
+from backend.core.relationship_analyzer import RelationshipAnalyzer
+from backend.core.schema_manager import SchemaSnapshot
+
+def table(*foreign_keys):
+    return {
+        'columns': [{'name': 'id', 'type': 'INTEGER', 'nullable': False, 'primary_key': True}],
+        'foreign_keys': [
+            {'constrained_columns': list(columns), 'referred_table': referred, 'referred_columns': list(referred_columns)}
+            for columns, referred, referred_columns in foreign_keys
+        ]
+    }
+
+# vips -> lbs -> datacenters -> regions; employees manage each other; shipments use a composite key
+SCHEMAS = {
+    'vips': table((['lb_id'], 'lbs', ['id'])),
+    'lbs': table((['datacenter_id'], 'datacenters', ['id'])),
+    'datacenters': table((['region_id'], 'regions', ['id'])),
+    'regions': table(),
+    'employees': table((['manager_id'], 'employees', ['id'])),
+    'orders': table(),
+    'shipments': table((['order_id', 'line_no'], 'orders', ['id', 'line_no'])),
+    'audit_log': table((['table_id'], 'missing_table', ['id'])),
+}
+
+class StaticSchemaManager:
+    def __init__(self, schemas):
+        self.snapshot = SchemaSnapshot(1, schemas, {})
+
+    def get_snapshot(self):
+        return self.snapshot
+
+@pytest.fixture(params=[500, 1], ids=['precomputed', 'on-demand'])
+def analyzer(request):
+    return RelationshipAnalyzer(StaticSchemaManager(SCHEMAS), max_hops=3, precompute_max_tables=request.param)
+
+def path_tables(path):
+    return [(edge.table, edge.referred_table) for edge in path]
+
+def test_shortest_path_is_found_in_either_direction(analyzer):
+    assert path_tables(analyzer.join_path('vips', 'datacenters')) == [('vips', 'lbs'), ('lbs', 'datacenters')]
+    assert path_tables(analyzer.join_path('datacenters', 'vips')) == [('lbs', 'datacenters'), ('vips', 'lbs')]
+    assert analyzer.join_path('vips', 'vips') == ()
+
+def test_paths_longer_than_max_hops_are_not_joined(analyzer):
+    assert len(analyzer.join_path('vips', 'regions')) == 3
+    analyzer = RelationshipAnalyzer(analyzer.schema_manager, max_hops=2, precompute_max_tables=analyzer.precompute_max_tables)
+    assert analyzer.join_path('vips', 'regions') is None
+
+def test_unconnected_and_unknown_tables(analyzer):
+    assert analyzer.join_path('vips', 'orders') is None
+    assert analyzer.join_path('unknown', 'vips') is None
+    # A foreign key to a table outside the schema is ignored
+    assert analyzer.join_edges(['audit_log']) == []
+
+def test_expand_tables_adds_bridges_in_order(analyzer):
+    bridges, edges = analyzer.expand_tables(['vips', 'regions', 'orders'])
+    assert bridges == ['lbs', 'datacenters']
+    assert path_tables(edges) == [('vips', 'lbs'), ('lbs', 'datacenters'), ('datacenters', 'regions')]
+    assert analyzer.expand_tables(['vips', 'lbs']) == ([], analyzer.join_edges(['vips', 'lbs']))
+
+def test_join_edges_only_between_given_tables(analyzer):
+    assert path_tables(analyzer.join_edges(['lbs', 'vips', 'regions'])) == [('vips', 'lbs')]
+
+def test_self_reference_joins_through_an_alias(analyzer):
+    (edge,) = analyzer.join_edges(['employees'])
+    assert edge.join_target() == "employees AS employees_ref"
+    assert edge.condition() == "employees.manager_id = employees_ref.id"
+    # The self-reference is listed once and leads nowhere else
+    assert analyzer.join_path('employees', 'vips') is None
+    assert len(analyzer.analyze_relationships('employees')) == 2
+
+def test_composite_key_joins_on_every_column(analyzer):
+    (edge,) = analyzer.join_edges(['orders', 'shipments'])
+    assert edge.join_target() == "orders"
+    assert edge.condition() == "shipments.order_id = orders.id AND shipments.line_no = orders.line_no"
+
+def test_graph_is_rebuilt_when_the_snapshot_changes():
+    schema_manager = StaticSchemaManager(SCHEMAS)
+    analyzer = RelationshipAnalyzer(schema_manager, max_hops=3)
+    assert analyzer.join_path('vips', 'orders') is None
+    schema_manager.snapshot = SchemaSnapshot(2, dict(SCHEMAS, vips=table((['order_id'], 'orders', ['id']))), {})
+    assert path_tables(analyzer.join_path('vips', 'orders')) == [('vips', 'orders')]
+    assert analyzer.join_path('vips', 'lbs') is None
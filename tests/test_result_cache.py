@@ -0,0 +1,52 @@
+from backend.tools.result_cache import ResultCache
+
+def test_formatting_differences_share_an_entry():
+    cache = ResultCache(max_bytes=1000, ttl=0)
+    cache.put("SELECT * FROM vips;", "rows")
+    assert cache.get("select *\n  from vips") == "rows"
+    assert cache.stats()['hits'] == 1
+
+def test_string_literals_are_not_normalized():
+    cache = ResultCache(max_bytes=1000, ttl=0)
+    cache.put("SELECT * FROM vips WHERE region = 'US  East'", "rows")
+    assert cache.get("SELECT * FROM vips WHERE region = 'US East'") is None
+
+def test_least_recently_used_entry_is_evicted_by_bytes():
+    cache = ResultCache(max_bytes=10, ttl=0)
+    cache.put("SELECT 1 FROM a", "aaaa")
+    cache.put("SELECT 1 FROM b", "bbbb")
+    cache.get("SELECT 1 FROM a")
+    cache.put("SELECT 1 FROM c", "cccc")
+    assert cache.get("SELECT 1 FROM b") is None
+    assert cache.get("SELECT 1 FROM a") == "aaaa"
+    assert cache.get("SELECT 1 FROM c") == "cccc"
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 8
+
+def test_result_larger_than_the_cache_is_not_stored():
+    cache = ResultCache(max_bytes=10, ttl=0)
+    cache.put("SELECT 1 FROM a", "aaaa")
+    cache.put("SELECT 1 FROM b", "b" * 11)
+    assert cache.get("SELECT 1 FROM b") is None
+    assert cache.get("SELECT 1 FROM a") == "aaaa"
+
+def test_expired_entry_is_dropped():
+    cache = ResultCache(max_bytes=1000, ttl=60)
+    cache.put("SELECT 1 FROM a", "aaaa")
+    key = next(iter(cache._entries))
+    result, tables, size, created_at = cache._entries[key]
+    cache._entries[key] = (result, tables, size, created_at - 120)
+    assert cache.get("SELECT 1 FROM a") is None
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['bytes'] == 0
+
+def test_invalidate_table_drops_only_its_readers():
+    cache = ResultCache(max_bytes=1000, ttl=0)
+    cache.put("SELECT * FROM vips JOIN lbs ON vips.lb_id = lbs.id", "joined")
+    cache.put("SELECT * FROM vips", "vips")
+    cache.put("SELECT * FROM lbs", "lbs")
+    assert cache.invalidate_table("VIPS") == 2
+    assert cache.get("SELECT * FROM lbs") == "lbs"
+    assert cache.get("SELECT * FROM vips") is None
+    assert cache.stats()['invalidations'] == 2
+    assert cache.invalidate_table("vips") == 0
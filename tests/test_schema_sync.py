@@ -0,0 +1,27 @@
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, event, text
+from backend.core.schema_manager import MAX_BIND_PARAMETERS, SchemaManager
+
+@pytest.mark.skipif(not hasattr(sqlite3.Connection, 'setlimit'), reason="needs sqlite3 setlimit (Python 3.11+)")
+def test_sync_stays_within_the_bound_parameter_limit(tmp_path):
+    database = create_engine(f"sqlite:///{tmp_path}/many.db")
+    with database.begin() as conn:
+        for index in range(450):
+            conn.execute(text(f"CREATE TABLE t{index} (id INTEGER PRIMARY KEY, name TEXT)"))
+
+    schema_manager = SchemaManager(f"sqlite:///{tmp_path}/schemas.db")
+    # Enforce the limit of older SQLite builds on the schema database
+    event.listen(
+        schema_manager.schema_engine, "connect",
+        lambda dbapi_connection, record: dbapi_connection.setlimit(
+            sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, MAX_BIND_PARAMETERS)
+    )
+    schema_manager.schema_engine.dispose()
+
+    assert schema_manager.sync_schemas(database) == {'changed': 450, 'removed': 0, 'unchanged': 0}
+    assert len(schema_manager.get_snapshot().schemas) == 450
+
+    with database.begin() as conn:
+        conn.execute(text("DROP TABLE t0"))
+    assert schema_manager.sync_schemas(database) == {'changed': 0, 'removed': 1, 'unchanged': 449}
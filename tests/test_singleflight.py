@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+import pytest
+from backend.utils.singleflight import SingleFlight
+
+def _run_concurrently(flight, callers, fn, key="q"):
+    results = [None] * callers
+    threads = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, flight.do(key, fn)))
+        for i in range(callers)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        return "answer"
+
+    threads, results = _run_concurrently(flight, 5, fn)
+    _wait_for(lambda: flight.stats()['shared'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+    assert flight.stats() == {'executions': 1, 'shared': 4, 'overflow': 0, 'in_flight': 0}
+
+def test_failed_execution_is_released():
+    flight = SingleFlight()
+
+    def fn():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        flight.do("q", fn)
+    # The failed flight is released, so the next call runs again
+    assert flight.do("q", lambda: 1) == 1
+    assert flight.stats()['executions'] == 2
+
+def test_full_flight_starts_a_new_one():
+    flight = SingleFlight(max_waiters=1)
+    release = threading.Event()
+
+    def fn():
+        release.wait()
+        return "answer"
+
+    threads, results = _run_concurrently(flight, 3, fn)
+    _wait_for(lambda: flight.stats()['shared'] + flight.stats()['overflow'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["answer"] * 3
+    assert flight.stats()['executions'] == 2
+    assert flight.stats()['overflow'] == 1
+
+def test_async_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("q", fn) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert calls == [1]
+
+def test_cancelled_waiter_does_not_cancel_the_execution():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        first = asyncio.ensure_future(flight.ado("q", fn))
+        second = asyncio.ensure_future(flight.ado("q", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "answer"
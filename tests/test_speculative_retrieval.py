@@ -0,0 +1,41 @@
+import asyncio
+import threading
+import time
+
+def test_retrieval_overlaps_the_classifier(agent):
+    started = []
+    classify = agent._is_sql_query_request
+
+    def is_sql(query):
+        started.append(agent._retrievals)
+        return classify(query)
+
+    agent._is_sql_query_request = is_sql
+    _, sql_query = agent.run("show vip addresses")
+    assert sql_query is not None
+    assert started == [1]
+
+def test_saturated_pool_retrieves_inline(agent):
+    agent.retrieval_workers = 0
+    assert agent._start_retrieval("show vip addresses") is None
+    _, sql_query = agent.run("show vip addresses")
+    assert sql_query is not None
+    _, sql_query = asyncio.run(agent.arun("show vip addresses"))
+    assert sql_query is not None
+
+def test_busy_workers_are_not_queued_behind(agent):
+    agent.retrieval_workers = 1
+    release = threading.Event()
+    agent.prompt_generator.generate_prompt = lambda query: release.wait(5) and "prompt"
+    try:
+        future = agent._start_retrieval("show vip addresses")
+        assert agent._start_retrieval("list vip ports") is None
+    finally:
+        release.set()
+    assert future.result() == "prompt"
+    assert agent._start_retrieval("list vip ports").result() == "prompt"
+    # Done callbacks may run just after result() returns
+    deadline = time.monotonic() + 1
+    while agent._retrievals and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert agent._retrievals == 0
@@ -0,0 +1,11 @@
+from urllib.parse import unquote
+from backend.api.routes import sql_header
+
+def test_sql_header_is_latin1_safe_and_round_trips():
+    sql_query = "SELECT *\n  FROM lbs WHERE name = 'Zürich–東京' AND note LIKE '100%'"
+    header = sql_header(sql_query)
+    assert header.isascii()
+    assert unquote(header) == "SELECT * FROM lbs WHERE name = 'Zürich–東京' AND note LIKE '100%'"
+
+def test_ascii_sql_stays_readable():
+    assert sql_header("SELECT a, b FROM t WHERE c = 'x' AND d <> 1;") == "SELECT a, b FROM t WHERE c = 'x' AND d <> 1;"
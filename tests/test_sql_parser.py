@@ -0,0 +1,69 @@
+import pytest
+from backend.utils.sql_parser import extract_sql, parse_sql, try_parse_sql
+
+def test_semicolon_inside_literal_is_kept():
+    parsed = extract_sql("SELECT * FROM vip WHERE note = 'a;b';")
+    assert parsed.sql == "SELECT * FROM vip WHERE note = 'a;b';"
+
+def test_extract_stops_at_first_statement():
+    parsed = extract_sql("SELECT 1 FROM vip; DROP TABLE vip;")
+    assert parsed.sql == "SELECT 1 FROM vip;"
+
+def test_markdown_fence_and_prose_are_dropped():
+    content = "Here is the query:\n```sql\nSELECT vip_address FROM vip\n```\nIt lists every VIP."
+    assert extract_sql(content).sql == "SELECT vip_address FROM vip;"
+
+def test_trailing_prose_without_semicolon_is_dropped():
+    content = "SELECT vip_address\nFROM vip\nThis returns the address of each VIP."
+    assert extract_sql(content).sql == "SELECT vip_address\nFROM vip;"
+
+def test_with_in_prose_before_query():
+    content = "Start with the vip table.\nSELECT vip_address FROM vip;"
+    assert extract_sql(content).tables == ["vip"]
+
+def test_cte_names_are_not_tables():
+    parsed = parse_sql(
+        "WITH busy AS (SELECT device_id FROM load_balancer) "
+        "SELECT v.vip_address FROM vip v JOIN busy b ON b.device_id = v.device_id"
+    )
+    assert parsed.tables == ["load_balancer", "vip"]
+    assert "vip.vip_address" in parsed.columns
+
+@pytest.mark.parametrize("sql_query", [
+    "DELETE FROM vip",
+    "UPDATE vip SET port = 1",
+    "INSERT INTO vip (port) VALUES (1)",
+    "DROP TABLE vip",
+    "WITH gone AS (DELETE FROM vip RETURNING *) SELECT * FROM gone",
+])
+def test_write_statements_are_rejected(sql_query):
+    with pytest.raises(ValueError):
+        parse_sql(sql_query, "postgres")
+    assert try_parse_sql(sql_query, "postgres") is None
+
+def test_multiple_statements_are_rejected():
+    with pytest.raises(ValueError, match="exactly one"):
+        parse_sql("SELECT 1; SELECT 2")
+
+def test_no_query_in_response():
+    with pytest.raises(ValueError):
+        extract_sql("I cannot answer that from this database.")
+
+@pytest.mark.parametrize("sql_query, has_limit", [
+    ("SELECT * FROM vip LIMIT 5", True),
+    ("SELECT * FROM vip", False),
+    ("SELECT * FROM (SELECT * FROM vip LIMIT 5) AS v", False),
+    ("SELECT * FROM vip WHERE note = 'LIMIT 5'", False),
+])
+def test_has_limit_is_top_level_only(sql_query, has_limit):
+    assert parse_sql(sql_query).has_limit is has_limit
+
+@pytest.mark.parametrize("sql_query, is_aggregate", [
+    ("SELECT location, COUNT(*) FROM load_balancer GROUP BY location", True),
+    ("SELECT COUNT(*) FROM vip", True),
+    ("SELECT port, COUNT(*) OVER () FROM vip", False),
+    ("SELECT port, (SELECT MAX(port) FROM vip) FROM vip", False),
+    ("SELECT port FROM vip", False),
+])
+def test_is_aggregate(sql_query, is_aggregate):
+    assert parse_sql(sql_query).is_aggregate is is_aggregate
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+
+class Script:
+    """Stand-in for SchemaAwareAgent._complete: the classifier says SQL, then SQL replies in order"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def __call__(self, messages, purpose="generate"):
+        if purpose == "classify":
+            return "true"
+        self.requests.append((purpose, messages))
+        return self.replies.pop(0)
+
+    async def acomplete(self, messages, purpose="generate"):
+        return self(messages, purpose)
+
+def attempt_counts(agent):
+    return {number: entry['count'] for number, entry in agent.repair_stats.stats()['attempts'].items()}
+
+def test_first_try_is_one_attempt(agent):
+    agent._complete = Script("SELECT vip_address FROM vip;")
+    result, sql_query = agent.run("show vip addresses")
+    assert sql_query == "SELECT vip_address FROM vip;"
+    stats = agent.repair_stats.stats()
+    assert (stats['queries'], stats['repaired'], stats['failed']) == (1, 0, 0)
+    assert attempt_counts(agent) == {1: 1}
+
+def test_database_error_is_repaired(agent):
+    agent._complete = script = Script("SELECT nope FROM vip;", "SELECT vip_address FROM vip;")
+    _, sql_query = agent.run("show vip addresses")
+    assert sql_query == "SELECT vip_address FROM vip;"
+    purpose, messages = script.requests[-1]
+    assert purpose == "repair"
+    assert messages[-2] == {"role": "assistant", "content": "SELECT nope FROM vip;"}
+    assert "no such column" in messages[-1]["content"]
+    assert agent.repair_stats.stats()['repaired'] == 1
+    assert attempt_counts(agent) == {1: 1, 2: 1}
+
+def test_invalid_first_generation_is_repaired(agent):
+    agent._complete = script = Script("I would look at the vip table.", "SELECT vip_address FROM vip;")
+    _, sql_query = agent.run("show vip addresses")
+    assert sql_query == "SELECT vip_address FROM vip;"
+    assert script.requests[-1][0] == "repair"
+
+def test_unknown_table_is_repaired(agent):
+    agent._complete = Script("SELECT * FROM vips;", "SELECT * FROM vip;")
+    _, sql_query = agent.run("show vips")
+    assert sql_query == "SELECT * FROM vip;"
+
+def test_repair_prompt_pairs_each_response_with_its_error(agent):
+    agent._complete = script = Script(
+        "SELECT nope FROM vip;", "Sorry, here it is: nothing.", "SELECT vip_address FROM vip;"
+    )
+    agent.run("show vip addresses")
+    _, messages = script.requests[-1]
+    # The unparseable repair is what the model is told about, not the SQL before it
+    assert messages[-2] == {"role": "assistant", "content": "Sorry, here it is: nothing."}
+    assert "no such column" not in messages[-1]["content"]
+    assert attempt_counts(agent) == {1: 1, 2: 1, 3: 1}
+
+def test_exhausted_budget_raises(agent):
+    agent.repair_attempts = 1
+    agent._complete = Script("SELECT nope FROM vip;", "SELECT still_nope FROM vip;")
+    with pytest.raises(ValueError, match="Failed to execute SQL query"):
+        agent.run("show vip addresses")
+    stats = agent.repair_stats.stats()
+    assert (stats['queries'], stats['repaired'], stats['failed']) == (1, 0, 1)
+    assert attempt_counts(agent) == {1: 1, 2: 1}
+
+def test_async_repair(agent):
+    script = Script("SELECT nope FROM vip;", "SELECT vip_address FROM vip;")
+    agent._acomplete = script.acomplete
+    _, sql_query = asyncio.run(agent.arun("show vip addresses"))
+    assert sql_query == "SELECT vip_address FROM vip;"
+    assert attempt_counts(agent) == {1: 1, 2: 1}
@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from backend.config.settings import Settings
+from backend.database.connection import get_engine, get_async_engine
+from backend.tools.sql_agent_tool import TRUNCATED_KEY, astream_rows, sql_engine, stream_rows
+
+NUMBERS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100) SELECT x FROM n"
+ENDLESS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT max(x) FROM n"
+
+@pytest.fixture
+def engines(tmp_path):
+    return get_engine(f"sqlite:///{tmp_path}/rows.db"), get_async_engine(f"sqlite+aiosqlite:///{tmp_path}/rows.db")
+
+def collect_async(query, engine, **kwargs):
+    async def main():
+        return [record async for record in astream_rows(query, engine, **kwargs)]
+    return asyncio.run(main())
+
+def test_row_cap_ends_with_truncation_marker(engines):
+    rows = list(stream_rows(NUMBERS, engines[0], max_rows=3, max_bytes=0))
+    assert rows == [{'x': 1}, {'x': 2}, {'x': 3}, {TRUNCATED_KEY: "row limit of 3 reached"}]
+    assert collect_async(NUMBERS, engines[1], max_rows=3, max_bytes=0) == rows
+
+def test_byte_cap_stops_before_the_row_that_exceeds_it(engines):
+    # str({'x': 1}) is 8 characters
+    rows = list(stream_rows(NUMBERS, engines[0], max_rows=0, max_bytes=20))
+    assert rows == [{'x': 1}, {'x': 2}, {TRUNCATED_KEY: "size limit of 20 bytes reached"}]
+    assert collect_async(NUMBERS, engines[1], max_rows=0, max_bytes=20) == rows
+
+def test_zero_caps_are_unlimited(engines):
+    assert len(list(stream_rows(NUMBERS, engines[0], max_rows=0, max_bytes=0))) == 100
+    assert len(collect_async(NUMBERS, engines[1], max_rows=0, max_bytes=0)) == 100
+
+def test_sql_engine_reports_truncation(engines, monkeypatch):
+    monkeypatch.setattr(Settings, 'RESULT_MAX_ROWS', 2)
+    assert sql_engine(NUMBERS, engines[0]) == "[{'x': 1}, {'x': 2}]\n[Result truncated: row limit of 2 reached]"
+
+def test_statement_timeout_aborts_sync_and_async_queries(engines, monkeypatch):
+    monkeypatch.setattr(Settings, 'DB_STATEMENT_TIMEOUT_MS', 100)
+    with pytest.raises(Exception, match="interrupted"):
+        list(stream_rows(ENDLESS, engines[0]))
+    with pytest.raises(Exception, match="interrupted"):
+        collect_async(ENDLESS, engines[1])